@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import run_test
+from mock_ollama import DEFAULT_CONFIG, add_mock_arguments
+from run_test_async import run_models
+
+SCHEDULES = ["interleaved", "grouped", "async"]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def reset_mock(host):
+    """Make the mock server answer the next run exactly like the first one"""
+    request = urllib.request.Request(f"{host}/mock/reset", data=b"{}", method="POST")
+    urllib.request.urlopen(request, timeout=5).close()
+
+def mock_requests(host):
+    """Number of generations the mock server has served so far, over all models"""
+    with urllib.request.urlopen(f"{host}/mock/requests", timeout=5) as response:
+        return sum(json.load(response)["requests"].values())
+
+@contextlib.contextmanager
+def mock_server(args):
+    """Start mock_ollama.py in its own process, so its CPU time is not counted as the harness's"""
+    port = free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_ollama.py"), "--port", str(port)]
+    for option in ["config", "latency", "tokens_per_second", "load_delay", "correct_rate", "stall_rate", "seed"]:
+        if getattr(args, option) is not None:
+            command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    host = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                mock_requests(host)
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError(f"Mock Ollama server did not start on {host}")
+        yield host
+    finally:
+        process.terminate()
+        process.wait()
+
+def run_scenario(schedule, concurrency, args):
+    """Run the whole question set once with one schedule and concurrency, returning (results, metadata)"""
+    if schedule == "async":
+        return asyncio.run(run_models([args.test_model], args.evaluator, args.evaluator2, args.max_attempts, args.timeout,
+                                      max_in_flight=concurrency))[0][:2]
+    return run_test.run_test(args.test_model, args.evaluator, args.evaluator2, args.max_attempts, args.timeout,
+                             concurrency=concurrency, schedule=schedule)[:2]
+
+def measure(host, schedule, concurrency, args):
+    """Time one scenario and compute its throughput and the harness CPU time per Ollama call"""
+    reset_mock(host)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    # The harness still formats all its progress output; it just doesn't reach the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results, metadata = run_scenario(schedule, concurrency, args)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    calls = mock_requests(host)
+
+    attempts = sum(r["attempts"] for r in results)
+    return {
+        "schedule": schedule,
+        "concurrency": concurrency,
+        "questions": len(results),
+        "attempts": attempts,
+        "calls": calls,
+        "correct": metadata["correct_answers"],
+        "seconds": elapsed,
+        "questions_per_second": len(results) / elapsed,
+        "attempts_per_second": attempts / elapsed,
+        "cpu_seconds": cpu,
+        "cpu_ms_per_call": cpu * 1000 / calls if calls else None
+    }
+
+def print_report(rows):
+    print(f"\n{'Schedule':<12} {'Conc':>4} {'Q':>4} {'Att':>4} {'Calls':>5} {'Wall s':>8} {'Q/s':>7} {'Att/s':>7} {'CPU ms/call':>11}")
+    for row in rows:
+        cpu_per_call = f"{row['cpu_ms_per_call']:.2f}" if row["cpu_ms_per_call"] is not None else "-"
+        print(f"{row['schedule']:<12} {row['concurrency']:>4} {row['questions']:>4} {row['attempts']:>4} {row['calls']:>5} "
+              f"{row['seconds']:>8.2f} {row['questions_per_second']:>7.2f} {row['attempts_per_second']:>7.2f} {cpu_per_call:>11}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the test harness end to end against the mock Ollama server')
+    parser.add_argument('--schedule', nargs='+', choices=SCHEDULES, default=['interleaved'], help='Schedules to benchmark (default: interleaved)')
+    parser.add_argument('--concurrency', '-c', nargs='+', type=int, default=[1], help='Concurrency levels to benchmark (default: 1)')
+    parser.add_argument('--repeat', '-r', type=int, default=1, help='Runs per scenario (default: 1)')
+    parser.add_argument('--max-attempts', '-m', type=int, default=5, help='Maximum attempts per question (default: 5)')
+    parser.add_argument('--timeout', '-t', type=run_test.parse_seconds, default=10, help='Timeout in seconds for each answer (default: 10)')
+    parser.add_argument('--test-model', default=DEFAULT_CONFIG["test_models"][0], help='Test model to ask (default: %(default)s)')
+    parser.add_argument('--evaluator', '-e', default=DEFAULT_CONFIG["evaluators"][0], help='Primary evaluator model (default: %(default)s)')
+    parser.add_argument('--evaluator2', '-e2', default=DEFAULT_CONFIG["evaluators"][1], help='Second evaluator model (default: %(default)s)')
+    parser.add_argument('--eval-cache', action='store_true', help='Use the evaluation cache (off by default, so repeated runs stay comparable)')
+    parser.add_argument('--host', help='Benchmark against a mock server that is already running instead of starting one')
+    parser.add_argument('--output', '-o', help='Also write the measurements to this JSON file')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    run_test.configure_eval_cache(args.eval_cache)
+
+    with contextlib.ExitStack() as stack:
+        host = args.host or stack.enter_context(mock_server(args))
+        # Clients are created on first use, so they all pick this up
+        os.environ["OLLAMA_HOST"] = host
+        print(f"🧪 Benchmarking against mock Ollama server {host}")
+
+        rows = []
+        for schedule in args.schedule:
+            for concurrency in args.concurrency:
+                for run in range(1, args.repeat + 1):
+                    print(f"⏳ {schedule}, concurrency {concurrency}, run {run}/{args.repeat}...")
+                    rows.append(measure(host, schedule, concurrency, args))
+
+    print_report(rows)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "runs": rows}, f, indent=2)
+        print(f"💾 Measurements saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Timing and token counts reported by Ollama for each generate call (durations are in nanoseconds)
+STAT_FIELDS = [
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration"
+]
+
+def response_stats(model, response):
+    """Extract the Ollama stats of a (final, done) generate response"""
+    stats = {"model": model}
+    for field in STAT_FIELDS:
+        stats[field] = response.get(field) or 0
+    return stats
+
+def truncated_stats(model, elapsed, decode_elapsed, chunk_count):
+    """Estimate the stats of a streamed call stopped before Ollama reported them (on its final chunk)
+
+    Ollama streams one token per chunk, so the chunks received count as the
+    generated tokens and the time since the first one as decoding time. Load
+    and prompt processing can't be told apart, so they are left at 0.
+    """
+    stats = response_stats(model, {})
+    stats.update({
+        "total_duration": int(elapsed * 1e9),
+        "eval_count": chunk_count,
+        "eval_duration": int(decode_elapsed * 1e9),
+        "truncated": True
+    })
+    return stats
+
+def percentile(values, p):
+    """Percentile of a list of values with linear interpolation between the closest ranks"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize_call_stats(calls):
+    """Summarize a list of call stats: latency percentiles, throughput and where the time went"""
+    if not calls:
+        return None
+
+    totals = {field: sum(call[field] for call in calls) for field in STAT_FIELDS}
+    latencies = [call["total_duration"] / 1e9 for call in calls]
+    total_time = totals["total_duration"] or 1
+    return {
+        "calls": len(calls),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "prompt_tokens": totals["prompt_eval_count"],
+        "generated_tokens": totals["eval_count"],
+        "prompt_tokens_per_second": totals["prompt_eval_count"] / (totals["prompt_eval_duration"] / 1e9) if totals["prompt_eval_duration"] else None,
+        "tokens_per_second": totals["eval_count"] / (totals["eval_duration"] / 1e9) if totals["eval_duration"] else None,
+        "load_share": totals["load_duration"] / total_time,
+        "prompt_share": totals["prompt_eval_duration"] / total_time,
+        "decode_share": totals["eval_duration"] / total_time
+    }
+
+def summarize_results_stats(results):
+    """Summarize the stats of all test model and evaluator calls recorded in a run's results"""
+    answer_calls = []
+    evaluation_calls = []
+    for result in results:
+        for attempt_stats in result.get("stats", []):
+            if not attempt_stats:
+                continue
+            if attempt_stats.get("answer"):
+                answer_calls.append(attempt_stats["answer"])
+            evaluation_calls.extend(attempt_stats.get("evaluations", []))
+    return {
+        "test_model": summarize_call_stats(answer_calls),
+        "evaluators": summarize_call_stats(evaluation_calls)
+    }
+
+def format_call_summary(summary):
+    """One line description of a call summary for the console"""
+    if not summary:
+        return "no calls recorded"
+    tokens_per_second = f"{summary['tokens_per_second']:.1f} tok/s" if summary["tokens_per_second"] else "n/a tok/s"
+    return (f"{summary['calls']} calls, p50 {summary['latency_p50']:.2f}s, p95 {summary['latency_p95']:.2f}s, "
+            f"{tokens_per_second}, load {summary['load_share']:.0%} / prompt {summary['prompt_share']:.0%} / "
+            f"decode {summary['decode_share']:.0%} of the time")
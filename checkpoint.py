@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+
+CHECKPOINT_DIR = "results/checkpoints"
+
+def new_run_id():
+    """Claim the journal of a new run by creating it, still empty, and return the run id
+
+    The id is the start time of the run; runs started in the same second
+    (parallel shards, several coordinators) get -2, -3... appended.
+    Journals of finished runs are kept (marked complete), so ids are never reused.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    base_id = time.strftime("%Y%m%d-%H%M%S")
+    run_id = base_id
+    number = 1
+    while True:
+        try:
+            with open(os.path.join(CHECKPOINT_DIR, f"{run_id}.jsonl"), "x"):
+                return run_id
+        except FileExistsError:
+            number += 1
+            run_id = f"{base_id}-{number}"
+
+class CheckpointJournal:
+    """Append-only journal of finished attempts, so an interrupted run can be resumed
+
+    Every graded attempt is appended (and synced to disk) as soon as it is
+    done, keyed by (test model, question path, attempt). Resuming a run
+    replays the recorded attempts instead of asking the models again, so the
+    journal also records the settings of the run, which a resume must match.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.path = os.path.join(CHECKPOINT_DIR, f"{run_id}.jsonl")
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._saved = {}
+        self.settings = None
+        self.complete = False
+
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def exists(run_id):
+        """Check if a journal has been started for run_id"""
+        return os.path.exists(os.path.join(CHECKPOINT_DIR, f"{run_id}.jsonl"))
+
+    def _load(self):
+        """Load the journal, ignoring a partially written last line"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record["type"] == "attempt":
+                    key = (record["test_model"], record["question_path"], record["attempt"])
+                    self._attempts[key] = record["result"]
+                elif record["type"] == "saved":
+                    self._saved[record["test_model"]] = record["results_file"]
+                elif record["type"] == "settings":
+                    self.settings = record["settings"]
+                elif record["type"] == "complete":
+                    self.complete = True
+
+    def _append(self, record):
+        """Append a record and make sure it is on disk before returning"""
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def changed_settings(self, settings):
+        """List the settings that differ from the ones recorded for this run
+
+        Journals without recorded settings (new ones, or ones written before
+        settings were recorded) take the given settings and report none.
+        """
+        # Compared as stored in JSON, where tuples have become lists
+        settings = json.loads(json.dumps(settings))
+        if self.settings is None:
+            self.settings = settings
+            self._append({"type": "settings", "settings": settings})
+            return []
+        return sorted(key for key in set(self.settings) | set(settings)
+                      if self.settings.get(key) != settings.get(key))
+
+    def get_attempt(self, test_model, question_path, attempt):
+        """Get the recorded result of an attempt, or None if it has not been done yet"""
+        return self._attempts.get((test_model, question_path, attempt))
+
+    def record_attempt(self, test_model, question_path, attempt, result):
+        """Record the graded result of an attempt"""
+        self._attempts[(test_model, question_path, attempt)] = result
+        self._append({
+            "type": "attempt",
+            "test_model": test_model,
+            "question_path": question_path,
+            "attempt": attempt,
+            "result": result
+        })
+
+    def saved_results_file(self, test_model):
+        """Get the results file already saved for a test model in this run, if any"""
+        return self._saved.get(test_model)
+
+    def record_saved(self, test_model, results_file):
+        """Record that the results of a test model were saved to results_file, finishing it in this run"""
+        self._saved[test_model] = results_file
+        self._append({"type": "saved", "test_model": test_model, "results_file": results_file})
+
+    def mark_complete(self):
+        """Record that every test model of the run has been saved, so there is nothing left to resume"""
+        self.complete = True
+        self._append({"type": "complete"})
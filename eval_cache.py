@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = "results/eval_cache.sqlite"
+DEFAULT_MAX_MB = 256
+
+class EvaluationCache:
+    """Persistent cache of evaluator responses, stored in SQLite with size-based LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # A single connection shared between threads, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    key TEXT PRIMARY KEY,
+                    evaluator_model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON evaluations (last_access)")
+
+    @staticmethod
+    def make_key(evaluator_model, prompt, **settings):
+        """Hash the evaluator model, the full prompt (template and inputs) and any generation settings"""
+        payload = json.dumps([evaluator_model, prompt, settings], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a cached response, or None if it is not cached"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM evaluations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE evaluations SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, evaluator_model, response):
+        """Store a response and evict the least recently used entries if the cache is too large"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, evaluator_model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, evaluator_model, response, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM evaluations").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM evaluations ORDER BY last_access ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total_size -= size
+        self._conn.executemany("DELETE FROM evaluations WHERE key = ?", evicted)
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -1,19 +1,15 @@
-import json
-import os
 from datetime import datetime
 
+from question_bank import get_bank
+
 def load_questions():
     """Load questions from questions.json"""
-    with open("questions.json", "r") as f:
-        return json.load(f)
+    return get_bank().questions()
 
 def read_file_content(file_path):
     """Read content from a file"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    full_path = os.path.join(base_path, file_path)
     try:
-        with open(full_path, 'r') as f:
-            return f.read()
+        return get_bank().content(file_path)
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
@@ -1,68 +1,58 @@
 import os
 import json
-import glob
 import re
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional, Any
 
+import results_store
+from pass_at_k import summarize_pass_at_k
+from question_bank import get_bank, matches, shard_of
+from results_index import RESULTS_DIR, refresh_index
+
 def load_questions():
     """Load questions from questions.json"""
-    with open("questions.json", "r") as f:
-        return json.load(f)
+    return get_bank().questions()
 
-def find_result_files(results_dir="results"):
-    """Find all result files in the directory"""
+def load_results_index(results_dir=RESULTS_DIR):
+    """Load the results index, reading only result files that are new or changed since the last run"""
     if not os.path.exists(results_dir):
         print(f"❌ No results directory found at path: {os.path.abspath(results_dir)}")
-        return []
-    
-    # Get all result files
-    result_files = glob.glob(f"{results_dir}/results_*.json")
-    print(f"Found {len(result_files)} result files in directory: {os.path.abspath(results_dir)}")
+        return {}
     
-    if not result_files and os.path.exists(results_dir):
-        # Debug info if no files found with pattern
-        all_files = os.listdir(results_dir)
-        print(f"Files in directory: {all_files}")
-        
-    return result_files
+    results_index = refresh_index(results_dir)
+    print(f"Found {len(results_index)} result files in directory: {os.path.abspath(results_dir)}")
+    return results_index
 
-def extract_model_and_timestamp(filename):
-    """Extract model name and timestamp from a filename"""
-    basename = os.path.basename(filename)
-    
-    # Try different patterns to extract information
-    patterns = [
-        r"results_(.+?)_(\d{8}-\d{6})\.json$",  # Standard format with hyphenated timestamp
-        r"results_([^_]+)_(.+?)\.json$"         # More generic fallback pattern
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, basename)
-        if match:
-            model_name, timestamp = match.groups()
-            timestamp_clean = timestamp.replace("-", "")  # Normalize for comparison
-            return model_name, timestamp_clean
-    
-    # Fallback if no pattern matches
-    print(f"  ⚠️ Using fallback: treating whole file as one result")
-    model_name = basename.replace("results_", "").replace(".json", "")
-    return model_name, "0"  # Use "0" as timestamp to rank it last
-
-def get_latest_results_by_model():
-    """Find the latest result file for each model"""
-    result_files = find_result_files()
-    if not result_files:
+def get_latest_results_by_model(results_index=None):
+    """Find the latest result for each model
+    
+    The partial result files of a sharded run (same shard_run in their
+    metadata) count as one result, dated by its newest file. Other runs of
+    a question subset (a selection without shard_run) are left out, so they
+    never replace a model's full result.
+    Returns {model: [file paths]}.
+    """
+    if results_index is None:
+        results_index = load_results_index()
+    if not results_index:
         return {}
     
-    # Process each file to extract model and timestamp
+    # Group the files into logical runs; model and timestamp were extracted from the filename when indexed
+    runs = {}
+    for file_path, entry in sorted(results_index.items()):
+        if entry["metadata"].get("selection") and not entry["metadata"].get("shard_run"):
+            print(f"  ⏭️ Skipping {os.path.basename(file_path)}: a run of selected questions only")
+            continue
+        run_key = entry["metadata"].get("shard_run") or file_path
+        runs.setdefault((entry["model"], run_key), []).append(file_path)
+    
     model_results = {}
-    for file_path in result_files:
-        model_name, timestamp = extract_model_and_timestamp(file_path)
+    for (model_name, _), file_paths in runs.items():
+        timestamp = max(results_index[file_path]["timestamp"] for file_path in file_paths)
         
         # Keep only the latest result for each model
         if model_name not in model_results or timestamp > model_results[model_name][0]:
-            model_results[model_name] = (timestamp, file_path)
+            model_results[model_name] = (timestamp, file_paths)
     
     # Return only the file paths for the latest results
     latest_results = {model: data[1] for model, data in model_results.items()}
@@ -71,15 +61,95 @@ def get_latest_results_by_model():
         print("❌ No result files found matching the pattern")
     else:
         print(f"✅ Found latest results for {len(latest_results)} models")
-        for model, file_path in latest_results.items():
-            print(f"  - {model}: {os.path.basename(file_path)}")
+        for model, file_paths in latest_results.items():
+            if len(file_paths) == 1:
+                print(f"  - {model}: {os.path.basename(file_paths[0])}")
+            else:
+                shard_run = results_index[file_paths[0]]["metadata"]["shard_run"]
+                print(f"  - {model}: {len(file_paths)} files of sharded run {shard_run}")
     
     return latest_results
 
 def load_result(file_path):
-    """Load a result file"""
-    with open(file_path, "r") as f:
-        return json.load(f)
+    """Load a result file (full JSON or compact scores and transcripts)"""
+    return results_store.load_result(file_path)
+
+def merge_metadata(summaries, questions, bank_questions=None):
+    """Metadata of a sharded run: the first file's, with the scores recomputed over all its questions
+
+    missing_shards lists the shards of the run that have questions in the
+    question bank (bank_questions, by default questions.json) but no result
+    file yet; the merge is complete once it is empty.
+    """
+    questions = [q for q in questions if q is not None]
+    total_score = sum(q.get("best_score") or 0 for q in questions)
+    correct_count = sum(1 for q in questions if (q.get("assessment") or "").lower() == "correct")
+    total_attempts = sum(q.get("attempts") or 1 for q in questions)
+    count = max(len(questions), 1)
+    
+    metadata = dict(summaries[0]["metadata"])
+    metadata.update({
+        "total_score": total_score,
+        "max_possible_score": 5 * len(questions),
+        "score_percentage": total_score / (5 * count) * 100,
+        "correct_answers": correct_count,
+        "total_questions": len(questions),
+        "correct_percentage": correct_count / count * 100,
+        "total_attempts": total_attempts,
+        "avg_attempts": total_attempts / count,
+        "merged_shards": sorted({s["metadata"]["selection"]["shard"][0] for s in summaries
+                                 if (s["metadata"].get("selection") or {}).get("shard")})
+    })
+    shard_counts = {s["metadata"]["selection"]["shard"][1] for s in summaries
+                    if (s["metadata"].get("selection") or {}).get("shard")}
+    # A shard without questions never gets a result file, so it can't be missing
+    if bank_questions is None:
+        bank_questions = load_questions()
+    selection = {key: value for key, value in (metadata.get("selection") or {}).items() if key != "shard"}
+    expected_shards = {shard_of(entry, count) for count in shard_counts
+                       for entry in bank_questions if matches(entry, **selection)}
+    metadata["missing_shards"] = sorted(expected_shards - set(metadata["merged_shards"]))
+    if metadata.get("samples"):
+        metadata["pass_at_k"] = summarize_pass_at_k(questions, metadata["samples"])
+    return metadata
+
+def build_result_index(latest_results, results_index):
+    """Index the per-question results of each model's latest result
+    
+    Returns {model: {"files", "metadata", "by_index", "by_path"}}, where the
+    per-question results are keyed by question index and by question path.
+    The files of a sharded run are merged, the newest file winning when a
+    question was run by more than one shard. Everything comes from the
+    summaries in the results index, so no result file is read here.
+    """
+    index = {}
+    for model, result_files in latest_results.items():
+        summaries = [results_index[file_path] for file_path in
+                     sorted(result_files, key=lambda file_path: results_index[file_path]["timestamp"], reverse=True)]
+        by_index = {}
+        by_path = {}
+        for summary in summaries:
+            for item in summary["questions"]:
+                # Keep the first match, like a linear scan would
+                by_index.setdefault(item.get("question_index"), item)
+                by_path.setdefault(item.get("question_path"), item)
+        
+        # Even a single file of a sharded run is merged, so missing shards are flagged
+        if len(summaries) == 1 and not summaries[0]["metadata"].get("shard_run"):
+            metadata = summaries[0]["metadata"]
+        else:
+            metadata = merge_metadata(summaries, by_index.values())
+        index[model] = {
+            "files": result_files,
+            "metadata": metadata,
+            "by_index": by_index,
+            "by_path": by_path
+        }
+    return index
+
+def find_question_result(model_index, q_index, question_path):
+    """Look up a model's result for a question by index, falling back to its path"""
+    return model_index["by_index"].get(q_index) or model_index["by_path"].get(question_path)
 
 def format_model_name(model_name, metadata=None):
     """Format model name for display"""
@@ -101,12 +171,14 @@ def create_table_header(questions):
     header += "- **Question results:** ✅ 5/5(4) means a correct answer with score 5 out of 5, taking 4 attempts to get it right\n"
     header += "- **Question results:** ❌ 0/5(3) means an incorrect answer with score 0, despite 3 attempts\n"
     header += "- **Question results:** ❌ 0/5(5)⏱️ means the last attempt timed out\n"
-    header += "- **Overall results:** 50.0% (3.7 tries) means the model answered 50% of questions correctly, with an average of 3.7 attempts per question\n\n"
+    header += "- **Question results:** 🎲 3/5 means 3 of 5 independent samples were correct (pass@k runs, marked 🎲, don't retry)\n"
+    header += "- **Overall results:** 50.0% (3.7 tries) means the model answered 50% of questions correctly, with an average of 3.7 attempts per question\n"
+    header += "- **Overall results:** pass@1 40.0%, pass@5 80.0% is the estimated chance that 1 (or 5) samples include a correct answer\n\n"
     
     # Create header row with links to questions and answers
     row = "| Model | "
-    for q in questions:
-        short_name = q.get("short_name", f"Q{questions.index(q)+1}")
+    for i, q in enumerate(questions, 1):
+        short_name = q.get("short_name", f"Q{i}")
         q_rel_path = os.path.normpath(q["question"])
         a_rel_path = os.path.normpath(q["answer"])
         
@@ -126,6 +198,10 @@ def format_question_result(q_result, q_index):
     if not q_result:
         return "N/A | "
     
+    # Samples of a pass@k run are not attempts: show how many of them were correct
+    if q_result.get("correct_samples") is not None:
+        return f"🎲 {q_result['correct_samples']}/{q_result.get('attempts', 0)} | "
+    
     assessment = q_result.get("assessment", "N/A").lower()
     best_score = q_result.get("best_score", 0)
     attempts = q_result.get("attempts", 1)
@@ -142,30 +218,27 @@ def format_question_result(q_result, q_index):
     
     return f"{emoji} {best_score}/5{attempts_info}{timeout_indicator} | "
 
-def create_model_rows(model_scores, questions, latest_results):
+def create_model_rows(model_scores, questions, result_index):
     """Create table rows for each model's performance"""
     rows = ""
     
-    for model, result_file, _ in model_scores:
-        result = load_result(result_file)
-        metadata = result.get("metadata", {})
-        results = result.get("results", [])
+    for model, _ in model_scores:
+        metadata = result_index[model]["metadata"]
         
         # Format model name, passing metadata to use display name if available
         display_model = format_model_name(model, metadata)
+        if metadata.get("samples"):
+            display_model += f" 🎲 pass@{metadata['samples']}"
+        if metadata.get("missing_shards"):
+            display_model += f" ⚠️ incomplete, missing shard(s) {', '.join(map(str, metadata['missing_shards']))}"
         
         # Start the row with the model name
         row = f"| {display_model} | "
         
         # Add a cell for each question
-        for q in questions:
-            q_index = questions.index(q) + 1
-            
+        for q_index, q in enumerate(questions, 1):
             # Find the corresponding result
-            q_result = next(
-                (r for r in results if r.get("question_index") == q_index or r.get("question_path") == q["question"]), 
-                None
-            )
+            q_result = find_question_result(result_index[model], q_index, q["question"])
             
             row += format_question_result(q_result, q_index)
         
@@ -175,7 +248,11 @@ def create_model_rows(model_scores, questions, latest_results):
         correct_percentage = metadata.get("correct_percentage", 0)
         avg_attempts = metadata.get("avg_attempts", 1)
         
-        if max_score > 0:
+        pass_at_k = metadata.get("pass_at_k")
+        if max_score > 0 and pass_at_k:
+            last_k = max(pass_at_k, key=int)
+            row += f"{total_score}/{max_score} | pass@1 {pass_at_k['1'] * 100:.1f}%, pass@{last_k} {pass_at_k[last_k] * 100:.1f}% |\n"
+        elif max_score > 0:
             row += f"{total_score}/{max_score} | {correct_percentage:.1f}% ({avg_attempts:.1f} tries) |\n"
         else:
             row += "N/A | N/A |\n"
@@ -184,18 +261,19 @@ def create_model_rows(model_scores, questions, latest_results):
     
     return rows
 
-def calculate_question_statistics(latest_results):
+def calculate_question_statistics(result_index):
     """Calculate success rates and average attempts for each question across models"""
     question_stats = {}
     
-    for model_name, result_file in latest_results.items():
-        result = load_result(result_file)
-        for item in result.get("results", []):
+    for model_index in result_index.values():
+        for item in model_index["by_index"].values():
             q_index = item.get("question_index")
             if q_index not in question_stats:
                 question_stats[q_index] = {"attempts": [], "successes": 0, "total": 0}
             
-            question_stats[q_index]["attempts"].append(item.get("attempts", 1))
+            # The samples of a pass@k run are not retries, so they don't count as attempts
+            if item.get("correct_samples") is None:
+                question_stats[q_index]["attempts"].append(item.get("attempts", 1))
             # Use lowercase assessment and handle "wong" too
             assessment = item.get("assessment", "").lower()
             question_stats[q_index]["successes"] += 1 if assessment == "correct" else 0
@@ -209,8 +287,7 @@ def create_performance_table(questions, question_stats):
     table += "| Question | Difficulty for Humans | Difficulty for AI | Success Rate | Avg Attempts |\n"
     table += "| --- | :---: | :---: | :---: | :---: |\n"
     
-    for q in questions:
-        q_index = questions.index(q) + 1
+    for q_index, q in enumerate(questions, 1):
         short_name = q.get("short_name", f"Q{q_index}")
         
         # Create 5 stars total with filled and empty stars
@@ -231,30 +308,30 @@ def create_performance_table(questions, question_stats):
 def generate_table():
     """Generate a results table in markdown format"""
     questions = load_questions()
-    latest_results = get_latest_results_by_model()
+    results_index = load_results_index()
+    latest_results = get_latest_results_by_model(results_index)
     
     if not latest_results:
         return None
     
+    # Index the per-question results of every model
+    result_index = build_result_index(latest_results, results_index)
+    
     # Generate table header
     table = create_table_header(questions)
     
     # Sort models by score percentage
-    model_scores = []
-    for model, result_file in latest_results.items():
-        result = load_result(result_file)
-        metadata = result.get("metadata", {})
-        score_percentage = metadata.get("score_percentage", 0)
-        model_scores.append((model, result_file, score_percentage))
+    model_scores = [(model, model_index["metadata"].get("score_percentage", 0))
+                    for model, model_index in result_index.items()]
     
     # Sort by score (descending)
-    model_scores.sort(key=lambda x: x[2], reverse=True)
+    model_scores.sort(key=lambda x: x[1], reverse=True)
     
     # Add rows for each model
-    table += create_model_rows(model_scores, questions, latest_results)
+    table += create_model_rows(model_scores, questions, result_index)
     
     # Calculate question statistics
-    question_stats = calculate_question_statistics(latest_results)
+    question_stats = calculate_question_statistics(result_index)
     
     # Add performance table
     table += create_performance_table(questions, question_stats)
@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Behaviour of the mock server; every setting can be overridden per model under "models"
+DEFAULT_CONFIG = {
+    "latency": 0.05,            # Seconds of prompt processing before the first token
+    "tokens_per_second": 200,   # Generation speed (one token per word)
+    "load_delay": 0.5,          # Extra delay of the first request to a model that is not loaded
+    "correct_rate": 0.5,        # Share of test model answers that are correct
+    "stall_rate": 0.0,          # Share of test model answers that never finish, to exercise timeouts
+    "stall_seconds": 3600,
+    "correct_answer": "After checking every case, the answer is forty-two.",
+    "wrong_answer": "I am not sure, but the answer might be seven.",
+    "thinking": "",             # Thinking section put in front of every test model answer, e.g. "<think>...</think>"
+    "test_models": ["mock-model"],
+    "evaluators": ["mock-evaluator", "mock-evaluator2"],
+    "seed": 0,
+    # Per-model overrides, plus scripts that are cycled through instead of the random choice:
+    #   "answers": ["...", ...]           answers of a test model, by attempt at a question
+    #   "verdicts": ["Correct", "Wrong"]  verdicts of an evaluator
+    "models": {}
+}
+
+def model_names(config):
+    return list(dict.fromkeys(config["test_models"] + config["evaluators"] + list(config["models"])))
+
+def tagged(model):
+    """Model name as listed by Ollama, which always carries a tag"""
+    return model if ":" in model else f"{model}:latest"
+
+class MockOllama:
+    """State of the mock server: settings, loaded models and the scripts' positions"""
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.lock = threading.Lock()
+        self.loaded = {}     # model -> time its keep_alive runs out
+        self.in_flight = {}  # model -> number of running requests, which keep it loaded
+        self.requests = {}   # (model, prompt hash) -> number of generate requests so far
+        self.model_list = model_names(self.config)
+
+    def settings(self, model):
+        """Settings of one model, with its overrides applied"""
+        return {**self.config, **self.config["models"].get(model, {})}
+
+    def is_evaluator(self, model):
+        return model in self.config["evaluators"] or "verdicts" in self.config["models"].get(model, {})
+
+    def is_loaded(self, model):
+        return self.in_flight.get(model, 0) > 0 or self.loaded.get(model, 0) > time.time()
+
+    def start_request(self, model):
+        """Count a request to a model as running, returning how long loading the model took"""
+        with self.lock:
+            was_loaded = self.is_loaded(model)
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        return 0.0 if was_loaded else self.settings(model)["load_delay"]
+
+    def finish_request(self, model, keep_alive):
+        """Keep a model loaded for keep_alive seconds (default 5 minutes) after its last running request"""
+        with self.lock:
+            self.in_flight[model] -= 1
+            self.loaded[model] = time.time() + (keep_alive if keep_alive is not None else 300)
+
+    def reset(self):
+        """Forget all requests and loaded models, so the next run gets the same answers as the first"""
+        with self.lock:
+            self.requests.clear()
+            self.loaded.clear()
+
+    def request_counts(self):
+        """Number of generations served so far, per model"""
+        counts = {}
+        with self.lock:
+            for (model, _), count in self.requests.items():
+                counts[model] = counts.get(model, 0) + count
+        return counts
+
+    def unload(self, model):
+        with self.lock:
+            self.loaded.pop(model, None)
+
+    def loaded_models(self):
+        with self.lock:
+            return [(model, self.loaded.get(model, time.time())) for model in set(self.loaded) | set(self.in_flight)
+                    if self.is_loaded(model)]
+
+    def next_response(self, model, prompt, structured, request_seed=None):
+        """Pick the text of the next response of a model, and whether it stalls
+
+        The choice only depends on the seed, the prompt and how often the model
+        got that prompt before (or the request's own seed, like Ollama), so
+        every run sees the same answers whatever the order or concurrency of
+        its requests.
+        """
+        settings = self.settings(model)
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        with self.lock:
+            count = self.requests.get((model, prompt_hash), 0)
+            self.requests[(model, prompt_hash)] = count + 1
+        draw = count if request_seed is None else f"seed {request_seed}"
+        rng = random.Random(f"{settings['seed']}:{model}:{prompt_hash}:{draw}")
+        roll = rng.random()
+        stall_roll = rng.random()
+
+        if self.is_evaluator(model):
+            if "verdicts" in settings:
+                assessment = settings["verdicts"][count % len(settings["verdicts"])]
+            else:
+                assessment = "Correct" if settings["correct_answer"] in prompt else "Wrong"
+            verdict = {
+                "explanation": "Matches the model answer." if assessment == "Correct" else "Does not match the model answer.",
+                "assessment": assessment,
+                "score": 5 if assessment == "Correct" else 0
+            }
+            # Without a format constraint the verdict comes with some stray text, as real models do
+            return json.dumps(verdict) + ("" if structured else " Let me know if you need more details."), False
+
+        if "answers" in settings:
+            answer = settings["answers"][count % len(settings["answers"])]
+        else:
+            answer = settings["correct_answer"] if roll < settings["correct_rate"] else settings["wrong_answer"]
+        return settings["thinking"] + answer, stall_roll < settings["stall_rate"]
+
+def parse_keep_alive(keep_alive):
+    """Seconds a model stays loaded for a keep_alive value (number of seconds or a duration like "10m")"""
+    if keep_alive is None or isinstance(keep_alive, (int, float)):
+        return keep_alive
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for unit in sorted(units, key=len, reverse=True):
+        if keep_alive.endswith(unit):
+            return float(keep_alive[:-len(unit)]) * units[unit]
+    return float(keep_alive)
+
+def timestamp(seconds=None):
+    return datetime.fromtimestamp(seconds or time.time(), timezone.utc).isoformat()
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Implements the parts of the Ollama API that the test scripts use"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, obj):
+        line = json.dumps(obj).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        mock = self.server.mock
+        if self.path == "/api/tags":
+            self.send_json({"models": [
+                {"name": tagged(model), "model": tagged(model), "modified_at": timestamp(), "size": 0, "digest": model}
+                for model in mock.model_list
+            ]})
+        elif self.path == "/api/ps":
+            self.send_json({"models": [
+                {"name": tagged(model), "model": tagged(model), "expires_at": timestamp(expiry), "size": 0}
+                for model, expiry in mock.loaded_models()
+            ]})
+        elif self.path == "/api/version":
+            self.send_json({"version": "0.0.0-mock"})
+        elif self.path == "/mock/requests":
+            # Not part of the Ollama API: generations served so far, per model
+            self.send_json({"requests": mock.request_counts()})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            self.generate(request)
+        elif self.path == "/api/pull":
+            self.send_json({"status": "success"})
+        elif self.path == "/mock/reset":
+            self.server.mock.reset()
+            self.send_json({"status": "success"})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def generate(self, request):
+        mock = self.server.mock
+        model = request.get("model", "").removesuffix(":latest")
+        prompt = request.get("prompt") or ""
+        keep_alive = parse_keep_alive(request.get("keep_alive"))
+
+        # A request without a prompt only loads or (with keep_alive 0) unloads the model
+        if not prompt:
+            if keep_alive == 0:
+                mock.unload(model)
+                done_reason = "unload"
+            else:
+                time.sleep(mock.start_request(model))
+                mock.finish_request(model, keep_alive)
+                done_reason = "load"
+            return self.send_json({"model": model, "created_at": timestamp(), "response": "", "done": True,
+                                   "done_reason": done_reason})
+
+        load_duration = mock.start_request(model)
+        try:
+            self.respond(request, model, prompt, load_duration)
+        finally:
+            mock.finish_request(model, keep_alive)
+
+    def respond(self, request, model, prompt, load_duration):
+        mock = self.server.mock
+        settings = mock.settings(model)
+        options = request.get("options") or {}
+        text, stalls = mock.next_response(model, prompt, bool(request.get("format")), options.get("seed"))
+        tokens = [word + " " for word in text.split(" ")]
+        tokens[-1] = tokens[-1][:-1]
+        num_predict = options.get("num_predict")
+        done_reason = "stop"
+        if num_predict and num_predict > 0 and len(tokens) > num_predict:
+            tokens = tokens[:num_predict]
+            done_reason = "length"
+
+        token_delay = 1 / settings["tokens_per_second"]
+        first_token_delay = load_duration + settings["latency"] + (settings["stall_seconds"] if stalls else 0)
+        stats = {
+            "total_duration": int((first_token_delay + token_delay * len(tokens)) * 1e9),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": int(settings["latency"] * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(token_delay * len(tokens) * 1e9)
+        }
+
+        try:
+            if not request.get("stream", True):
+                time.sleep(first_token_delay + token_delay * len(tokens))
+                return self.send_json({"model": model, "created_at": timestamp(), "response": "".join(tokens),
+                                       "done": True, "done_reason": done_reason, **stats})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(first_token_delay)
+            for token in tokens:
+                time.sleep(token_delay)
+                self.send_chunk({"model": model, "created_at": timestamp(), "response": token, "done": False})
+            self.send_chunk({"model": model, "created_at": timestamp(), "response": "", "done": True,
+                             "done_reason": done_reason, **stats})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout or early stop), just like Ollama cancelling a generation
+            pass
+
+class MockOllamaServer:
+    """Run the mock Ollama server in a background thread
+
+    Use as a context manager; url is the address to pass as OLLAMA_HOST or --hosts.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.mock = MockOllama(config)
+        self.httpd = ThreadingHTTPServer((host, port), MockOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self.mock
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_mock_arguments(parser):
+    """Add the command line options that override DEFAULT_CONFIG"""
+    parser.add_argument('--config', help='JSON file with settings and scripted answers (see DEFAULT_CONFIG in mock_ollama.py)')
+    parser.add_argument('--latency', type=float, help=f'Seconds before the first token (default: {DEFAULT_CONFIG["latency"]})')
+    parser.add_argument('--tokens-per-second', type=float, help=f'Generation speed (default: {DEFAULT_CONFIG["tokens_per_second"]})')
+    parser.add_argument('--load-delay', type=float, help=f'Seconds to load a model that is not loaded (default: {DEFAULT_CONFIG["load_delay"]})')
+    parser.add_argument('--correct-rate', type=float, help=f'Share of correct test model answers (default: {DEFAULT_CONFIG["correct_rate"]})')
+    parser.add_argument('--stall-rate', type=float, help=f'Share of test model answers that never finish (default: {DEFAULT_CONFIG["stall_rate"]})')
+    parser.add_argument('--seed', type=int, help=f'Seed of the random answers (default: {DEFAULT_CONFIG["seed"]})')
+
+def config_from_args(args):
+    """Build the mock configuration from a --config file and the command line overrides"""
+    config = {}
+    if args.config:
+        with open(args.config, "r") as f:
+            config.update(json.load(f))
+    for key in ["latency", "tokens_per_second", "load_delay", "correct_rate", "stall_rate", "seed"]:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in Ollama server with scripted answers, for testing and benchmarking the harness offline')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=11434, help='Port to listen on (default: 11434)')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOllamaServer(config_from_args(args), args.host, args.port)
+    print(f"🧪 Mock Ollama server on {server.url} with models: {', '.join(server.mock.model_list)}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from ollama import Client, ResponseError
+
+def parse_hosts(hosts_arg):
+    """Parse a comma separated list of hosts (e.g. "host1:11434,host2:11434")"""
+    return [host.strip() for host in hosts_arg.split(",") if host.strip()]
+
+def is_host_failure(error):
+    """Check if an error means the host itself is unhealthy
+
+    Connection problems and server errors count. Read timeouts don't: they mean
+    the model was slower than the test's timeout, which is a result, not a
+    broken host.
+    """
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    if isinstance(error, httpx.ReadTimeout):
+        return False
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+class HostPool:
+    """Balance requests across several Ollama hosts
+
+    Requests for a model prefer healthy hosts that already have the model
+    loaded (as reported by /api/ps), then the host with the fewest requests
+    in flight. Hosts that fail are evicted for eviction_seconds.
+    """
+
+    def __init__(self, hosts, refresh_seconds=10, eviction_seconds=60):
+        self.hosts = list(hosts)
+        self.refresh_seconds = refresh_seconds
+        self.eviction_seconds = eviction_seconds
+
+        self._lock = threading.Lock()
+        self._in_flight = {host: 0 for host in self.hosts}
+        self._loaded_models = {host: set() for host in self.hosts}
+        self._loaded_checked_at = {host: 0 for host in self.hosts}
+        self._evicted_until = {host: 0 for host in self.hosts}
+        self._clients = {}
+
+    def client(self, host, timeout_seconds=None):
+        """Get a shared client for a host whose requests time out after timeout_seconds"""
+        with self._lock:
+            key = (host, timeout_seconds)
+            if key not in self._clients:
+                self._clients[key] = Client(host=host, timeout=timeout_seconds)
+            return self._clients[key]
+
+    def healthy_hosts(self):
+        """List the hosts that are not evicted"""
+        now = time.monotonic()
+        return [host for host in self.hosts if self._evicted_until[host] <= now]
+
+    def _refresh_loaded_models(self, host):
+        """Update the models loaded on a host if the last check is too old"""
+        with self._lock:
+            if time.monotonic() - self._loaded_checked_at[host] < self.refresh_seconds:
+                return
+            # Claimed before asking, so concurrent requests don't all query the host
+            self._loaded_checked_at[host] = time.monotonic()
+        try:
+            response = self.client(host, 5).ps()
+            with self._lock:
+                self._loaded_models[host] = {model.model for model in response.models}
+        except Exception as e:
+            print(f"⚠️ Could not list loaded models on {host}: {str(e)}")
+            self.evict(host)
+
+    def _is_loaded(self, host, model):
+        """Check if a host reported model as loaded; the caller holds the lock"""
+        # Model names in /api/ps carry a tag (e.g. "llama3:latest")
+        return any(loaded == model or loaded.startswith(f"{model}:") for loaded in self._loaded_models[host])
+
+    def acquire(self, model):
+        """Pick the host for a request to model and count the request as in flight"""
+        for host in self.healthy_hosts():
+            self._refresh_loaded_models(host)
+
+        with self._lock:
+            healthy = self.healthy_hosts()
+            if not healthy:
+                # Everything is evicted - try the host that comes back first
+                healthy = [min(self.hosts, key=lambda host: self._evicted_until[host])]
+
+            host = min(healthy, key=lambda host: (not self._is_loaded(host, model), self._in_flight[host]))
+            self._in_flight[host] += 1
+            # The model will be loaded there once the request starts
+            self._loaded_models[host].add(model)
+            return host
+
+    def release(self, host, failed=False):
+        """Finish a request on a host, evicting the host if it failed"""
+        with self._lock:
+            self._in_flight[host] -= 1
+        if failed:
+            self.evict(host)
+
+    def evict(self, host):
+        """Stop sending requests to a host for a while"""
+        with self._lock:
+            self._evicted_until[host] = time.monotonic() + self.eviction_seconds
+            self._loaded_models[host] = set()
+        print(f"🚫 Evicting Ollama host {host} for {self.eviction_seconds}s")
+
+    @contextmanager
+    def request(self, model):
+        """Context manager that picks a host for a request and releases it afterwards
+
+        A host failure evicts the host, so a request retried afterwards goes to
+        another healthy host (see run_test.ask_question).
+        """
+        host = self.acquire(model)
+        failed = False
+        try:
+            yield host
+        except Exception as e:
+            failed = is_host_failure(e)
+            raise
+        finally:
+            self.release(host, failed)
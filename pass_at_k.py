@@ -0,0 +1,30 @@
+import math
+
+# Unbiased pass@k estimates of sampled runs (--samples K), see run_test.run_questions_sampled
+
+def pass_at_k(n, c, k):
+    """Unbiased estimate of pass@k from n samples of which c are correct
+
+    This is the chance that at least one of k samples drawn without
+    replacement from the n is correct: 1 - C(n-c, k) / C(n, k). With fewer
+    than k samples, all n are drawn.
+    """
+    k = min(k, n)
+    if c == 0:
+        return 0.0
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
+
+def summarize_pass_at_k(results, samples):
+    """Average the per-question pass@k estimates for k = 1..samples over the questions that were sampled
+
+    Returns an empty dict if no question was sampled.
+    """
+    sampled = [r for r in results if r.get("attempts")]
+    if not sampled:
+        return {}
+    return {
+        str(k): sum(pass_at_k(r["attempts"], r["correct_samples"], k) for r in sampled) / len(sampled)
+        for k in range(1, samples + 1)
+    }
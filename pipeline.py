@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import run_test
+from ollama_hosts import parse_hosts
+from run_test import (
+    ask_question,
+    build_attempt_stats,
+    build_question_result,
+    configure_grading,
+    configure_hosts,
+    configure_retry_policy,
+    grade_answers_grouped,
+    read_file_content,
+    unload_model
+)
+
+PIPELINE_DIR = "results/pipeline"
+
+class PipelineRun:
+    """Durable state of a two-phase run
+
+    Generated answers and their grades are appended to JSONL files in the run
+    directory as soon as they are produced, so the generation and grading
+    phases can run separately (and be resumed) against the same run.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.config_path = os.path.join(run_dir, "run.json")
+        self.answers_path = os.path.join(run_dir, "answers.jsonl")
+        self.grades_path = os.path.join(run_dir, "grades.jsonl")
+        self._lock = threading.Lock()
+
+        with open(self.config_path, "r") as f:
+            self.config = json.load(f)
+
+    @classmethod
+    def create(cls, run_id, config):
+        """Create a run directory, or reopen it if a run with this id already exists
+
+        A run is only reopened with the settings it was created with, so its
+        answers and grades never mix models, questions or grading profiles;
+        otherwise ValueError is raised.
+        """
+        run_dir = os.path.join(PIPELINE_DIR, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        config_path = os.path.join(run_dir, "run.json")
+        if not os.path.exists(config_path):
+            with open(config_path, "w") as f:
+                json.dump(config, f, indent=2)
+        else:
+            with open(config_path, "r") as f:
+                stored = json.load(f)
+            # Compared as stored in JSON, where tuples have become lists
+            config = json.loads(json.dumps(config))
+            changed = sorted(key for key in set(stored) | set(config) if stored.get(key) != config.get(key))
+            if changed:
+                raise ValueError(f"Pipeline run {run_id} was created with other settings ({', '.join(changed)}); "
+                                 f"use another --pipeline-run")
+            print(f"♻️ Resuming pipeline run {run_id}")
+        return cls(run_dir)
+
+    @classmethod
+    def open(cls, run_id):
+        """Open an existing run by id"""
+        return cls(os.path.join(PIPELINE_DIR, run_id))
+
+    def _append(self, path, record):
+        """Append a record and make sure it is on disk before returning"""
+        with self._lock:
+            with open(path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _load(self, path):
+        """Load records keyed by (question_index, attempt), ignoring a partially written last line"""
+        records = {}
+        if not os.path.exists(path):
+            return records
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[(record["question_index"], record["attempt"])] = record
+        return records
+
+    def append_answer(self, q_index, attempt, answer, duration, stats=None):
+        """Record a generated answer with its generation time and Ollama stats"""
+        self._append(self.answers_path, {
+            "question_index": q_index,
+            "attempt": attempt,
+            "answer": answer,
+            "duration": duration,
+            "stats": stats or []
+        })
+
+    def append_grade(self, q_index, attempt, grade):
+        """Record the grade of an answer"""
+        self._append(self.grades_path, {"question_index": q_index, "attempt": attempt, **grade})
+
+    def question_entries(self):
+        """The (question_index, question_data) pairs of the run, as given when it was created"""
+        return [(q_index, question_data) for q_index, question_data in self.config["questions"]]
+
+    def attempt_results(self, q_index, answers, grades):
+        """Combine the recorded answers and grades of a question's graded attempts, in attempt order"""
+        attempt_results = []
+        for attempt in sorted(attempt for (q, attempt) in grades if q == q_index):
+            grade = grades[(q_index, attempt)]
+            answer = answers[(q_index, attempt)]
+            attempt_results.append({
+                "answer": answer["answer"],
+                "evaluation": grade["evaluation"],
+                "assessment": grade["assessment"],
+                "score": grade["score"],
+                "consensus": grade["consensus"],
+                "stats": build_attempt_stats(answer.get("stats", []), grade.get("evaluation_stats", []))
+            })
+        return attempt_results
+
+    def stop_reason(self, q_index, question_data, attempt_results):
+        """Why a question gets no further attempts, or None if it goes back to generation"""
+        if not attempt_results:
+            return None
+        return run_test.retry_policy.stop_reason(self.config["test_model"], question_data["question_path"],
+                                                 attempt_results, self.config["max_attempts"])
+
+    def pending_generation(self):
+        """List the (question_index, attempt) units that need an answer next"""
+        answers = self._load(self.answers_path)
+        grades = self._load(self.grades_path)
+        units = []
+        for q_index, question_data in self.question_entries():
+            attempts = sorted(attempt for (q, attempt) in answers if q == q_index)
+            if not attempts:
+                units.append((q_index, 1))
+                continue
+
+            last_attempt = attempts[-1]
+            if (q_index, last_attempt) not in grades:
+                # Still waiting for the grading phase
+                continue
+
+            # Only questions the retry policy doesn't stop go back to generation
+            if self.stop_reason(q_index, question_data, self.attempt_results(q_index, answers, grades)) is None:
+                units.append((q_index, last_attempt + 1))
+        return units
+
+    def pending_grading(self):
+        """List the generated answers that have not been graded yet"""
+        grades = self._load(self.grades_path)
+        return [record for key, record in sorted(self._load(self.answers_path).items()) if key not in grades]
+
+    def assemble_results(self):
+        """Build the standard per-question results from the recorded answers and grades"""
+        answers = self._load(self.answers_path)
+        grades = self._load(self.grades_path)
+        results = []
+        for q_index, question_data in self.question_entries():
+            attempt_results = self.attempt_results(q_index, answers, grades)
+            stop_reason = self.stop_reason(q_index, question_data, attempt_results)
+            results.append(build_question_result(question_data, q_index, attempt_results, stop_reason))
+        return results
+
+def load_contents(run):
+    """Load question and reference answer contents for every question of a run"""
+    return {
+        q_index: (read_file_content(question_data["question_path"]), read_file_content(question_data["answer_path"]))
+        for q_index, question_data in run.question_entries()
+    }
+
+def generate_phase(run, executor=None):
+    """Phase 1: generate answers for all pending units and append each one as soon as it is ready"""
+    units = run.pending_generation()
+    if not units:
+        return 0
+
+    config = run.config
+    test_model = config["test_model"]
+    contents = load_contents(run)
+    print(f"\n⏳ Generating {len(units)} answer(s) with {test_model}... (timeout: {config['timeout_seconds']}s)")
+
+    def generate_unit(unit):
+        q_index, attempt = unit
+        start_time = time.time()
+        stats = []
+        answer = ask_question(
+            test_model,
+            contents[q_index][0],
+            timeout_seconds=config["timeout_seconds"],
+            system_prompt=config["system_prompt"],
+            thinking_start_tag=config["thinking_start_tag"],
+            thinking_end_tag=config["thinking_end_tag"],
+            stream=config["stream"],
+            max_tokens=config["max_tokens"],
+            max_chars=config["max_chars"],
+            keep_alive=config["keep_alive"],
+            stats=stats
+        )
+        run.append_answer(q_index, attempt, answer, time.time() - start_time, stats)
+
+    start_time = time.time()
+    if executor is None:
+        for unit in units:
+            generate_unit(unit)
+    else:
+        for future in [executor.submit(generate_unit, unit) for unit in units]:
+            future.result()
+    unload_model(test_model)
+
+    elapsed = time.time() - start_time
+    print(f"📝 Generated {len(units)} answer(s) in {elapsed:.1f}s ({len(units) / max(elapsed, 1e-9):.2f} answers/s)")
+    return len(units)
+
+def grade_phase(run, executor=None):
+    """Phase 2: grade all ungraded answers, grouped by evaluator"""
+    records = run.pending_grading()
+    if not records:
+        return 0
+
+    config = run.config
+    contents = load_contents(run)
+    print(f"\n⚖️ Grading {len(records)} answer(s)...")
+
+    start_time = time.time()
+    grades = grade_answers_grouped(
+        [(record["answer"], contents[record["question_index"]][1], contents[record["question_index"]][0])
+         for record in records],
+        config["evaluator1_model"],
+        config["evaluator2_model"],
+        keep_alive=config["keep_alive"],
+        executor=executor,
+        short_circuit=config.get("short_circuit_eval", False)
+    )
+    for record, grade in zip(records, grades):
+        run.append_grade(record["question_index"], record["attempt"], grade)
+        result_emoji = "✅" if grade["assessment"] == "correct" else "❌"
+        print(f"{result_emoji} Q{record['question_index']} attempt {record['attempt']}: {grade['assessment']} ({grade['score']}/5)")
+
+    elapsed = time.time() - start_time
+    print(f"📊 Graded {len(records)} answer(s) in {elapsed:.1f}s ({len(records) / max(elapsed, 1e-9):.2f} answers/s)")
+    return len(records)
+
+def run_pipeline(run, executor=None, settings=None):
+    """Alternate the two phases until every question is settled, then assemble the results
+
+    settings (from run_test.current_settings) are applied first when given.
+    """
+    if settings is not None:
+        run_test.apply_settings(settings)
+    while True:
+        # Grade first, so a resumed run doesn't regenerate answers that are only waiting for a grade
+        graded = grade_phase(run, executor)
+        generated = generate_phase(run, executor)
+        if not graded and not generated:
+            break
+    return run.assemble_results()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a single phase of a pipelined test run')
+    parser.add_argument('phase', choices=['generate', 'grade', 'status'], help='Phase to run, or status to show progress')
+    parser.add_argument('run_id', help=f'Id of a run created with run_test.py --schedule pipelined (under {PIPELINE_DIR}/)')
+    parser.add_argument('--concurrency', '-c', type=int, default=1, help='Number of requests to run in parallel (default: 1)')
+    parser.add_argument('--hosts', help='Comma separated Ollama hosts to load-balance across (default: OLLAMA_HOST)')
+    args = parser.parse_args()
+
+    if args.hosts:
+        configure_hosts(parse_hosts(args.hosts))
+
+    if not os.path.exists(os.path.join(PIPELINE_DIR, args.run_id, "run.json")):
+        print(f"❌ No pipeline run found at {os.path.join(PIPELINE_DIR, args.run_id)}")
+        return
+    run = PipelineRun.open(args.run_id)
+    # The run keeps the retry policy and grading profile it was created with
+    configure_retry_policy(run.config.get("retry_policy", "fixed"))
+    if "grading_profile" in run.config:
+        configure_grading(**run.config["grading_profile"])
+    else:
+        print("⚠️ This run was created before grading profiles were stored; grading with the default profile")
+
+    if args.phase == 'status':
+        print(f"📋 Run {args.run_id} ({run.config['test_model']})")
+        print(f"  - Answers waiting to be generated: {len(run.pending_generation())}")
+        print(f"  - Answers waiting to be graded: {len(run.pending_grading())}")
+        return
+
+    executor = ThreadPoolExecutor(max_workers=args.concurrency) if args.concurrency > 1 else None
+    try:
+        if args.phase == 'generate':
+            count = generate_phase(run, executor)
+        else:
+            count = grade_phase(run, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not count:
+        print(f"✓ Nothing to {args.phase} in run {args.run_id}")
+
+if __name__ == "__main__":
+    main()
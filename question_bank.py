@@ -0,0 +1,259 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PATH = "questions.json"
+
+# Bump when the manifest layout changes, so old manifests are rebuilt
+MANIFEST_VERSION = 2
+
+def manifest_path(questions_path):
+    """The manifest of questions.json is questions.manifest.json next to it"""
+    return os.path.splitext(questions_path)[0] + ".manifest.json"
+
+def resolve(file_path):
+    """Absolute path of a file given relative to the repository, like the paths in questions.json"""
+    return os.path.join(BASE_DIR, file_path)
+
+def file_info(file_path, previous=None):
+    """Size, mtime and content hash of a question or answer file
+
+    The hash is taken over from the previous manifest entry when the size
+    and mtime are unchanged, so only new or edited files are read.
+    """
+    stat = os.stat(resolve(file_path))
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+        return previous
+    with open(resolve(file_path), "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+
+def compile_manifest(questions_path=QUESTIONS_PATH, previous=None):
+    """Build the manifest of a question list: one entry per question, and the sizes and hashes of their files
+
+    A missing question or answer file gets None instead of its info, so one
+    missing file doesn't keep the other questions from being listed.
+    """
+    with open(resolve(questions_path), "r") as f:
+        questions = json.load(f)
+    previous_files = (previous or {}).get("files", {})
+
+    files = {}
+    entries = []
+    for i, q in enumerate(questions, 1):
+        for path in (q["question"], q["answer"]):
+            if path not in files:
+                try:
+                    files[path] = file_info(path, previous_files.get(path))
+                except OSError as e:
+                    print(f"⚠️ Missing file of question {i}: {str(e)}")
+                    files[path] = None
+        entries.append({
+            **q,
+            "index": i,
+            "short_name": q.get("short_name", f"Q{i}"),
+            "human_difficulty": q.get("human_difficulty", "3"),
+            "ai_difficulty": q.get("ai_difficulty", "3"),
+            "tags": q.get("tags", [])
+        })
+
+    stat = os.stat(resolve(questions_path))
+    return {
+        "version": MANIFEST_VERSION,
+        "questions_size": stat.st_size,
+        "questions_mtime": stat.st_mtime,
+        "files": files,
+        "questions": entries
+    }
+
+def load_manifest(questions_path=QUESTIONS_PATH, refresh=False):
+    """Load the manifest of a question list, compiling it again if questions.json changed
+
+    Only questions.json is checked, so loading stays cheap however many
+    question files there are; refresh=True also checks every question and
+    answer file and rehashes the ones that changed. The file infos of a
+    manifest loaded without refresh can be stale, so the hash of a file is
+    read through QuestionBank.file_hash, which checks it first.
+    """
+    path = resolve(manifest_path(questions_path))
+    manifest = None
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    stat = os.stat(resolve(questions_path))
+    if (not refresh and manifest and manifest.get("version") == MANIFEST_VERSION and
+            manifest["questions_size"] == stat.st_size and manifest["questions_mtime"] == stat.st_mtime):
+        return manifest
+
+    new_manifest = compile_manifest(questions_path, manifest if manifest and manifest.get("version") == MANIFEST_VERSION else None)
+    if new_manifest != manifest:
+        # Written atomically, so parallel runs never read a half-written manifest
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(new_manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    return new_manifest
+
+def parse_index_spec(spec):
+    """Parse question indices like "1-10,15" into a sorted list
+
+    Empty, reversed (e.g. "3-1") and non-positive ranges are rejected, since
+    they would select nothing and the run would silently cover every question.
+    """
+    indices = set()
+    try:
+        for part in spec.split(","):
+            start, _, end = part.strip().partition("-")
+            start, end = int(start), int(end or start)
+            if not 1 <= start <= end:
+                raise ValueError(part)
+            indices.update(range(start, end + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid question indices '{spec}' (expected e.g. 1-10,15)")
+    return sorted(indices)
+
+def parse_shard(spec):
+    """Parse a shard like "3/8" (the third of eight shards) into [3, 8]"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{spec}' (expected INDEX/COUNT, e.g. 3/8)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}")
+    return [index, count]
+
+def shard_of(entry, count):
+    """Shard (1..count) a question belongs to, from a hash of its question path
+
+    The path is hashed rather than the position or content, so questions
+    keep their shard when others are added or a question is edited.
+    """
+    return int(hashlib.sha256(entry["question"].encode()).hexdigest(), 16) % count + 1
+
+def matches(entry, tags=None, ai_difficulty=None, human_difficulty=None, indices=None, short_names=None, shard=None):
+    """Whether a manifest entry passes every given filter
+
+    tags selects questions with any of the tags; the other collections list
+    the accepted difficulties, indices and short names; shard is [index, count].
+    """
+    if tags and not set(tags) & set(entry["tags"]):
+        return False
+    if ai_difficulty and str(entry["ai_difficulty"]) not in {str(d) for d in ai_difficulty}:
+        return False
+    if human_difficulty and str(entry["human_difficulty"]) not in {str(d) for d in human_difficulty}:
+        return False
+    if indices and entry["index"] not in indices:
+        return False
+    if short_names and entry["short_name"] not in short_names:
+        return False
+    if shard and shard_of(entry, shard[1]) != shard[0]:
+        return False
+    return True
+
+def add_selection_arguments(parser):
+    """Add the command line options that select a subset of the questions"""
+    parser.add_argument('--tag', action='append', help='Only questions with this tag (can be repeated)')
+    parser.add_argument('--ai-difficulty', action='append', help='Only questions of this AI difficulty (can be repeated)')
+    parser.add_argument('--human-difficulty', action='append', help='Only questions of this human difficulty (can be repeated)')
+    parser.add_argument('--question-index', type=parse_index_spec, help='Only questions at these positions in questions.json (e.g. 1-10,15)')
+    parser.add_argument('--question-name', action='append', help='Only the question with this short_name (can be repeated)')
+    parser.add_argument('--shard', type=parse_shard, help='Only the questions of one hash-based shard, e.g. 3/8 for the third of eight')
+
+def selection_from_args(args):
+    """The question filters given on the command line, as keyword arguments of QuestionBank.questions"""
+    selection = {
+        "tags": args.tag,
+        "ai_difficulty": args.ai_difficulty,
+        "human_difficulty": args.human_difficulty,
+        "indices": args.question_index,
+        "short_names": args.question_name,
+        "shard": args.shard
+    }
+    return {key: value for key, value in selection.items() if value}
+
+class QuestionBank:
+    """Questions of a question list, described by its manifest, with lazily loaded content
+
+    Question and answer files are only read when their content is first
+    needed and then kept in memory, so selecting questions never touches
+    their files.
+    """
+
+    def __init__(self, questions_path=QUESTIONS_PATH, refresh=False):
+        self.questions_path = questions_path
+        self.manifest = load_manifest(questions_path, refresh)
+        self._contents = {}
+        self._lock = threading.Lock()
+
+    def questions(self, **filters):
+        """The question entries in order, optionally filtered (see matches)"""
+        if filters.get("indices"):
+            filters["indices"] = set(filters["indices"])
+        return [entry for entry in self.manifest["questions"] if matches(entry, **filters)]
+
+    def file_hash(self, file_path):
+        """sha256 of a question or answer file as it is now, or None if it is missing
+
+        The manifest's hash is checked against the file's size and mtime
+        first, and the file is only read again if they changed.
+        """
+        with self._lock:
+            previous = self.manifest["files"].get(file_path)
+        try:
+            info = file_info(file_path, previous)
+        except OSError:
+            return None
+        with self._lock:
+            self.manifest["files"][file_path] = info
+        return info["sha256"]
+
+    def content(self, file_path):
+        """Content of a question or answer file, read on first use"""
+        with self._lock:
+            if file_path in self._contents:
+                return self._contents[file_path]
+        with open(resolve(file_path), "r") as f:
+            content = f.read()
+        with self._lock:
+            return self._contents.setdefault(file_path, content)
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+def get_bank(questions_path=QUESTIONS_PATH):
+    """The shared QuestionBank of a question list"""
+    with _banks_lock:
+        if questions_path not in _banks:
+            _banks[questions_path] = QuestionBank(questions_path)
+        return _banks[questions_path]
+
+def read_content(file_path, questions_path=QUESTIONS_PATH):
+    """Content of a question or answer file, memoized in the shared bank"""
+    return get_bank(questions_path).content(file_path)
+
+def file_hash(file_path, questions_path=QUESTIONS_PATH):
+    """Current sha256 of a question or answer file, checked through the shared bank"""
+    return get_bank(questions_path).file_hash(file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the manifest of the question bank and list its questions')
+    parser.add_argument('--questions', default=QUESTIONS_PATH, help=f'Question list to compile (default: {QUESTIONS_PATH})')
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    bank = QuestionBank(args.questions, refresh=True)
+    questions = bank.questions(**selection_from_args(args))
+    print(f"📚 {manifest_path(args.questions)}: {len(bank.manifest['questions'])} question(s), "
+          f"{len(bank.manifest['files'])} file(s)")
+    for entry in questions:
+        tags = f" [{', '.join(entry['tags'])}]" if entry["tags"] else ""
+        print(f"  Q{entry['index']} {entry['short_name']} (AI {entry['ai_difficulty']}, human {entry['human_difficulty']}){tags}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eval_cache import DEFAULT_MAX_MB
+from ollama_hosts import parse_hosts
+from pass_at_k import summarize_pass_at_k
+from results_store import load_result
+from run_test import (
+    DEFAULT_KEEP_ALIVE,
+    build_attempt_stats,
+    build_metadata,
+    build_question_result,
+    check_and_prepare_models,
+    add_grading_arguments,
+    configure_eval_cache,
+    configure_grading_from_args,
+    configure_hosts,
+    grade_answers_grouped,
+    read_file_content,
+    save_results
+)
+
+# Metadata keys that build_metadata computes again for the regraded results
+RECOMPUTED_METADATA = {
+    "test_model", "display_name", "evaluator1_model", "evaluator2_model", "timestamp", "total_score",
+    "max_possible_score", "score_percentage", "correct_answers", "total_questions", "correct_percentage",
+    "total_attempts", "avg_attempts", "max_attempts_allowed", "dual_evaluator_used", "grading_profile", "call_stats",
+    "stop_reasons", "pass_at_k"
+}
+
+def collect_items(file_path, result, contents):
+    """List the (file, question position, attempt, grading item) units of a result file"""
+    units = []
+    for position, item in enumerate(result["results"]):
+        for path in (item["question_path"], item["answer_path"]):
+            if path not in contents:
+                contents[path] = read_file_content(path)
+        question = contents[item["question_path"]]
+        model_answer = contents[item["answer_path"]]
+        for attempt, answer in enumerate(item["test_subject_answers"]):
+            units.append((file_path, position, attempt, (answer, model_answer, question)))
+    return units
+
+def rebuild_question(item, grades, sampled=False):
+    """Rebuild a question result from its stored answers and their new grades
+
+    Only graded attempts are kept: grading stops at the first attempt that is
+    now correct, since the run would have stopped there. The samples of a
+    pass@k run (sampled=True) are all graded and kept.
+    """
+    old_stats = item.get("stats") or []
+    attempt_results = []
+    for attempt, (answer, grade) in enumerate(zip(item["test_subject_answers"], grades)):
+        answer_stats = old_stats[attempt]["answer"] if attempt < len(old_stats) and old_stats[attempt] else None
+        attempt_results.append({
+            "answer": answer,
+            "evaluation": grade["evaluation"],
+            "assessment": grade["assessment"],
+            "score": grade["score"],
+            "consensus": grade["consensus"],
+            "stats": build_attempt_stats([answer_stats] if answer_stats else [], grade["evaluation_stats"])
+        })
+
+    question_data = {
+        "question_path": item["question_path"],
+        "answer_path": item["answer_path"],
+        "short_name": item.get("short_name", f"Q{item['question_index']}"),
+        "question_sha256": item.get("question_sha256"),
+        "answer_sha256": item.get("answer_sha256")
+    }
+    if sampled:
+        result = build_question_result(question_data, item["question_index"], attempt_results, "samples")
+        result["correct_samples"] = sum(1 for r in attempt_results if r["assessment"] == "correct")
+        result["sample_seeds"] = item.get("sample_seeds")
+        return result
+
+    if attempt_results and attempt_results[-1]["assessment"] == "correct":
+        stop_reason = "correct"
+    elif item.get("stop_reason") != "correct":
+        # A wrong last attempt stopped for the same reason as in the original run
+        stop_reason = item.get("stop_reason")
+    else:
+        # The run stopped on an answer that is no longer graded correct
+        stop_reason = None
+    return build_question_result(question_data, item["question_index"], attempt_results, stop_reason)
+
+def regrade_files(file_paths, evaluator1_model, evaluator2_model=None, keep_alive=DEFAULT_KEEP_ALIVE, executor=None):
+    """Grade the stored answers of several result files again with other evaluators
+
+    The answers of all files are graded together in evaluator-grouped phases,
+    so each evaluator is loaded once per round. Round n grades attempt n of
+    the questions that have no correct attempt yet, so attempts after the
+    first correct one are never graded; the samples of pass@k files are all
+    graded in the first round. Skipped and empty answers are graded wrong
+    without asking the evaluators.
+    Returns {file_path: (results, metadata, model_name)}.
+    """
+    sources = {file_path: load_result(file_path) for file_path in file_paths}
+    sampled_files = {file_path for file_path, result in sources.items() if result["metadata"].get("samples")}
+    contents = {}
+    question_units = {}
+    for file_path, result in sources.items():
+        for unit in collect_items(file_path, result, contents):
+            question_units.setdefault(unit[:2], []).append(unit)
+    total_units = sum(len(units) for units in question_units.values())
+
+    print(f"⚖️ Regrading up to {total_units} answer(s) from {len(file_paths)} file(s) with {evaluator1_model}" +
+          (f" and {evaluator2_model}" if evaluator2_model else ""))
+    start_time = time.time()
+    # Grades of each question, in attempt order
+    question_grades = {key: [] for key in question_units}
+    graded_count = 0
+    while True:
+        batch = []
+        for key, units in question_units.items():
+            graded = question_grades[key]
+            if key[0] in sampled_files:
+                if not graded:
+                    batch.extend(units)
+            elif len(graded) < len(units) and not (graded and graded[-1]["assessment"] == "correct"):
+                batch.append(units[len(graded)])
+        if not batch:
+            break
+        grades = grade_answers_grouped([unit[3] for unit in batch], evaluator1_model, evaluator2_model,
+                                       keep_alive=keep_alive, executor=executor, short_circuit=True)
+        for unit, grade in zip(batch, grades):
+            question_grades[unit[:2]].append(grade)
+        graded_count += len(batch)
+    elapsed = time.time() - start_time
+    print(f"📊 Regraded {graded_count} answer(s) in {elapsed:.1f}s ({graded_count / max(elapsed, 1e-9):.2f} answers/s)")
+
+    regraded = {}
+    for file_path, result in sources.items():
+        old_metadata = result["metadata"]
+        samples = old_metadata.get("samples")
+        results = [rebuild_question(item, question_grades.get((file_path, position), []), sampled=bool(samples))
+                   for position, item in enumerate(result["results"])]
+
+        test_model = old_metadata.get("test_model", "unknown")
+        model_name = old_metadata.get("display_name") or test_model
+        settings = {key: value for key, value in old_metadata.items() if key not in RECOMPUTED_METADATA}
+        settings.update({
+            "regraded_from": file_path,
+            "original_evaluators": [old_metadata.get("evaluator1_model"), old_metadata.get("evaluator2_model")]
+        })
+        if samples:
+            settings["pass_at_k"] = summarize_pass_at_k(results, samples)
+        metadata = build_metadata(test_model, model_name, evaluator1_model, evaluator2_model, results,
+                                  old_metadata.get("max_attempts_allowed", 5), **settings)
+        regraded[file_path] = (results, metadata, model_name)
+    return regraded
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade the stored answers of existing result files again with other evaluators')
+    parser.add_argument('files', nargs='+', help='Result files to regrade (results/results_*.json or *.scores.jsonl)')
+    parser.add_argument('--evaluator', '-e', default='deepseek-r1:14b', help='Primary evaluator model (default: deepseek-r1:14b)')
+    parser.add_argument('--evaluator2', '-e2', default="mistral-small", help='Second evaluator model for consensus (default: mistral-small)')
+    parser.add_argument('--concurrency', '-c', type=int, default=1, help='Number of evaluator requests to run in parallel (default: 1)')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE, help=f'How long each evaluator stays loaded during its phase (default: {DEFAULT_KEEP_ALIVE})')
+    parser.add_argument('--results-format', choices=['json', 'compact'], default='json', help='Format of the regraded result files (default: json)')
+    parser.add_argument('--hosts', help='Comma separated Ollama hosts to load-balance across (default: OLLAMA_HOST)')
+    parser.add_argument('--no-eval-cache', action='store_true', help='Disable the on-disk cache of evaluator responses')
+    parser.add_argument('--eval-cache-max-mb', type=int, default=DEFAULT_MAX_MB, help=f'Maximum size of the evaluation cache in MB (default: {DEFAULT_MAX_MB})')
+    add_grading_arguments(parser)
+    args = parser.parse_args()
+
+    configure_eval_cache(not args.no_eval_cache, max_mb=args.eval_cache_max_mb)
+    configure_grading_from_args(args)
+    if args.hosts:
+        configure_hosts(parse_hosts(args.hosts))
+
+    print("🔍 Checking for required models...")
+    check_and_prepare_models([], args.evaluator, args.evaluator2)
+
+    executor = ThreadPoolExecutor(max_workers=args.concurrency) if args.concurrency > 1 else None
+    try:
+        regraded = regrade_files(args.files, args.evaluator, args.evaluator2, args.keep_alive, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for results, metadata, model_name in regraded.values():
+        save_results(model_name, results, metadata, args.results_format)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where only the threads of one process are kept apart
+    fcntl = None
+
+from results_store import READ_ERRORS, SCORES_SUFFIX, load_summary
+
+RESULTS_DIR = "results"
+INDEX_PATH = "results/index.json"
+
+# Per-question fields kept in the index (everything the results table needs)
+SUMMARY_FIELDS = ["question_index", "question_path", "short_name", "assessment", "best_score", "attempts", "timeout",
+                  "correct_samples"]
+
+def extract_model_and_timestamp(filename):
+    """Extract model name and timestamp from a filename"""
+    basename = os.path.basename(filename)
+
+    # Try different patterns to extract information
+    patterns = [
+        r"results_(.+?)_(\d{8}-\d{6})(?:-(\d+))?(?:\.json|\.scores\.jsonl)$",  # Standard format with hyphenated timestamp
+        r"results_([^_]+)_(.+?)()(?:\.json|\.scores\.jsonl)$"                  # More generic fallback pattern
+    ]
+
+    for pattern in patterns:
+        match = re.search(pattern, basename)
+        if match:
+            model_name, timestamp, number = match.groups()
+            timestamp_clean = timestamp.replace("-", "")  # Normalize for comparison
+            if number:
+                # A file saved in the same second as another one (see results_store.reserve_path) sorts after it
+                timestamp_clean += f"{int(number):03d}"
+            return model_name, timestamp_clean
+
+    # Fallback if no pattern matches
+    print(f"  ⚠️ Using fallback: treating whole file as one result")
+    model_name = basename.replace("results_", "").replace(SCORES_SUFFIX, "").replace(".json", "")
+    return model_name, "0"  # Use "0" as timestamp to rank it last
+
+def summarize_result(result):
+    """Keep the metadata and the per-question summary fields of a result, without any transcripts"""
+    return {
+        "metadata": result.get("metadata", {}),
+        "questions": [{field: item.get(field) for field in SUMMARY_FIELDS} for item in result.get("results", [])]
+    }
+
+# Serializes the load-modify-save cycles of the index between threads; the lock file does so between processes
+_index_lock = threading.Lock()
+
+@contextmanager
+def locked_index(index_path=INDEX_PATH):
+    """Context manager that holds the index for a load-modify-save cycle"""
+    with _index_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        with open(f"{index_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_index(index_path=INDEX_PATH):
+    """Load the index, or an empty one if it does not exist or can't be read"""
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"⚠️ Rebuilding unreadable results index {index_path}: {str(e)}")
+        return {}
+
+def save_index(index, index_path=INDEX_PATH):
+    """Write the index atomically, so an interrupted write never leaves a broken index behind"""
+    # Unique per writer, so concurrent writers never replace each other's temporary file
+    tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+def index_entry(file_path, result):
+    """Build the index entry of a result file from its current size and mtime"""
+    stat = os.stat(file_path)
+    model_name, timestamp = extract_model_and_timestamp(file_path)
+    return {
+        "model": model_name,
+        "timestamp": timestamp,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        **summarize_result(result)
+    }
+
+def update_index(file_path, result, index_path=INDEX_PATH):
+    """Add a result file that was just written to the index"""
+    with locked_index(index_path):
+        index = load_index(index_path)
+        index[file_path] = index_entry(file_path, result)
+        save_index(index, index_path)
+
+def refresh_index(results_dir=RESULTS_DIR, index_path=INDEX_PATH):
+    """Bring the index up to date with the result files on disk
+
+    Only files that are new or whose mtime or size changed are read; entries
+    of deleted files are dropped. Returns the index keyed by file path.
+    """
+    with locked_index(index_path):
+        index = load_index(index_path)
+        changed = False
+
+        current_files = set()
+        with os.scandir(results_dir) as entries:
+            for entry in entries:
+                if not (entry.name.startswith("results_") and entry.name.endswith((".json", SCORES_SUFFIX))):
+                    continue
+                file_path = f"{results_dir}/{entry.name}"
+                current_files.add(file_path)
+
+                stat = entry.stat()
+                indexed = index.get(file_path)
+                if indexed and indexed["mtime"] == stat.st_mtime and indexed["size"] == stat.st_size:
+                    continue
+
+                try:
+                    # Only the fields the index keeps are read out of the file
+                    result = load_summary(file_path, SUMMARY_FIELDS)
+                except READ_ERRORS as e:
+                    print(f"⚠️ Skipping unreadable result file {file_path}: {str(e)}")
+                    continue
+                index[file_path] = index_entry(file_path, result)
+                changed = True
+
+        for file_path in set(index) - current_files:
+            del index[file_path]
+            changed = True
+
+        if changed:
+            save_index(index, index_path)
+    return index
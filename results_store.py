@@ -0,0 +1,148 @@
+import gzip
+import json
+
+try:
+    import ijson
+    STREAMING_AVAILABLE = True
+except ImportError:
+    STREAMING_AVAILABLE = False
+
+# A compact result is stored as two files next to each other:
+#   results_<model>_<ts>.scores.jsonl         - metadata line, then one small record per question
+#   results_<model>_<ts>.transcripts.jsonl.gz - full answers, evaluations and stats per question
+SCORES_SUFFIX = ".scores.jsonl"
+TRANSCRIPTS_SUFFIX = ".transcripts.jsonl.gz"
+
+# Per-question fields that go to the transcripts file instead of the score records
+TRANSCRIPT_FIELDS = ["test_subject_answers", "evaluations", "stats"]
+
+# ijson events that carry a single value
+SCALAR_EVENTS = {"null", "boolean", "integer", "double", "number", "string"}
+
+# Errors raised when a result file is missing, truncated or not valid JSON
+READ_ERRORS = (ValueError, OSError) + ((ijson.JSONError,) if STREAMING_AVAILABLE else ())
+
+def is_compact(file_path):
+    return file_path.endswith(SCORES_SUFFIX)
+
+def transcripts_path(scores_path):
+    return scores_path[:-len(SCORES_SUFFIX)] + TRANSCRIPTS_SUFFIX
+
+def reserve_path(base_path, suffix):
+    """Claim a new result file name by creating the file base_path + suffix, still empty
+
+    If the name is taken (models sharing a display name, or two runs of a
+    model finishing in the same second), -2, -3... is appended to base_path.
+    Returns the base path that was claimed.
+    """
+    candidate = base_path
+    number = 1
+    while True:
+        try:
+            with open(candidate + suffix, "x"):
+                return candidate
+        except FileExistsError:
+            number += 1
+            candidate = f"{base_path}-{number}"
+
+def save_compact(base_path, metadata, results):
+    """Save results as score records plus compressed transcripts, returning the path of the scores file"""
+    scores_path = base_path + SCORES_SUFFIX
+
+    # Transcripts first, so a scores file never refers to transcripts that were not written
+    with gzip.open(transcripts_path(scores_path), "wt", encoding="utf-8") as f:
+        for result in results:
+            record = {"id": f"q{result['question_index']}"}
+            record.update({field: result.get(field) for field in TRANSCRIPT_FIELDS})
+            f.write(json.dumps(record) + "\n")
+
+    with open(scores_path, "w") as f:
+        f.write(json.dumps({"type": "metadata", **metadata}) + "\n")
+        for result in results:
+            record = {"type": "question", "transcript_id": f"q{result['question_index']}"}
+            record.update({key: value for key, value in result.items() if key not in TRANSCRIPT_FIELDS})
+            f.write(json.dumps(record) + "\n")
+
+    return scores_path
+
+def load_scores(scores_path):
+    """Load the metadata and score records of a compact result, without its transcripts"""
+    metadata = {}
+    results = []
+    with open(scores_path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            record_type = record.pop("type")
+            if record_type == "metadata":
+                metadata = record
+            elif record_type == "question":
+                results.append(record)
+    return {"metadata": metadata, "results": results}
+
+def load_transcripts(scores_path):
+    """Load the transcripts of a compact result, keyed by transcript id"""
+    transcripts = {}
+    with gzip.open(transcripts_path(scores_path), "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            transcripts[record.pop("id")] = record
+    return transcripts
+
+def load_result(file_path, transcripts=True):
+    """Load a result file in either format as {"metadata", "results"}
+
+    With transcripts=False, compact results are read from their scores file only.
+    """
+    if not is_compact(file_path):
+        with open(file_path, "r") as f:
+            return json.load(f)
+
+    result = load_scores(file_path)
+    if transcripts:
+        transcript_records = load_transcripts(file_path)
+        for item in result["results"]:
+            item.update(transcript_records.get(item["transcript_id"], {}))
+    return result
+
+def _stream_summary(f, fields):
+    """Pick the metadata and the given scalar per-question fields out of a JSON result as it is parsed
+
+    Transcript strings are dropped as soon as the parser has passed them, so
+    memory use doesn't depend on how long the answers and evaluations are.
+    """
+    wanted = {f"results.item.{field}": field for field in fields}
+    metadata = {}
+    results = []
+    metadata_builder = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix == "metadata" and event == "start_map":
+            metadata_builder = ijson.ObjectBuilder()
+        if metadata_builder is not None:
+            metadata_builder.event(event, value)
+            if prefix == "metadata" and event == "end_map":
+                metadata = metadata_builder.value
+                metadata_builder = None
+        elif prefix == "results.item" and event == "start_map":
+            results.append({field: None for field in fields})
+        elif prefix in wanted and event in SCALAR_EVENTS:
+            results[-1][wanted[prefix]] = value
+    return {"metadata": metadata, "results": results}
+
+def load_summary(file_path, fields):
+    """Load the metadata and the given per-question fields of a result file in either format
+
+    JSON results are streamed with ijson when it is installed, so their
+    transcripts are never held in memory; without it the file is loaded whole.
+    """
+    if is_compact(file_path):
+        result = load_scores(file_path)
+    elif STREAMING_AVAILABLE:
+        with open(file_path, "rb") as f:
+            return _stream_summary(f, fields)
+    else:
+        with open(file_path, "r") as f:
+            result = json.load(f)
+    return {
+        "metadata": result.get("metadata", {}),
+        "results": [{field: item.get(field) for field in fields} for item in result.get("results", [])]
+    }
@@ -0,0 +1,125 @@
+import difflib
+import math
+import os
+
+from results_index import RESULTS_DIR, refresh_index
+
+# Answers at least this similar (difflib ratio) count as the same answer
+DUPLICATE_SIMILARITY = 0.9
+
+# z of the one-sided upper confidence bound on the per-attempt success rate (about 84%)
+CONFIDENCE_Z = 1.0
+
+# Stop when even the optimistic chance that one of the remaining attempts succeeds is below this
+MIN_SUCCESS_CHANCE = 0.25
+
+# Why a question got no further attempts, as recorded in its stop_reason
+STOP_REASONS = {
+    "correct": "answered correctly",
+    "timeout": "the answer timed out",
+    "max_attempts": "no attempts left",
+    "duplicate_answer": "the model gave the same wrong answer again",
+    "unlikely_to_succeed": "the model has rarely or never solved this question before",
+    "samples": "all samples were drawn (pass@k mode, no retries)"
+}
+
+def answer_similarity(answer1, answer2):
+    """Similarity of two answers between 0 and 1, ignoring differences in whitespace"""
+    answer1 = " ".join(answer1.split())
+    answer2 = " ".join(answer2.split())
+    if answer1 == answer2:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, answer1, answer2, autojunk=False)
+    # The quick ratios are upper bounds, so most different answers never reach the slow comparison
+    if matcher.real_quick_ratio() < DUPLICATE_SIMILARITY or matcher.quick_ratio() < DUPLICATE_SIMILARITY:
+        return matcher.quick_ratio()
+    return matcher.ratio()
+
+def wilson_upper_bound(successes, trials, z=CONFIDENCE_Z):
+    """Upper bound of the Wilson score interval of a success rate"""
+    if trials == 0:
+        return 1.0
+    p = successes / trials
+    center = p + z * z / (2 * trials)
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials))
+    return min(1.0, (center + margin) / (1 + z * z / trials))
+
+def load_history(results_dir=RESULTS_DIR):
+    """Count earlier attempts and successes per (test model, question path) in the results index
+
+    Every attempt is counted once per source run: regraded copies of a
+    result file (see regrade.py) hold the same attempts as their source, so
+    they are left out, and when the files of a sharded run overlap, only the
+    latest result of each question counts.
+    """
+    history = {}
+    if not os.path.isdir(results_dir):
+        return history
+
+    # Latest (timestamp, question result) per (source run, test model, question path)
+    latest = {}
+    for file_path, entry in refresh_index(results_dir).items():
+        metadata = entry["metadata"]
+        if metadata.get("regraded_from"):
+            continue
+        source = metadata.get("shard_run") or file_path
+        for question in entry["questions"]:
+            if not question.get("attempts"):
+                continue
+            key = (source, metadata.get("test_model"), question["question_path"])
+            if key not in latest or entry["timestamp"] > latest[key][0]:
+                latest[key] = (entry["timestamp"], question)
+
+    for (_, test_model, question_path), (_, question) in latest.items():
+        key = (test_model, question_path)
+        attempts, successes = history.get(key, (0, 0))
+        # pass@k runs count every correct sample; retry runs stop at their only correct attempt
+        correct = question.get("correct_samples")
+        if correct is None:
+            correct = question["assessment"] == "correct"
+        history[key] = (attempts + question["attempts"], successes + correct)
+    return history
+
+def is_error_answer(answer):
+    """Check if an answer is an error or timeout placeholder instead of something the model said"""
+    return answer.startswith(("[ERROR:", "[TIMEOUT ERROR:"))
+
+class RetryPolicy:
+    """Decide whether a question gets another attempt after a wrong answer
+
+    The fixed policy retries until max_attempts. The adaptive policy also
+    stops when the model repeats a wrong answer, or when earlier runs of the
+    same model on the same question make a success in the remaining attempts
+    unlikely even by an optimistic estimate.
+    """
+
+    def __init__(self, adaptive=False, history=None):
+        self.adaptive = adaptive
+        self.history = history or {}
+
+    def stop_reason(self, test_model, question_path, attempt_results, max_attempts):
+        """Return why no further attempt should be made (see STOP_REASONS), or None to try again"""
+        last = attempt_results[-1]
+        if last["assessment"] == "correct":
+            return "correct"
+        if last["answer"].startswith("[TIMEOUT ERROR:"):
+            return "timeout"
+        if len(attempt_results) >= max_attempts:
+            return "max_attempts"
+        if not self.adaptive:
+            return None
+
+        # Error placeholders look alike whatever the model would have answered, so they are never duplicates
+        if not is_error_answer(last["answer"]) and any(
+                answer_similarity(last["answer"], r["answer"]) >= DUPLICATE_SIMILARITY
+                for r in attempt_results[:-1] if not is_error_answer(r["answer"])):
+            return "duplicate_answer"
+
+        # Only extrapolate from earlier runs, never from the current run alone
+        prior_attempts, prior_successes = self.history.get((test_model, question_path), (0, 0))
+        if prior_attempts:
+            upper = wilson_upper_bound(prior_successes, prior_attempts + len(attempt_results))
+            remaining = max_attempts - len(attempt_results)
+            if 1 - (1 - upper) ** remaining < MIN_SUCCESS_CHANCE:
+                return "unlikely_to_succeed"
+        return None
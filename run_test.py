@@ -2,14 +2,26 @@ import argparse
 import json
 import os
 from tqdm import tqdm
-from ollama import generate, list, pull
+from ollama import Client, list, pull
+import httpx
 import time
 import sys
-import signal
-from contextlib import contextmanager
 import threading
 import re
+import queue
+from contextlib import contextmanager
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from eval_cache import EvaluationCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_MB
+from checkpoint import CheckpointJournal, new_run_id
+from call_stats import response_stats, truncated_stats, summarize_results_stats, format_call_summary
+from pass_at_k import summarize_pass_at_k
+from results_index import update_index
+from results_store import SCORES_SUFFIX, reserve_path, save_compact
+from ollama_hosts import HostPool, is_host_failure, parse_hosts
+from retry_policy import RetryPolicy, STOP_REASONS, load_history
+from question_bank import add_selection_arguments, file_hash, get_bank, read_content, selection_from_args
 
 # Import table generation functionality
 try:
@@ -19,68 +31,175 @@ except ImportError as e:
     generate_table = None
     update_readme_with_table = None
 
+class ThinkingFilter:
+    """Incrementally remove thinking sections from a response fed in chunks
+    
+    Thinking content is discarded as it arrives instead of being buffered, and
+    tags split across chunk boundaries are handled by holding back any text
+    that could be the beginning of a tag. A thinking section that is never
+    closed is dropped, since the model never got to its answer.
+    """
+    
+    def __init__(self, thinking_start_tag, thinking_end_tag):
+        self.thinking_start_tag = thinking_start_tag
+        self.thinking_end_tag = thinking_end_tag
+        self.enabled = bool(thinking_start_tag and thinking_end_tag)
+        self.in_thinking = False
+        self.thinking_closed = False  # True once at least one thinking section has ended
+        self.answered = False  # True once answer text followed a closed thinking section
+        self.rethinking = False  # True once a new thinking section started after that answer
+        self._pending = ""  # Text that might be the start of a tag
+        self._visible_parts = []
+    
+    def feed(self, chunk):
+        """Feed the next chunk of the response and return the newly visible text"""
+        if not self.enabled:
+            self._visible_parts.append(chunk)
+            return chunk
+        
+        text = self._pending + chunk
+        self._pending = ""
+        visible = ""
+        
+        while text:
+            tag = self.thinking_end_tag if self.in_thinking else self.thinking_start_tag
+            tag_pos = text.find(tag)
+            
+            if tag_pos != -1:
+                if not self.in_thinking:
+                    visible += text[:tag_pos]
+                    self._note_answer(visible)
+                    self.rethinking = self.answered
+                else:
+                    self.thinking_closed = True
+                self.in_thinking = not self.in_thinking
+                text = text[tag_pos + len(tag):]
+                continue
+            
+            # Hold back a trailing partial tag until the next chunk arrives
+            keep = next((n for n in range(min(len(tag) - 1, len(text)), 0, -1) if text.endswith(tag[:n])), 0)
+            if not self.in_thinking:
+                visible += text[:len(text) - keep]
+                self._note_answer(visible)
+            self._pending = text[len(text) - keep:]
+            break
+        
+        if visible:
+            self._visible_parts.append(visible)
+        return visible
+    
+    def _note_answer(self, visible):
+        if self.thinking_closed and visible.strip():
+            self.answered = True
+    
+    def flush(self):
+        """Release any held back text at the end of the response"""
+        visible = "" if self.in_thinking else self._pending
+        self._pending = ""
+        if visible:
+            self._visible_parts.append(visible)
+        return visible
+    
+    def get_answer(self):
+        """Get the visible answer seen so far"""
+        answer = "".join(self._visible_parts)
+        if self.enabled:
+            # Clean up any resulting double newlines
+            answer = re.sub(r'\n{3,}', '\n\n', answer).strip()
+        return answer
+
 def strip_thinking(response, thinking_start_tag, thinking_end_tag):
     """Remove thinking section from response if tags are provided"""
     if not thinking_start_tag or not thinking_end_tag or not response:
         return response
     
     try:
-        # Create pattern to match content between tags (including the tags)
-        pattern = re.compile(f'{re.escape(thinking_start_tag)}.*?{re.escape(thinking_end_tag)}', 
-                             re.DOTALL)
-        
-        # Replace the matched content with empty string
-        stripped_response = pattern.sub('', response)
-        
-        # Clean up any resulting double newlines
-        stripped_response = re.sub(r'\n{3,}', '\n\n', stripped_response)
-        
-        return stripped_response.strip()
+        thinking_filter = ThinkingFilter(thinking_start_tag, thinking_end_tag)
+        thinking_filter.feed(response)
+        thinking_filter.flush()
+        return thinking_filter.get_answer()
     except Exception as e:
         print(f"⚠️ Error stripping thinking section: {str(e)}")
         return response
 
-class TimeoutException(Exception):
-    """Exception raised when a function times out"""
-    pass
+# Ollama clients shared between threads, one per request timeout
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(timeout_seconds=None):
+    """Get a shared Ollama client whose requests time out after timeout_seconds
+    
+    The timeout is enforced by the HTTP layer instead of a signal, so it works
+    in worker threads and on every platform. When a request times out the
+    connection is closed, which makes Ollama cancel the generation and free
+    the server-side compute. Since non-streaming responses only arrive once the
+    generation is done, the read timeout bounds the whole request.
+    """
+    with _clients_lock:
+        if timeout_seconds not in _clients:
+            _clients[timeout_seconds] = Client(timeout=timeout_seconds)
+        return _clients[timeout_seconds]
+
+# Pool of Ollama hosts set up by configure_hosts; None means the default host
+host_pool = None
+
+def configure_hosts(hosts):
+    """Load-balance requests across the given Ollama hosts, or use the default host if there are none"""
+    global host_pool
+    host_pool = HostPool(hosts) if hosts else None
+    return host_pool
 
 @contextmanager
-def time_limit(seconds):
-    """Context manager for limiting execution time of a block of code"""
-    def signal_handler(signum, frame):
-        raise TimeoutException("Timed out!")
-    
-    # Not all platforms support SIGALRM (e.g., Windows)
-    if hasattr(signal, 'SIGALRM'):
-        # Set the timeout handler
-        signal.signal(signal.SIGALRM, signal_handler)
-        signal.alarm(seconds)
-        try:
-            yield
-        finally:
-            signal.alarm(0)  # Disable the alarm
-    else:
-        # Alternative implementation for platforms without SIGALRM
-        timer = threading.Timer(seconds, lambda: sys.exit("Timeout occurred"))
-        timer.start()
+def ollama_client(model, timeout_seconds=None):
+    """Get a client for a request to model, picking a host from the pool if one is configured"""
+    if host_pool is None:
+        yield get_client(timeout_seconds)
+        return
+    
+    with host_pool.request(model) as host:
+        yield host_pool.client(host, timeout_seconds)
+
+def all_clients():
+    """Get a client for every configured Ollama host"""
+    if host_pool is None:
+        return [get_client()]
+    return [host_pool.client(host) for host in host_pool.hosts]
+
+def reachable_clients():
+    """Get a client for every healthy pool host that answers, evicting the ones that don't"""
+    clients = []
+    for host in host_pool.healthy_hosts():
+        client = host_pool.client(host)
         try:
-            yield
-        finally:
-            timer.cancel()
+            client.list()
+            clients.append(client)
+        except Exception as e:
+            print(f"⚠️ Ollama host {host} is not reachable: {str(e)}")
+            host_pool.evict(host)
+    return clients
 
-def check_model_exists(model_name):
-    """Check if a model exists in Ollama"""
-    response = list()
+def check_model_exists(model_name, client=None):
+    """Check if a model exists in Ollama (on every host if a host pool is configured)"""
+    if client is None and host_pool is not None:
+        return all(check_model_exists(model_name, c) for c in reachable_clients())
+    
+    response = client.list() if client else list()
     for model in response.models:
         if model.model.startswith(model_name):
             return True
     return False
 
-def pull_model_with_progress(model_name):
-    """Pull a model with progress bar"""
+def pull_model_with_progress(model_name, client=None):
+    """Pull a model with progress bar (to every host missing it if a host pool is configured)"""
+    if client is None and host_pool is not None:
+        for c in reachable_clients():
+            if not check_model_exists(model_name, c):
+                pull_model_with_progress(model_name, c)
+        return
+    
     print(f"Pulling {model_name}...")
     current_digest, bars = '', {}
-    for progress in pull(model_name, stream=True):
+    for progress in (client.pull if client else pull)(model_name, stream=True):
         digest = progress.get('digest', '')
         if digest != current_digest and current_digest in bars:
             bars[current_digest].close()
@@ -98,58 +217,241 @@ def pull_model_with_progress(model_name):
         current_digest = digest
     print(f"{model_name} ready")
 
-def load_questions(file_path):
-    """Load questions from json file"""
-    with open(file_path, 'r') as f:
-        return json.load(f)
+def load_questions(file_path, **selection):
+    """Load questions from json file, through its manifest (see question_bank.py)
+    
+    Keyword arguments select a subset of the questions (see question_bank.matches).
+    """
+    return get_bank(file_path).questions(**selection)
 
 def read_file_content(file_path):
-    """Read content from a file"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    full_path = os.path.join(base_path, file_path)
-    with open(full_path, 'r') as f:
-        return f.read()
-
-def ask_question(model, question_content, timeout_seconds=60, is_evaluator=False, system_prompt=None, thinking_start_tag=None, thinking_end_tag=None):
-    """Ask a question to the model with timeout (only for test models)"""
+    """Read content from a file, only once per process"""
+    return read_content(file_path)
+
+def chunks_before(chunks, deadline):
+    """Yield the chunks of a stream until the deadline (a time.monotonic() value), then raise TimeoutError
+
+    The stream is read by a helper thread, so the deadline holds even while no
+    chunk arrives. The helper closes the stream, which cancels the generation,
+    as soon as the consumer has stopped and the next chunk comes in (or the
+    client's read timeout hits).
+    """
+    chunk_queue = queue.Queue()
+    stopped = threading.Event()
+    
+    def read():
+        try:
+            for chunk in chunks:
+                if stopped.is_set():
+                    break
+                chunk_queue.put((chunk, None))
+            chunk_queue.put((None, None))
+        except Exception as e:
+            chunk_queue.put((None, e))
+        finally:
+            chunks.close()
+    
+    threading.Thread(target=read, name="stream-reader", daemon=True).start()
+    try:
+        while True:
+            try:
+                chunk, error = chunk_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stopped.set()
+
+def stream_answer(model, question_content, timeout_seconds=60, system_prompt=None, options=None,
+                  thinking_start_tag=None, thinking_end_tag=None, max_tokens=None, max_chars=None, keep_alive=False,
+                  client=None, stats=None):
+    """Stream a test model's answer, stopping early at the deadline, when the budget is spent or once it has answered
+    
+    Tokens are consumed as they arrive and the request is closed as soon as a
+    limit is hit, which makes Ollama stop generating. The token budget is
+    enforced by Ollama (num_predict), the character budget here. A model that
+    has closed its thinking section, given an answer and then starts thinking
+    again is stopped there, keeping that answer. If the thinking section has
+    already closed and some answer text was emitted when a limit is hit, that
+    partial answer is returned instead of an error.
+    """
+    options = dict(options or {})
+    if max_tokens:
+        options["num_predict"] = max_tokens
+    
+    deadline = time.monotonic() + timeout_seconds
+    thinking_filter = ThinkingFilter(thinking_start_tag, thinking_end_tag)
+    eval_count = None
+    char_count = 0
+    stop_reason = None
+    
+    client = client or get_client(timeout_seconds)
+    chunks = client.generate(
+        model=model,
+        prompt=question_content,
+        system=system_prompt if system_prompt else "",
+        options=options,
+        keep_alive=keep_alive,
+        stream=True
+    )
+    try:
+        for chunk in chunks_before(chunks, deadline):
+            # Thinking content is dropped here instead of being kept in memory
+            thinking_filter.feed(chunk['response'])
+            char_count += len(chunk['response'])
+            
+            if chunk['done']:
+                # Ollama only reports its stats (and the token count) on the final chunk
+                eval_count = chunk.get('eval_count')
+                if stats is not None:
+                    stats.append(response_stats(model, chunk))
+                if chunk.get('done_reason') == "length":
+                    stop_reason = "budget"
+                break
+            if thinking_filter.rethinking:
+                stop_reason = "answered"
+                break
+            if max_chars and char_count >= max_chars:
+                stop_reason = "budget"
+                break
+    except (TimeoutError, httpx.TimeoutException):
+        stop_reason = "timeout"
+    
+    thinking_filter.flush()
+    return finish_streamed_answer(model, thinking_filter, stop_reason, timeout_seconds, eval_count, char_count)
+
+def finish_streamed_answer(model, thinking_filter, stop_reason, timeout_seconds, eval_count, char_count):
+    """Turn a streamed answer into the answer text, a partial answer or a timeout/budget error"""
+    answer = thinking_filter.get_answer()
+    if not stop_reason:
+        return answer
+    
+    spent = f"{eval_count} tokens" if eval_count is not None else f"{char_count} chars"
+    if stop_reason == "answered":
+        print(f"\n✂️ Stopped {model} after its answer, as it started thinking again ({spent})")
+        return answer
+    
+    # Inside an unclosed thinking section no answer has been given yet
+    if answer and not thinking_filter.in_thinking:
+        print(f"\n✂️ Stopped {model} early ({stop_reason}) after {spent} - keeping the partial answer")
+        return answer
+    
+    if stop_reason == "timeout":
+        print(f"\n⏱️ Model response timed out after {timeout_seconds} seconds!")
+        return f"[TIMEOUT ERROR: The model did not respond within {timeout_seconds} seconds]"
+    print(f"\n✂️ {model} used its budget ({spent}) without answering")
+    return f"[ERROR: The model used its budget of {spent} without giving an answer]"
+
+def ask_question(model, question_content, timeout_seconds=60, is_evaluator=False, system_prompt=None, thinking_start_tag=None, thinking_end_tag=None,
+                 stream=False, max_tokens=None, max_chars=None, keep_alive=False, stats=None,
+                 sample_options=None, retry_host_failure=True):
+    """Ask a question to the model with timeout (only for test models)
+    
+    keep_alive controls how long Ollama keeps the model loaded afterwards;
+    False unloads it right away. If a stats list is given, the Ollama stats
+    of the call are appended to it (test model calls that are cut short report
+    none, evaluations stopped at their verdict report estimates).
+    sample_options (seed and temperature) are added to the test model's options.
+    With a host pool, a request that fails because of its host is retried
+    once on another healthy host.
+    """
     try:
         # Set up options dictionary (only for context size and performance parameters)
-        options = {"num_ctx": 4096}
+        options = {"num_ctx": 4096, **(sample_options or {})}
+        
+        if is_evaluator:
+            options = evaluator_options()
+        
+        # Evaluations that stop once their verdict is complete are streamed
+        if is_evaluator and grading_profile["stop_on_json"]:
+            verdict_watcher = VerdictWatcher()
+            with ollama_client(model) as client:
+                chunks = client.generate(
+                    model=model,
+                    prompt=question_content,
+                    options=options,
+                    format=evaluator_format(),
+                    keep_alive=keep_alive,
+                    stream=True
+                )
+                response_text = ""
+                start_time = time.monotonic()
+                first_chunk_time = None
+                chunk_count = 0
+                try:
+                    for chunk in chunks:
+                        first_chunk_time = first_chunk_time or time.monotonic()
+                        chunk_count += 1
+                        response_text += chunk['response']
+                        if chunk['done'] and stats is not None:
+                            stats.append(response_stats(model, chunk))
+                        if verdict_watcher.feed(chunk['response']):
+                            if not chunk['done'] and stats is not None:
+                                # Stopped before Ollama reported its stats
+                                now = time.monotonic()
+                                stats.append(truncated_stats(model, now - start_time, now - first_chunk_time,
+                                                             chunk_count))
+                            break
+                finally:
+                    # Closing the stream drops the connection, which cancels the generation
+                    chunks.close()
+                return response_text
         
         # For evaluator models, don't apply timeout
         if is_evaluator:
-            response = generate(
-                model=model,
-                prompt=question_content,
-                options=options,
-                keep_alive=False
-            )
+            with ollama_client(model) as client:
+                response = client.generate(
+                    model=model,
+                    prompt=question_content,
+                    options=options,
+                    format=evaluator_format(),
+                    keep_alive=keep_alive
+                )
+            if stats is not None:
+                stats.append(response_stats(model, response))
             return response['response']
         
-        # For test models, apply timeout and system prompt if provided
-        with time_limit(timeout_seconds):
-            response = generate(
+        with ollama_client(model, timeout_seconds) as client:
+            # Streaming mode stops generation early instead of waiting for the full completion
+            if stream:
+                return stream_answer(model, question_content, timeout_seconds, system_prompt, options,
+                                     thinking_start_tag, thinking_end_tag, max_tokens, max_chars, keep_alive,
+                                     client, stats)
+            
+            # For test models, apply timeout and system prompt if provided
+            response = client.generate(
                 model=model,
                 prompt=question_content,
                 system=system_prompt if system_prompt else "",  # Pass system as direct parameter
                 options=options,
-                keep_alive=False
+                keep_alive=keep_alive
             )
-            
-            # Strip thinking section if tags are provided
-            answer = strip_thinking(response['response'], thinking_start_tag, thinking_end_tag)
-            return answer
+        if stats is not None:
+            stats.append(response_stats(model, response))
+        
+        # Strip thinking section if tags are provided
+        answer = strip_thinking(response['response'], thinking_start_tag, thinking_end_tag)
+        return answer
     
-    except TimeoutException:
+    except httpx.TimeoutException:
         print(f"\n⏱️ Model response timed out after {timeout_seconds} seconds!")
         return f"[TIMEOUT ERROR: The model did not respond within {timeout_seconds} seconds]"
     except Exception as e:
+        # The failed host is evicted by now, so the retry goes to another one
+        if retry_host_failure and host_pool is not None and is_host_failure(e) and host_pool.healthy_hosts():
+            print(f"\n🔁 Ollama host failed ({str(e)}), retrying on another host")
+            return ask_question(model, question_content, timeout_seconds, is_evaluator, system_prompt,
+                                thinking_start_tag, thinking_end_tag, stream, max_tokens, max_chars, keep_alive,
+                                stats, sample_options, retry_host_failure=False)
         print(f"\n❌ Error getting model response: {str(e)}")
         return f"[ERROR: {str(e)}]"
 
-def evaluate_answer(evaluator_model, user_answer, model_answer, question):
-    """Have Gemma3 evaluate the answer"""
-    prompt = f"""
+# Prompt template used by evaluate_answer to grade an answer
+EVALUATION_PROMPT = """
 You are evaluating an AI's answer to a question. DO NOT answer the question yourself.
 Your job is ONLY to check if the AI's answer reasonably matches the model answer.
 
@@ -181,9 +483,210 @@ Return your response in this exact JSON format:
 
 Do not include any other text, Markdown formatting, or code blocks.
 """
+
+# JSON schema of the evaluation, passed as Ollama's format parameter in structured grading mode
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanation": {"type": "string"},
+        "mc_chosen_by_the_LLM_model": {"type": "string", "enum": ["A", "B", "C", "D"]},
+        "assessment": {"type": "string", "enum": ["Correct", "Wrong"]},
+        "score": {"type": "integer", "minimum": 0, "maximum": 5}
+    },
+    "required": ["explanation", "assessment", "score"]
+}
+
+# Settings shared by all evaluator calls, changed with configure_grading
+grading_profile = {
+    "structured_output": False,  # Constrain evaluator output to EVALUATION_SCHEMA
+    "num_ctx": 4096,  # Context size
+    "num_predict": None,  # Maximum number of tokens to generate (None: no limit)
+    "temperature": None,  # Sampling temperature (None: the model's default)
+    "stop": None,  # Stop sequences
+    "stop_on_json": False  # Stream the evaluation and stop as soon as the verdict JSON is complete
+}
+
+def configure_grading(**settings):
+    """Change the grading profile used by every evaluator call"""
+    unknown = set(settings) - set(grading_profile)
+    if unknown:
+        raise ValueError(f"Unknown grading settings: {', '.join(sorted(unknown))}")
+    grading_profile.update(settings)
+    return grading_profile
+
+def evaluator_format():
+    """Ollama format parameter for evaluator calls"""
+    return EVALUATION_SCHEMA if grading_profile["structured_output"] else None
+
+def evaluator_options():
+    """Ollama options for evaluator calls"""
+    options = {"num_ctx": grading_profile["num_ctx"]}
+    for option in ("num_predict", "temperature", "stop"):
+        if grading_profile[option] is not None:
+            options[option] = grading_profile[option]
+    return options
+
+class VerdictWatcher:
+    """Watch a streamed evaluation for the end of its verdict JSON
+    
+    Tracks brace depth (ignoring braces inside JSON strings) from the first
+    "{". Once the braces balance, the object is complete; if it doesn't parse
+    or has no assessment (e.g. braces in the evaluator's reasoning), watching
+    starts over with the next "{". The thinking section of reasoning
+    evaluators is filtered out first, so JSON drafted while thinking never
+    ends the evaluation.
+    """
+    
+    def __init__(self, thinking_start_tag="<think>", thinking_end_tag="</think>"):
+        self.thinking_filter = ThinkingFilter(thinking_start_tag, thinking_end_tag)
+        self.text = ""
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.position = 0
+    
+    def feed(self, chunk):
+        """Add a chunk of the evaluation, returning True once a complete verdict has been seen"""
+        self.text += self.thinking_filter.feed(chunk)
+        while self.position < len(self.text):
+            c = self.text[self.position]
+            self.position += 1
+            if self.start is None:
+                if c == "{":
+                    self.start = self.position - 1
+                    self.depth = 1
+                continue
+            
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c == "{":
+                self.depth += 1
+            elif c == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        verdict = json.loads(self.text[self.start:self.position])
+                    except ValueError:
+                        verdict = None
+                    if isinstance(verdict, dict) and "assessment" in verdict:
+                        return True
+                    self.start = None
+                    self.in_string = False
+        return False
+
+def add_grading_arguments(parser):
+    """Add the command line options of the grading profile to a parser"""
+    parser.add_argument('--structured-grading', action='store_true',
+                        help="Constrain evaluator output to the evaluation JSON schema with Ollama's format parameter")
+    parser.add_argument('--grading-max-tokens', type=int,
+                        help='Maximum tokens per evaluation (num_predict); reasoning evaluators that run out give no verdict')
+    parser.add_argument('--grading-num-ctx', type=int, default=grading_profile["num_ctx"],
+                        help=f'Context size of evaluator calls (default: {grading_profile["num_ctx"]})')
+    parser.add_argument('--grading-temperature', type=float, help="Sampling temperature of evaluator calls (default: the model's)")
+    parser.add_argument('--grading-stop', action='append', help='Stop sequence for evaluator calls (can be repeated)')
+    parser.add_argument('--grading-stop-on-json', action='store_true',
+                        help='Stream evaluations and stop each one as soon as its verdict JSON is complete')
+
+def configure_grading_from_args(args):
+    """Apply the grading options added by add_grading_arguments"""
+    return configure_grading(
+        structured_output=args.structured_grading,
+        num_ctx=args.grading_num_ctx,
+        num_predict=args.grading_max_tokens,
+        temperature=args.grading_temperature,
+        stop=args.grading_stop,
+        stop_on_json=args.grading_stop_on_json
+    )
+
+# Evaluation cache shared by all evaluator calls, set up by configure_eval_cache
+eval_cache = None
+
+def configure_eval_cache(enabled=True, path=DEFAULT_CACHE_PATH, max_mb=DEFAULT_MAX_MB):
+    """Enable or disable the on-disk evaluation cache"""
+    global eval_cache
+    if eval_cache is not None:
+        eval_cache.close()
+    eval_cache = EvaluationCache(path, max_mb * 1024 * 1024) if enabled else None
+    return eval_cache
+
+def evaluate_answer(evaluator_model, user_answer, model_answer, question, sample=0, keep_alive=False,
+                    stats=None):
+    """Have Gemma3 evaluate the answer
+    
+    Responses are cached by evaluator model, prompt and sample number, so
+    consensus retries (sample > 0) still get fresh generations.
+    """
+    prompt = EVALUATION_PROMPT.format(question=question, model_answer=model_answer, user_answer=user_answer)
+    
+    cache_key = None
+    if eval_cache is not None:
+        cache_key = eval_cache.make_key(evaluator_model, prompt, sample=sample, grading=grading_profile)
+        cached_evaluation = eval_cache.get(cache_key)
+        if cached_evaluation is not None:
+            return cached_evaluation
     
     # Use ask_question with is_evaluator=True to bypass timeout
-    return ask_question(evaluator_model, prompt, is_evaluator=True)
+    evaluation = ask_question(evaluator_model, prompt, is_evaluator=True, keep_alive=keep_alive, stats=stats)
+    
+    # Don't cache failed evaluations
+    if cache_key and not evaluation.startswith("[ERROR:"):
+        eval_cache.put(cache_key, evaluator_model, evaluation)
+    return evaluation
+
+# Journal of finished attempts set up by configure_checkpoint; None disables checkpointing
+checkpoint = None
+
+def configure_checkpoint(run_id):
+    """Record finished attempts under results/checkpoints/<run_id>.jsonl, replaying any already recorded there"""
+    global checkpoint
+    checkpoint = CheckpointJournal(run_id)
+    return checkpoint
+
+# Decides when a wrong answer gets no further attempts; set up by configure_retry_policy
+retry_policy = RetryPolicy()
+
+def configure_retry_policy(policy):
+    """Use the "fixed" policy (retry until max attempts) or the "adaptive" one, which also learns from earlier result files"""
+    global retry_policy
+    if policy == "adaptive":
+        history = load_history()
+        print(f"🧭 Adaptive retries, using the history of {len(history)} model/question pair(s)")
+        retry_policy = RetryPolicy(adaptive=True, history=history)
+    else:
+        retry_policy = RetryPolicy()
+    return retry_policy
+
+def current_settings():
+    """The settings made by the configure_* functions, to hand to code running on another copy of this module
+
+    run_test.py runs as __main__, so the modules it starts a schedule from
+    (run_test_async, pipeline, work_queue) import a second, unconfigured
+    copy of it; they take these settings and apply them with apply_settings.
+    """
+    return {
+        "grading_profile": dict(grading_profile),
+        "host_pool": host_pool,
+        "eval_cache": eval_cache,
+        "checkpoint": checkpoint,
+        "retry_policy": retry_policy
+    }
+
+def apply_settings(settings):
+    """Use the settings returned by current_settings, sharing its host pool, cache, journal and retry policy"""
+    global host_pool, eval_cache, checkpoint, retry_policy
+    configure_grading(**settings["grading_profile"])
+    host_pool = settings["host_pool"]
+    eval_cache = settings["eval_cache"]
+    checkpoint = settings["checkpoint"]
+    retry_policy = settings["retry_policy"]
 
 def get_difficulty_stars(difficulty_level):
     """Convert difficulty level to star emojis"""
@@ -193,8 +696,31 @@ def get_difficulty_stars(difficulty_level):
     except (ValueError, TypeError):
         return "⭐"  # Default to one star if conversion fails
 
+def parse_structured_evaluation(evaluation):
+    """Strictly parse an evaluation that is exactly the JSON of EVALUATION_SCHEMA
+    
+    Returns (assessment, score), or None if the evaluation doesn't match it.
+    """
+    try:
+        eval_data = json.loads(evaluation)
+    except ValueError:
+        return None
+    if not isinstance(eval_data, dict):
+        return None
+    
+    assessment = eval_data.get("assessment")
+    score = eval_data.get("score")
+    if assessment not in ("Correct", "Wrong") or type(score) is not int or not 0 <= score <= 5:
+        return None
+    return assessment.lower(), score
+
 def parse_evaluation(evaluation):
     """Parse evaluation text to extract assessment and score"""
+    # Fast path for well-formed (e.g. schema constrained) evaluations
+    parsed = parse_structured_evaluation(evaluation)
+    if parsed is not None:
+        return parsed
+    
     assessment = "wrong"  # Default - use lowercase
     score = 0  # Default
     
@@ -271,54 +797,75 @@ def parse_evaluation(evaluation):
     
     return assessment, score
 
-def evaluate_with_double_check(evaluator1_model, evaluator2_model, user_answer, model_answer, question, max_retry=3):
-    """Evaluate an answer using two evaluators for consensus"""
+def is_degenerate_answer(user_answer):
+    """Check if an answer is obviously not gradable (empty, error, timeout or skipped)"""
+    stripped = user_answer.strip() if user_answer else ""
+    return not stripped or stripped.startswith(("[ERROR:", "[TIMEOUT ERROR:", "[SKIPPED]"))
+
+def forced_wrong_result(user_answer, short_circuit=False):
+    """The grade of an answer that is not worth evaluating, or None if the evaluators should grade it
+    
+    Timeouts and errors are always graded wrong without asking the evaluators.
+    With short_circuit, so are the other degenerate answers (empty or skipped).
+    """
+    if user_answer.startswith(("[TIMEOUT ERROR:", "[ERROR:")):
+        evaluation = "[TIMEOUT/ERROR - No evaluation performed]"
+    elif short_circuit and is_degenerate_answer(user_answer):
+        evaluation = "[DEGENERATE ANSWER - No evaluation performed]"
+    else:
+        return None
+    return {
+        "evaluation": evaluation,
+        "assessment": "wrong",
+        "score": 0,
+        "consensus": True  # Mark as consensus to avoid retries
+    }
+
+def evaluate_with_double_check(evaluator1_model, evaluator2_model, user_answer, model_answer, question, max_retry=3,
+                               stats=None):
+    """Evaluate an answer using two evaluators for consensus
+    
+    Both evaluators are asked at the same time.
+    """
     print(f"⚖️ Double-evaluating with {evaluator1_model} and {evaluator2_model}...")
     
-    for attempt in range(1, max_retry + 1):
-        if attempt > 1:
-            print(f"🔄 Retry #{attempt-1} for evaluation consensus...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for attempt in range(1, max_retry + 1):
+            if attempt > 1:
+                print(f"🔄 Retry #{attempt-1} for evaluation consensus...")
             
-        # Get first evaluation
-        evaluation1 = evaluate_answer(
-            evaluator1_model,
-            user_answer,
-            model_answer,
-            question
-        )
-        assessment1, score1 = parse_evaluation(evaluation1)
-        
-        # Get second evaluation
-        evaluation2 = evaluate_answer(
-            evaluator2_model,
-            user_answer,
-            model_answer,
-            question
-        )
-        assessment2, score2 = parse_evaluation(evaluation2)
-        
-        # Check if assessments agree
-        if assessment1 == assessment2:
-            print(f"✅ Evaluators agree: {assessment1}")
-            # Use the highest score
-            final_score = max(score1, score2)
-            print(f"📊 Using highest score: {final_score}/5")
-            return {
-                "evaluation": f"CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
-                "assessment": assessment1,  # They're the same
-                "score": final_score,
-                "consensus": True
-            }
-        else:
-            print(f"⚠️ Evaluators disagree: {evaluator1_model}={assessment1}, {evaluator2_model}={assessment2}")
-            if attempt == max_retry:
-                print(f"⚠️ After {max_retry} attempts, evaluators still disagree. Using first evaluator.")
+            # Get both evaluations in parallel
+            future1 = executor.submit(evaluate_answer, evaluator1_model, user_answer, model_answer, question,
+                                      sample=attempt - 1, stats=stats)
+            future2 = executor.submit(evaluate_answer, evaluator2_model, user_answer, model_answer, question,
+                                      sample=attempt - 1, stats=stats)
+            evaluation1 = future1.result()
+            evaluation2 = future2.result()
+            assessment1, score1 = parse_evaluation(evaluation1)
+            assessment2, score2 = parse_evaluation(evaluation2)
+            
+            # Check if assessments agree
+            if assessment1 == assessment2:
+                print(f"✅ Evaluators agree: {assessment1}")
+                # Use the highest score
+                final_score = max(score1, score2)
+                print(f"📊 Using highest score: {final_score}/5")
                 return {
-                    "evaluation": f"NO CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
-                    "assessment": assessment1,  # Fall back to first evaluator
-                    "score": score1,
-                    "consensus": False
+                    "evaluation": f"CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                    "assessment": assessment1,  # They're the same
+                    "score": final_score,
+                    "consensus": True
                 }
+            else:
+                print(f"⚠️ Evaluators disagree: {evaluator1_model}={assessment1}, {evaluator2_model}={assessment2}")
+                if attempt == max_retry:
+                    print(f"⚠️ After {max_retry} attempts, evaluators still disagree. Using first evaluator.")
+                    return {
+                        "evaluation": f"NO CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                        "assessment": assessment1,  # Fall back to first evaluator
+                        "score": score1,
+                        "consensus": False
+                    }
     
     # Should not reach here, but just in case
     return {
@@ -328,17 +875,30 @@ def evaluate_with_double_check(evaluator1_model, evaluator2_model, user_answer,
         "consensus": False
     }
 
+def build_attempt_stats(answer_stats, evaluation_stats):
+    """Stats of one attempt: the test model call (None if it was cut short) and the evaluator calls"""
+    return {
+        "answer": answer_stats[0] if answer_stats else None,
+        "evaluations": evaluation_stats
+    }
+
 def process_question_attempt(test_model, evaluator1_model, evaluator2_model, question_content, model_answer_content, 
                              attempt_num=1, timeout_seconds=60, system_prompt=None, 
-                             thinking_start_tag=None, thinking_end_tag=None):
+                             thinking_start_tag=None, thinking_end_tag=None,
+                             stream=False, max_tokens=None, max_chars=None, short_circuit_eval=False):
     """Process a single attempt at answering a question"""
     print(f"\n📝 {f'Attempt {attempt_num}/5' if attempt_num > 1 else 'First attempt'}")
     
+    # Ollama stats of the test model call and of every evaluator call
+    answer_stats = []
+    evaluation_stats = []
+    
     # Ask the question with timeout for test model
     print(f"⏳ Asking {test_model}... (timeout: {timeout_seconds}s)")
     user_answer = ask_question(test_model, question_content, timeout_seconds=timeout_seconds, 
                              system_prompt=system_prompt, thinking_start_tag=thinking_start_tag, 
-                             thinking_end_tag=thinking_end_tag)
+                             thinking_end_tag=thinking_end_tag, stream=stream, 
+                             max_tokens=max_tokens, max_chars=max_chars, stats=answer_stats)
     
     # Check if it was a timeout
     if user_answer.startswith("[TIMEOUT ERROR:"):
@@ -346,16 +906,11 @@ def process_question_attempt(test_model, evaluator1_model, evaluator2_model, que
     else:
         print(f"\n📢 {test_model}'s answer:\n{user_answer}\n")
     
-    # For timeout or error responses, force "wrong" assessment
-    if user_answer.startswith("[TIMEOUT ERROR:") or user_answer.startswith("[ERROR:"):
-        print("⚠️ Timeout or error occurred - forcing incorrect assessment")
-        return {
-            "answer": user_answer,
-            "evaluation": "[TIMEOUT/ERROR - No evaluation performed]",
-            "assessment": "wrong",
-            "score": 0,
-            "consensus": True  # Mark as consensus to avoid retries
-        }
+    # For timeout or error responses (and with short_circuit_eval, empty ones), force "wrong" assessment
+    forced = forced_wrong_result(user_answer, short_circuit_eval)
+    if forced is not None:
+        print("⚠️ No gradable answer - forcing incorrect assessment")
+        return {"answer": user_answer, **forced, "stats": build_attempt_stats(answer_stats, evaluation_stats)}
     
     # Use double evaluation if second evaluator is provided
     if evaluator2_model:
@@ -364,7 +919,8 @@ def process_question_attempt(test_model, evaluator1_model, evaluator2_model, que
             evaluator2_model,
             user_answer,
             model_answer_content,
-            question_content
+            question_content,
+            stats=evaluation_stats
         )
         result["answer"] = user_answer
     else:
@@ -373,7 +929,8 @@ def process_question_attempt(test_model, evaluator1_model, evaluator2_model, que
             evaluator1_model,
             user_answer,
             model_answer_content,
-            question_content
+            question_content,
+            stats=evaluation_stats
         )
         
         # Parse the evaluation
@@ -386,6 +943,7 @@ def process_question_attempt(test_model, evaluator1_model, evaluator2_model, que
             "score": score,
             "consensus": True  # Mark as consensus since only one evaluator
         }
+    result["stats"] = build_attempt_stats(answer_stats, evaluation_stats)
     
     # Display results
     result_emoji = "✅" if result["assessment"] == "correct" else "❌"
@@ -398,7 +956,8 @@ def process_question_attempt(test_model, evaluator1_model, evaluator2_model, que
 
 def handle_question(test_model, evaluator1_model, evaluator2_model, question_data, q_index, total_questions, 
                    max_attempts=5, timeout_seconds=60, system_prompt=None, 
-                   thinking_start_tag=None, thinking_end_tag=None):
+                   thinking_start_tag=None, thinking_end_tag=None,
+                   stream=False, max_tokens=None, max_chars=None, short_circuit_eval=False):
     """Handle the full process of asking and evaluating a question, with retries if needed"""
     question_path = question_data["question_path"]
     answer_path = question_data["answer_path"]
@@ -422,51 +981,49 @@ def handle_question(test_model, evaluator1_model, evaluator2_model, question_dat
     print("❓ Question:", question_content.split("\n")[0])  # Print only the first line
     
     # Initialize result tracking
-    test_subject_answers = []
-    evaluations = []
-    scores = []
-    assessments = []
-    attempts = 0
-    success = False
-    attempts_until_success = None
-    is_timeout = False
+    attempt_results = []
     
     # Combined first attempt and retry logic in a single loop
     for attempt in range(1, max_attempts + 1):
-        # Process the attempt
-        result = process_question_attempt(
-            test_model, 
-            evaluator1_model, 
-            evaluator2_model, 
-            question_content, 
-            model_answer_content,
-            attempt,
-            timeout_seconds=timeout_seconds,
-            system_prompt=system_prompt,
-            thinking_start_tag=thinking_start_tag,
-            thinking_end_tag=thinking_end_tag
-        )
+        restored = checkpoint.get_attempt(test_model, question_path, attempt) if checkpoint else None
+        if restored is not None:
+            print(f"♻️ Attempt {attempt} restored from checkpoint: {restored['assessment']} ({restored['score']}/5)")
+            result = restored
+        else:
+            # Process the attempt
+            result = process_question_attempt(
+                test_model, 
+                evaluator1_model, 
+                evaluator2_model, 
+                question_content, 
+                model_answer_content,
+                attempt,
+                timeout_seconds=timeout_seconds,
+                system_prompt=system_prompt,
+                thinking_start_tag=thinking_start_tag,
+                thinking_end_tag=thinking_end_tag,
+                stream=stream,
+                max_tokens=max_tokens,
+                max_chars=max_chars,
+                short_circuit_eval=short_circuit_eval
+            )
+            if checkpoint is not None:
+                checkpoint.record_attempt(test_model, question_path, attempt, result)
         
         # Record results
-        test_subject_answers.append(result["answer"])
-        evaluations.append(result["evaluation"])
-        scores.append(result["score"])
-        assessments.append(result["assessment"])
-        attempts = attempt
+        attempt_results.append(result)
+        stop_reason = retry_policy.stop_reason(test_model, question_path, attempt_results, max_attempts)
         
         # Check if successful
-        if result["assessment"] == "correct":
-            success = True
-            attempts_until_success = attempt
+        if stop_reason == "correct":
             if attempt == 1:
                 print("✅ Success on first attempt!")
             else:
-                print(f"✅ Success on attempt {attempts_until_success}!")
+                print(f"✅ Success on attempt {attempt}!")
             break
         
         # Check for timeout in the response
-        is_timeout = result["answer"].startswith("[TIMEOUT ERROR:")
-        if is_timeout:
+        if stop_reason == "timeout":
             if attempt == 1:
                 print("⏱️ First attempt timed out - skipping retries.")
             else:
@@ -474,12 +1031,30 @@ def handle_question(test_model, evaluator1_model, evaluator2_model, question_dat
             break
             
         # For unsuccessful attempts
-        if attempt == 1:
+        if stop_reason == "max_attempts":
+            print(f"❌ Still incorrect. No more attempts.")
+            break
+        elif stop_reason is not None:
+            print(f"🛑 Incorrect. Stopping early: {STOP_REASONS[stop_reason]}.")
+            break
+        elif attempt == 1:
             print("❌ Incorrect. Will retry later.")
-        elif attempt < max_attempts:
-            print(f"❌ Still incorrect. Trying again...")
         else:
-            print(f"❌ Still incorrect. No more attempts.")
+            print(f"❌ Still incorrect. Trying again...")
+    
+    return build_question_result(question_data, q_index, attempt_results, stop_reason)
+
+def build_question_result(question_data, q_index, attempt_results, stop_reason=None):
+    """Combine the results of all attempts at a question into its final result entry
+    
+    stop_reason records why no further attempt was made (see retry_policy.py).
+    """
+    test_subject_answers = [r["answer"] for r in attempt_results]
+    scores = [r["score"] for r in attempt_results]
+    attempts_until_success = next(
+        (attempt for attempt, r in enumerate(attempt_results, 1) if r["assessment"] == "correct"),
+        None
+    )
     
     # Find best score
     best_score = max(scores) if scores else 0
@@ -487,46 +1062,354 @@ def handle_question(test_model, evaluator1_model, evaluator2_model, question_dat
     # Create final result object - use lowercase for setting assessment
     final_result = {
         "question_index": q_index,
-        "question_path": question_path,
-        "answer_path": answer_path,
-        "short_name": short_name,
+        "question_path": question_data["question_path"],
+        "answer_path": question_data["answer_path"],
+        "short_name": question_data.get("short_name", f"Q{q_index}"),
+        "question_sha256": question_data.get("question_sha256"),
+        "answer_sha256": question_data.get("answer_sha256"),
         "test_subject_answers": test_subject_answers,
-        "evaluations": evaluations,
+        "evaluations": [r["evaluation"] for r in attempt_results],
+        "stats": [r.get("stats") for r in attempt_results],
         "scores": scores,
-        "attempts": attempts,
+        "attempts": len(attempt_results),
         "attempts_until_success": attempts_until_success,
-        "assessment": "correct" if success else "wrong",  # Use lowercase
+        "assessment": "correct" if attempts_until_success else "wrong",  # Use lowercase
         "best_score": best_score,
-        "timeout": is_timeout  # Add timeout flag
+        # Add timeout flag
+        "timeout": bool(test_subject_answers) and test_subject_answers[-1].startswith("[TIMEOUT ERROR:"),
+        "stop_reason": stop_reason
     }
     
     return final_result
 
-def run_test(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5, timeout_seconds=60, 
-             system_prompt=None, display_name=None, thinking_start_tag=None, thinking_end_tag=None):
-    """Run the test with questions from json file"""
-    questions = load_questions("questions.json")
-    results = []
+# How long models stay loaded during a phase of the grouped schedule
+DEFAULT_KEEP_ALIVE = "10m"
+
+def unload_model(model):
+    """Ask Ollama to unload a model so the model of the next phase gets its memory"""
+    for client in all_clients():
+        try:
+            client.generate(model=model, keep_alive=0)
+        except Exception as e:
+            print(f"⚠️ Could not unload {model}: {str(e)}")
+
+def run_model_phase(model, tasks, executor=None):
+    """Run a batch of calls to one model while it stays loaded, then unload it"""
+    if executor is None:
+        results = [task() for task in tasks]
+    else:
+        results = [future.result() for future in [executor.submit(task) for task in tasks]]
     
-    print(f"\n🧠 Running test with {test_model}, evaluated by {evaluator1_model}" + 
-          (f" and {evaluator2_model}" if evaluator2_model else "") + " 🧠\n")
+    if tasks:
+        unload_model(model)
+    return results
+
+def grade_answers_grouped(items, evaluator1_model, evaluator2_model=None, keep_alive=DEFAULT_KEEP_ALIVE,
+                          executor=None, max_retry=3, short_circuit=False):
+    """Grade a batch of (user_answer, model_answer, question) items with evaluator-grouped phases
     
-    if thinking_start_tag and thinking_end_tag:
-        print(f"💭 Will strip thinking sections between '{thinking_start_tag}' and '{thinking_end_tag}'")
+    All answers are graded by the first evaluator while it stays loaded, then
+    by the second one. Answers the evaluators disagree on are graded again in
+    the next round, up to max_retry rounds, like evaluate_with_double_check.
+    The Ollama stats of each item's evaluator calls are in its evaluation_stats.
+    Answers that are not worth grading are graded wrong (see forced_wrong_result).
+    """
+    results = [None] * len(items)
+    evaluation_stats = [[] for _ in items]
+    pending = []
+    for i, (user_answer, _, _) in enumerate(items):
+        results[i] = forced_wrong_result(user_answer, short_circuit)
+        if results[i] is None:
+            pending.append(i)
+    
+    evaluators = [evaluator1_model] + ([evaluator2_model] if evaluator2_model else [])
+    for attempt in range(1, max_retry + 1):
+        if not pending:
+            break
+        if attempt > 1:
+            print(f"🔄 Retry #{attempt-1} for evaluation consensus on {len(pending)} answer(s)...")
+        
+        # One phase per evaluator, in order
+        evaluations = []
+        for evaluator in evaluators:
+            print(f"⚖️ Grading {len(pending)} answer(s) with {evaluator}...")
+            tasks = [partial(evaluate_answer, evaluator, *items[i], sample=attempt - 1, keep_alive=keep_alive,
+                             stats=evaluation_stats[i])
+                     for i in pending]
+            evaluations.append(run_model_phase(evaluator, tasks, executor))
+        
+        still_pending = []
+        for n, i in enumerate(pending):
+            evaluation1 = evaluations[0][n]
+            assessment1, score1 = parse_evaluation(evaluation1)
+            
+            if not evaluator2_model:
+                results[i] = {
+                    "evaluation": evaluation1,
+                    "assessment": assessment1,
+                    "score": score1,
+                    "consensus": True  # Mark as consensus since only one evaluator
+                }
+                continue
+            
+            evaluation2 = evaluations[1][n]
+            assessment2, score2 = parse_evaluation(evaluation2)
+            if assessment1 == assessment2:
+                results[i] = {
+                    "evaluation": f"CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                    "assessment": assessment1,
+                    "score": max(score1, score2),  # Use the highest score
+                    "consensus": True
+                }
+            elif attempt == max_retry:
+                # Fall back to first evaluator
+                results[i] = {
+                    "evaluation": f"NO CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                    "assessment": assessment1,
+                    "score": score1,
+                    "consensus": False
+                }
+            else:
+                still_pending.append(i)
+        pending = still_pending
+    
+    for result, stats in zip(results, evaluation_stats):
+        result["evaluation_stats"] = stats
+    return results
+
+def run_questions_grouped(test_model, evaluator1_model, evaluator2_model, question_entries, max_attempts=5,
+                          timeout_seconds=60, system_prompt=None, thinking_start_tag=None, thinking_end_tag=None,
+                          stream=False, max_tokens=None, max_chars=None, keep_alive=DEFAULT_KEEP_ALIVE,
+                          executor=None, short_circuit_eval=False):
+    """Run questions in rounds of model-grouped phases instead of interleaving models per attempt
+    
+    Each round first generates answers for every pending question while the
+    test model stays loaded, then grades them in evaluator-grouped phases, so
+    each model is loaded once per phase instead of once per call. Questions
+    answered wrongly (but not timed out) move on to the next round.
+    """
+    contents = {}
+    for q_index, question_data in question_entries:
+        contents[q_index] = (read_file_content(question_data["question_path"]),
+                             read_file_content(question_data["answer_path"]))
+    
+    attempt_results = {q_index: [] for q_index, _ in question_entries}
+    stop_reasons = {}
+    short_names = {q_index: question_data.get("short_name", f"Q{q_index}") for q_index, question_data in question_entries}
+    question_paths = {q_index: question_data["question_path"] for q_index, question_data in question_entries}
+    pending = [q_index for q_index, _ in question_entries]
     
-    # Process each question
+    for attempt in range(1, max_attempts + 1):
+        if not pending:
+            break
+        print(f"\n{'='*80}")
+        print(f"📝 Round {attempt}/{max_attempts}: {len(pending)} question(s) for {test_model}")
+        
+        # Attempts recorded in the checkpoint journal are replayed instead of run again
+        round_results = {}
+        if checkpoint is not None:
+            for q_index in pending:
+                restored = checkpoint.get_attempt(test_model, question_paths[q_index], attempt)
+                if restored is not None:
+                    round_results[q_index] = restored
+            if round_results:
+                print(f"♻️ {len(round_results)} attempt(s) restored from checkpoint")
+        to_run = [q_index for q_index in pending if q_index not in round_results]
+        
+        # Phase 1: generate all answers with the test model
+        if to_run:
+            print(f"⏳ Asking {test_model}... (timeout: {timeout_seconds}s)")
+        answer_stats = {q_index: [] for q_index in to_run}
+        tasks = [partial(ask_question, test_model, contents[q_index][0], timeout_seconds=timeout_seconds,
+                         system_prompt=system_prompt, thinking_start_tag=thinking_start_tag,
+                         thinking_end_tag=thinking_end_tag, stream=stream, max_tokens=max_tokens,
+                         max_chars=max_chars, keep_alive=keep_alive, stats=answer_stats[q_index])
+                 for q_index in to_run]
+        answers = run_model_phase(test_model, tasks, executor)
+        
+        # Phase 2: grade them, grouped by evaluator
+        grades = grade_answers_grouped(
+            [(answer, contents[q_index][1], contents[q_index][0]) for q_index, answer in zip(to_run, answers)],
+            evaluator1_model,
+            evaluator2_model,
+            keep_alive=keep_alive,
+            executor=executor,
+            short_circuit=short_circuit_eval
+        )
+        for q_index, answer, result in zip(to_run, answers, grades):
+            result["answer"] = answer
+            result["stats"] = build_attempt_stats(answer_stats[q_index], result.pop("evaluation_stats"))
+            round_results[q_index] = result
+            if checkpoint is not None:
+                checkpoint.record_attempt(test_model, question_paths[q_index], attempt, result)
+        
+        still_pending = []
+        for q_index in pending:
+            result = round_results[q_index]
+            answer = result["answer"]
+            attempt_results[q_index].append(result)
+            
+            result_emoji = "✅" if result["assessment"] == "correct" else "❌"
+            timeout_icon = "⏱️" if answer.startswith("[TIMEOUT ERROR:") else ""
+            print(f"{result_emoji} Q{q_index} {short_names[q_index]}: {result['assessment']} ({result['score']}/5){timeout_icon}")
+            
+            stop_reason = retry_policy.stop_reason(test_model, question_paths[q_index], attempt_results[q_index], max_attempts)
+            if stop_reason is None:
+                still_pending.append(q_index)
+            else:
+                stop_reasons[q_index] = stop_reason
+                if stop_reason not in ("correct", "timeout", "max_attempts"):
+                    print(f"🛑 Q{q_index} stopping early: {STOP_REASONS[stop_reason]}")
+        pending = still_pending
+    
+    return [build_question_result(question_data, q_index, attempt_results[q_index], stop_reasons.get(q_index))
+            for q_index, question_data in question_entries]
+
+# Sampling settings of pass@k runs
+DEFAULT_SAMPLE_SEED = 0
+DEFAULT_SAMPLE_TEMPERATURE = 0.8
+
+def sample_options(sample, seed=DEFAULT_SAMPLE_SEED, temperature=DEFAULT_SAMPLE_TEMPERATURE):
+    """Options of the sample-th sample of a question; fixed seeds make the samples reproducible"""
+    return {"seed": seed + sample, "temperature": temperature}
+
+def run_questions_sampled(test_model, evaluator1_model, evaluator2_model, question_entries, samples,
+                          timeout_seconds=60, system_prompt=None, thinking_start_tag=None, thinking_end_tag=None,
+                          stream=False, max_tokens=None, max_chars=None, keep_alive=DEFAULT_KEEP_ALIVE,
+                          executor=None, seed=DEFAULT_SAMPLE_SEED, temperature=DEFAULT_SAMPLE_TEMPERATURE,
+                          short_circuit_eval=False):
+    """Draw a fixed number of independent samples per question and grade them all (pass@k mode)
+    
+    Unlike retries, every sample is generated whatever the others got, with
+    its own seed (seed + sample index). All samples of all questions are
+    generated in one phase while the test model stays loaded, then graded in
+    evaluator-grouped phases. Each question result lists its samples as
+    attempts and counts the correct ones in correct_samples.
+    """
+    contents = {}
+    for q_index, question_data in question_entries:
+        contents[q_index] = (read_file_content(question_data["question_path"]),
+                             read_file_content(question_data["answer_path"]))
+    question_paths = {q_index: question_data["question_path"] for q_index, question_data in question_entries}
+    
+    # Samples recorded in the checkpoint journal (as attempt sample + 1) are replayed instead of drawn again
+    sample_results = {}
+    if checkpoint is not None:
+        for q_index, _ in question_entries:
+            for sample in range(samples):
+                restored = checkpoint.get_attempt(test_model, question_paths[q_index], sample + 1)
+                if restored is not None:
+                    sample_results[(q_index, sample)] = restored
+        if sample_results:
+            print(f"♻️ {len(sample_results)} sample(s) restored from checkpoint")
+    to_run = [(q_index, sample) for q_index, _ in question_entries for sample in range(samples)
+              if (q_index, sample) not in sample_results]
+    
+    # Phase 1: generate every sample with the test model
+    if to_run:
+        print(f"🎲 Drawing {len(to_run)} sample(s) from {test_model} (temperature {temperature}, seeds {seed}-{seed + samples - 1})")
+    answer_stats = {unit: [] for unit in to_run}
+    tasks = [partial(ask_question, test_model, contents[q_index][0], timeout_seconds=timeout_seconds,
+                     system_prompt=system_prompt, thinking_start_tag=thinking_start_tag,
+                     thinking_end_tag=thinking_end_tag, stream=stream, max_tokens=max_tokens,
+                     max_chars=max_chars, keep_alive=keep_alive, stats=answer_stats[(q_index, sample)],
+                     sample_options=sample_options(sample, seed, temperature))
+             for q_index, sample in to_run]
+    answers = run_model_phase(test_model, tasks, executor)
+    
+    # Phase 2: grade them all, grouped by evaluator
+    grades = grade_answers_grouped(
+        [(answer, contents[q_index][1], contents[q_index][0]) for (q_index, _), answer in zip(to_run, answers)],
+        evaluator1_model,
+        evaluator2_model,
+        keep_alive=keep_alive,
+        executor=executor,
+        short_circuit=short_circuit_eval
+    )
+    for (q_index, sample), answer, result in zip(to_run, answers, grades):
+        result["answer"] = answer
+        result["stats"] = build_attempt_stats(answer_stats[(q_index, sample)], result.pop("evaluation_stats"))
+        sample_results[(q_index, sample)] = result
+        if checkpoint is not None:
+            checkpoint.record_attempt(test_model, question_paths[q_index], sample + 1, result)
+    
+    results = []
+    for q_index, question_data in question_entries:
+        attempt_results = [sample_results[(q_index, sample)] for sample in range(samples)]
+        result = build_question_result(question_data, q_index, attempt_results, "samples")
+        result["correct_samples"] = sum(1 for r in attempt_results if r["assessment"] == "correct")
+        result["sample_seeds"] = [seed + sample for sample in range(samples)]
+        print(f"🎲 Q{q_index} {result['short_name']}: {result['correct_samples']}/{samples} samples correct")
+        results.append(result)
+    return results
+
+def describe_selection(selection):
+    """Describe a question selection in a few words"""
+    return ", ".join(f"{key}={'/'.join(map(str, value)) if key == 'shard' else ','.join(map(str, value))}"
+                     for key, value in selection.items())
+
+def build_question_entries(questions):
+    """Build the (question_index, question_data) pairs for the questions of a run"""
+    question_entries = []
     for i, q in enumerate(questions, 1):
+        # Questions keep their position in questions.json when only a subset is run
+        i = q.get("index", i)
+        
         # Prepare question data dictionary with all needed fields
         question_data = {
             "question_path": q["question"],
             "answer_path": q["answer"],
             "short_name": q.get("short_name", f"Q{i}"),
             "human_difficulty": q.get("human_difficulty", "3"),
-            "ai_difficulty": q.get("ai_difficulty", "3")
+            "ai_difficulty": q.get("ai_difficulty", "3"),
+            # The files as they are now, so results record which version of the question was asked
+            "question_sha256": file_hash(q["question"]),
+            "answer_sha256": file_hash(q["answer"])
         }
-        
-        # Handle the question (ask, evaluate, retry if needed)
-        result = handle_question(
+        question_entries.append((i, question_data))
+    return question_entries
+
+def run_test(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5, timeout_seconds=60, 
+             system_prompt=None, display_name=None, thinking_start_tag=None, thinking_end_tag=None,
+             concurrency=1, executor=None, stream=False, max_tokens=None, max_chars=None,
+             short_circuit_eval=False, schedule="interleaved", keep_alive=DEFAULT_KEEP_ALIVE, pipeline_run=None,
+             samples=None, sample_seed=DEFAULT_SAMPLE_SEED, sample_temperature=DEFAULT_SAMPLE_TEMPERATURE,
+             selection=None, shard_run=None):
+    """Run the test with questions from json file
+    
+    Questions are handled one after another unless concurrency > 1 or a shared
+    executor is passed, in which case they are sent to the Ollama server in
+    parallel. Results are always returned in question order.
+    
+    With schedule="grouped", work is reordered into model-grouped phases
+    (see run_questions_grouped) and models stay loaded for keep_alive.
+    With schedule="pipelined", answers are generated and graded in separate
+    phases that are recorded under results/pipeline/<pipeline_run> (see pipeline.py).
+    With samples set, each question gets that many concurrent samples instead
+    of retries and the run reports pass@k (see run_questions_sampled).
+    
+    selection picks a subset of the questions (see question_bank.matches);
+    result files of a sharded run share shard_run, so they can be merged.
+    """
+    questions = load_questions("questions.json", **(selection or {}))
+    if selection:
+        print(f"🔎 Running {len(questions)} selected question(s): {describe_selection(selection)}")
+    
+    print(f"\n🧠 Running test with {test_model}, evaluated by {evaluator1_model}" + 
+          (f" and {evaluator2_model}" if evaluator2_model else "") + " 🧠\n")
+    
+    if thinking_start_tag and thinking_end_tag:
+        print(f"💭 Will strip thinking sections between '{thinking_start_tag}' and '{thinking_end_tag}'")
+    
+    if stream:
+        print(f"🌊 Streaming answers" + (f" (max {max_tokens} tokens)" if max_tokens else "") +
+              (f" (max {max_chars} chars)" if max_chars else ""))
+    
+    # Prepare the arguments for each question
+    question_entries = build_question_entries(questions)
+    question_jobs = []
+    for i, question_data in question_entries:
+        question_jobs.append((
             test_model, 
             evaluator1_model,
             evaluator2_model, 
@@ -537,11 +1420,136 @@ def run_test(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5
             timeout_seconds,
             system_prompt,
             thinking_start_tag,
-            thinking_end_tag
-        )
-        
-        results.append(result)
+            thinking_end_tag,
+            stream,
+            max_tokens,
+            max_chars,
+            short_circuit_eval
+        ))
     
+    own_executor = executor is None and (concurrency > 1 or bool(samples))
+    if own_executor:
+        # The samples of a question are always requested concurrently
+        executor = ThreadPoolExecutor(max_workers=max(concurrency, samples or 1))
+    try:
+        if samples:
+            schedule = "sampled"
+            results = run_questions_sampled(
+                test_model,
+                evaluator1_model,
+                evaluator2_model,
+                question_entries,
+                samples,
+                timeout_seconds,
+                system_prompt,
+                thinking_start_tag,
+                thinking_end_tag,
+                stream,
+                max_tokens,
+                max_chars,
+                keep_alive,
+                executor,
+                sample_seed,
+                sample_temperature,
+                short_circuit_eval
+            )
+        elif schedule == "grouped":
+            print(f"📦 Grouping work by model (keep-alive: {keep_alive})")
+            results = run_questions_grouped(
+                test_model,
+                evaluator1_model,
+                evaluator2_model,
+                question_entries,
+                max_attempts,
+                timeout_seconds,
+                system_prompt,
+                thinking_start_tag,
+                thinking_end_tag,
+                stream,
+                max_tokens,
+                max_chars,
+                keep_alive,
+                executor,
+                short_circuit_eval
+            )
+        elif schedule == "pipelined":
+            from pipeline import PipelineRun, run_pipeline
+            
+            if not pipeline_run:
+                pipeline_run = f"{test_model.replace(':', '-').replace('/', '-')}_{time.strftime('%Y%m%d-%H%M%S')}"
+            print(f"🔀 Pipelined run: {pipeline_run}")
+            try:
+                run = PipelineRun.create(pipeline_run, {
+                    "test_model": test_model,
+                    "evaluator1_model": evaluator1_model,
+                    "evaluator2_model": evaluator2_model,
+                    "questions": question_entries,
+                    "max_attempts": max_attempts,
+                    "timeout_seconds": timeout_seconds,
+                    "system_prompt": system_prompt,
+                    "thinking_start_tag": thinking_start_tag,
+                    "thinking_end_tag": thinking_end_tag,
+                    "stream": stream,
+                    "max_tokens": max_tokens,
+                    "max_chars": max_chars,
+                    "keep_alive": keep_alive,
+                    "short_circuit_eval": short_circuit_eval,
+                    "grading_profile": dict(grading_profile),
+                    "retry_policy": "adaptive" if retry_policy.adaptive else "fixed"
+                })
+            except ValueError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            results = run_pipeline(run, executor, settings=current_settings())
+        elif executor is None:
+            # Handle each question (ask, evaluate, retry if needed)
+            results = [handle_question(*job) for job in question_jobs]
+        else:
+            # Futures are kept in question order so the results are assembled in order
+            futures = [executor.submit(handle_question, *job) for job in question_jobs]
+            results = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+    
+    # Set display name for results if provided
+    model_name = display_name if display_name else test_model
+    
+    sampling = {}
+    if samples:
+        sampling = {
+            "samples": samples,
+            "sample_seed": sample_seed,
+            "sample_temperature": sample_temperature,
+            "pass_at_k": summarize_pass_at_k(results, samples)  # Mean unbiased pass@k estimate for k = 1..samples
+        }
+    
+    metadata = build_metadata(
+        test_model,
+        model_name,
+        evaluator1_model,
+        evaluator2_model,
+        results,
+        samples or max_attempts,
+        system_prompt=system_prompt,  # Store system prompt used
+        thinking_tags_used=bool(thinking_start_tag and thinking_end_tag),  # Record if thinking tags were used
+        streaming=stream,  # Record if answers were streamed with early termination
+        max_tokens=max_tokens,
+        max_chars=max_chars,
+        schedule=schedule,  # Record how work was ordered across models
+        pipeline_run_id=pipeline_run if schedule == "pipelined" else None,
+        selection=selection or None,  # Which questions were run, including the shard
+        shard_run=shard_run,  # Shared by the partial result files of one sharded run
+        **sampling
+    )
+    
+    return results, metadata, model_name
+
+def build_metadata(test_model, model_name, evaluator1_model, evaluator2_model, results, max_attempts, **settings):
+    """Print the final statistics for a test run and build its metadata
+    
+    Any extra settings of the run are stored in the metadata as given.
+    """
     # Calculate statistics based on best attempts - use lowercase assessment
     best_scores = [r["best_score"] for r in results]
     total_score = sum(best_scores)
@@ -550,16 +1558,28 @@ def run_test(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5
     total_attempts = sum(r["attempts"] for r in results)
     
     percentage = (total_score / max_score) * 100
-    correct_percentage = (correct_count / len(questions)) * 100
+    correct_percentage = (correct_count / len(results)) * 100
     
     print(f"\n{'='*80}")
     print(f"\n🎯 Final Results for {test_model} (Best of {max_attempts} attempts):")
-    print(f"📊 Correct answers: {correct_count}/{len(questions)} ({correct_percentage:.1f}%)")
+    print(f"📊 Correct answers: {correct_count}/{len(results)} ({correct_percentage:.1f}%)")
     print(f"🏅 Final Score: {total_score}/{max_score} ({percentage:.1f}%) {get_difficulty_stars(round(percentage/20))}")
-    print(f"🔄 Total attempts: {total_attempts} (avg: {total_attempts/len(questions):.1f} per question)")
+    print(f"🔄 Total attempts: {total_attempts} (avg: {total_attempts/len(results):.1f} per question)")
     
-    # Set display name for results if provided
-    model_name = display_name if display_name else test_model
+    stop_reasons = {}
+    for r in results:
+        if r.get("stop_reason"):
+            stop_reasons[r["stop_reason"]] = stop_reasons.get(r["stop_reason"], 0) + 1
+    if retry_policy.adaptive:
+        early_stops = sum(count for reason, count in stop_reasons.items() if reason not in ("correct", "timeout", "max_attempts"))
+        print(f"🛑 Stopped early: {early_stops} question(s)")
+    
+    if settings.get("pass_at_k"):
+        print("🎲 " + ", ".join(f"pass@{k}: {estimate * 100:.1f}%" for k, estimate in settings["pass_at_k"].items()))
+    
+    call_stats = summarize_results_stats(results)
+    print(f"⏱️ {test_model}: {format_call_summary(call_stats['test_model'])}")
+    print(f"⏱️ Evaluators: {format_call_summary(call_stats['evaluators'])}")
     
     # Create metadata
     metadata = {
@@ -572,17 +1592,59 @@ def run_test(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5
         "max_possible_score": max_score,
         "score_percentage": percentage,
         "correct_answers": correct_count,
-        "total_questions": len(questions),
+        "total_questions": len(results),
         "correct_percentage": correct_percentage,
         "total_attempts": total_attempts,
-        "avg_attempts": total_attempts / len(questions),
+        "avg_attempts": total_attempts / len(results),
         "max_attempts_allowed": max_attempts,
-        "system_prompt": system_prompt,  # Store system prompt used
-        "thinking_tags_used": bool(thinking_start_tag and thinking_end_tag),  # Record if thinking tags were used
-        "dual_evaluator_used": bool(evaluator2_model)  # Record if dual evaluation was used
+        "dual_evaluator_used": bool(evaluator2_model),  # Record if dual evaluation was used
+        "grading_profile": dict(grading_profile),  # Settings of the evaluator calls
+        "call_stats": call_stats,  # Latency, throughput and time split of the Ollama calls
+        "retry_policy": "adaptive" if retry_policy.adaptive else "fixed",
+        "stop_reasons": stop_reasons,  # How many questions stopped for each reason
+        **settings
     }
     
-    return results, metadata, model_name
+    return metadata
+
+def save_results(model_name, results, metadata, results_format="json"):
+    """Save results and metadata to a timestamped file in the results folder
+    
+    results_format="compact" writes small score records and compressed
+    transcripts to two files instead (see results_store.py).
+    """
+    # Save results to dedicated folder
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    results_dir = "results"
+    os.makedirs(results_dir, exist_ok=True)
+    
+    # Use model_name (which could be display name if provided) for the filename
+    base_path = f"{results_dir}/results_{model_name}_{timestamp}"
+    
+    # Combine results and metadata
+    final_results = {
+        "metadata": metadata,
+        "results": results
+    }
+    
+    if results_format == "compact":
+        results_file = save_compact(reserve_path(base_path, SCORES_SUFFIX), metadata, results)
+    else:
+        results_file = f"{reserve_path(base_path, '.json')}.json"
+        with open(results_file, 'w') as f:
+            json.dump(final_results, f, indent=2)
+    update_index(results_file, final_results)
+    
+    print(f"\n💾 Results saved to {results_file}")
+    
+    return results_file
+
+def parse_seconds(value):
+    """Parse a number of seconds for the command line, keeping whole numbers as int (so messages say "60 seconds")"""
+    seconds = float(value)
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return int(seconds) if seconds.is_integer() else seconds
 
 def get_model_link(model_name):
     """Ask user for a link or source to pull a missing model"""
@@ -666,19 +1728,131 @@ def main():
     parser.add_argument('--evaluator2', '-e2', default="mistral-small",help='Second evaluator model for consensus (default: mistral-small)')
     parser.add_argument('--no-table', '-n', action='store_true', help='Skip generating results table')
     parser.add_argument('--max-attempts', '-m', type=int, default=5, help='Maximum attempts per question (default: 5)')
-    parser.add_argument('--timeout', '-t', type=int, default=60, help='Timeout in seconds for each model response (default: 60)')
+    parser.add_argument('--timeout', '-t', type=parse_seconds, default=60, help='Timeout in seconds for each model response (default: 60)')
     parser.add_argument('--system-prompt', '-s', help='System prompt to use for the test model')
     parser.add_argument('--display-name', '-d', help='Custom display name for the test model (default: model name)')
     parser.add_argument('--thinking-start-tag', '-ts', help='Tag marking the start of thinking section to remove')
     parser.add_argument('--thinking-end-tag', '-te', help='Tag marking the end of thinking section to remove')
+    parser.add_argument('--concurrency', '-c', type=int, default=1, help='Number of questions (across all test models) to run in parallel (default: 1)')
+    parser.add_argument('--stream', action='store_true', help='Stream test model answers and stop early on timeout or budget')
+    parser.add_argument('--max-tokens', type=int, help='Token budget per test model answer (streaming mode)')
+    parser.add_argument('--max-chars', type=int, help='Character budget per test model answer (streaming mode)')
+    parser.add_argument('--schedule', choices=['interleaved', 'grouped', 'pipelined', 'distributed'], default='interleaved',
+                        help='interleaved: generate and grade each attempt in turn; grouped: batch generation and grading by model to avoid reloads; '
+                             'pipelined: generate all answers into a durable run, then grade them; '
+                             'distributed: queue the attempts for worker processes on any host (see work_queue.py) (default: interleaved)')
+    parser.add_argument('--pipeline-run', metavar='ID', help='Id of the pipelined run to create or reopen under results/pipeline/ '
+                        '(default: <model>_<timestamp>, single test model only); not the RUN_ID of --resume')
+    parser.add_argument('--coordinator-address', default='127.0.0.1:8765',
+                        help='HOST:PORT the coordinator of a distributed run listens on; use 0.0.0.0:PORT for workers on other hosts (default: 127.0.0.1:8765)')
+    parser.add_argument('--local-workers', type=int, default=0, help='Worker processes to start on this machine for a distributed run '
+                        '(default: 0, start them yourself with python work_queue.py URL)')
+    parser.add_argument('--lease-seconds', type=int, default=120, help='Seconds after which the job of a worker that stopped responding '
+                        'is handed to another worker (default: 120)')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE, help=f'How long models stay loaded during a phase of the grouped schedule (default: {DEFAULT_KEEP_ALIVE})')
+    parser.add_argument('--results-format', choices=['json', 'compact'], default='json',
+                        help='json: one indented JSON file per model; compact: JSONL score records plus gzipped transcripts (default: json)')
+    parser.add_argument('--resume', metavar='RUN_ID', help='Resume an interrupted run from its checkpoint journal (results/checkpoints/RUN_ID.jsonl)')
+    parser.add_argument('--hosts', help='Comma separated Ollama hosts to load-balance across (e.g. host1:11434,host2:11434; default: OLLAMA_HOST)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the asyncio client path; --concurrency then bounds the requests in flight per model')
+    parser.add_argument('--no-eval-cache', action='store_true', help='Disable the on-disk cache of evaluator responses')
+    parser.add_argument('--eval-cache-max-mb', type=int, default=DEFAULT_MAX_MB, help=f'Maximum size of the evaluation cache in MB (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--short-circuit-eval', action='store_true', help='Grade empty and skipped answers wrong without asking the evaluators, in every schedule')
+    parser.add_argument('--retry-policy', choices=['fixed', 'adaptive'], default='fixed',
+                        help='fixed: retry wrong answers until --max-attempts; adaptive: also stop on a repeated answer or when '
+                             'earlier results make success unlikely (default: fixed)')
+    parser.add_argument('--samples', '-k', type=int, help='pass@k mode: draw K concurrent samples per question instead of retrying, '
+                        'grade them all and report pass@1..pass@K')
+    parser.add_argument('--sample-seed', type=int, default=DEFAULT_SAMPLE_SEED, help=f'Seed of the first sample; sample i uses seed + i (default: {DEFAULT_SAMPLE_SEED})')
+    parser.add_argument('--sample-temperature', type=float, default=DEFAULT_SAMPLE_TEMPERATURE, help=f'Temperature of the samples (default: {DEFAULT_SAMPLE_TEMPERATURE})')
+    add_selection_arguments(parser)
+    parser.add_argument('--shard-run', metavar='ID', help='Id shared by all shards of a sharded run, so the results table merges their files')
+    add_grading_arguments(parser)
     args = parser.parse_args()
     
-    print("🔍 Checking for required models...")
-    # Check for all models upfront and ask for links if any are missing
-    check_and_prepare_models(args.test_models, args.evaluator, args.evaluator2)
+    selection = selection_from_args(args)
+    if args.shard and not args.shard_run:
+        parser.error("--shard requires --shard-run, so the partial result files can be merged")
+    if not load_questions("questions.json", **selection):
+        parser.error("no questions match the selection")
+    if args.samples is not None and (args.samples < 1 or args.use_async or args.schedule != "interleaved" or args.retry_policy != "fixed"):
+        parser.error("--samples must be at least 1 and can't be combined with --async, --schedule or --retry-policy")
+    if (args.max_tokens or args.max_chars) and not args.stream:
+        parser.error("--max-tokens and --max-chars require --stream")
+    if args.pipeline_run and (args.schedule != "pipelined" or len(args.test_models) > 1):
+        parser.error("--pipeline-run requires --schedule pipelined and a single test model")
+    if args.use_async and args.schedule != "interleaved":
+        parser.error("--async only supports the interleaved schedule")
+    if args.schedule == "distributed" and args.lease_seconds < 60:
+        parser.error("--lease-seconds must be at least 60, so workers can renew their leases in time")
+    if args.resume and not CheckpointJournal.exists(args.resume):
+        parser.error(f"no checkpoint journal found for run {args.resume}")
+    if args.resume and CheckpointJournal(args.resume).complete:
+        parser.error(f"run {args.resume} is already complete; its results are saved")
+    
+    configure_eval_cache(not args.no_eval_cache, max_mb=args.eval_cache_max_mb)
+    configure_grading_from_args(args)
+    configure_retry_policy(args.retry_policy)
+    run_id = args.resume or new_run_id()
+    configure_checkpoint(run_id)
+    # Recorded attempts are only replayed into a run with the same settings
+    changed = checkpoint.changed_settings({
+        "test_models": args.test_models,
+        "evaluator": args.evaluator,
+        "evaluator2": args.evaluator2,
+        "max_attempts": args.max_attempts,
+        "timeout": args.timeout,
+        "system_prompt": args.system_prompt,
+        "thinking_start_tag": args.thinking_start_tag,
+        "thinking_end_tag": args.thinking_end_tag,
+        "stream": args.stream,
+        "max_tokens": args.max_tokens,
+        "max_chars": args.max_chars,
+        "samples": args.samples,
+        "sample_seed": args.sample_seed,
+        "sample_temperature": args.sample_temperature,
+        "retry_policy": args.retry_policy,
+        "selection": selection,
+        "grading_profile": dict(grading_profile)
+    })
+    if changed:
+        parser.error(f"run {run_id} was started with other settings ({', '.join(changed)}); "
+                     f"resume it with the same options or start a new run")
+    if args.resume:
+        print(f"♻️ Resuming run {run_id} from {checkpoint.path}")
+    else:
+        print(f"📒 Checkpointing to {checkpoint.path} (resume with --resume {run_id})")
+    if args.hosts:
+        configure_hosts(parse_hosts(args.hosts))
+        print(f"🖧 Load-balancing across {len(host_pool.hosts)} Ollama hosts: {', '.join(host_pool.hosts)}")
+    
+    if args.schedule == "distributed" and not args.local_workers:
+        # The coordinator itself never calls Ollama, and may not even have it
+        print("🔍 Not checking models: they must be available on the Ollama hosts of the workers")
+    else:
+        print("🔍 Checking for required models...")
+        # Check for all models upfront and ask for links if any are missing
+        check_and_prepare_models(args.test_models, args.evaluator, args.evaluator2)
+    
+    if args.use_async:
+        print(f"⚡ Async mode: up to {args.concurrency} requests in flight per model")
+    elif args.schedule == "distributed":
+        if args.local_workers and args.concurrency > 1:
+            print(f"⚡ Each local worker runs up to {args.concurrency} jobs in parallel")
+    elif args.concurrency > 1:
+        print(f"⚡ Running up to {args.concurrency} questions in parallel")
+    
+    # Shared worker pool for question work across all test models; the samples of a question run concurrently
+    executor = (ThreadPoolExecutor(max_workers=max(args.concurrency, args.samples or 1))
+                if (args.concurrency > 1 or args.samples) and not args.use_async and args.schedule != "distributed"
+                else None)
     
-    # Process each test model sequentially
-    for test_model in args.test_models:
+    def test_single_model(test_model):
+        if checkpoint.saved_results_file(test_model):
+            print(f"\n♻️ {test_model} already finished in this run: {checkpoint.saved_results_file(test_model)}")
+            return
+        
         print(f"\n\n{'='*80}")
         model_display = args.display_name if args.display_name else test_model
         print(f"🚀 Starting test for model: {model_display} ({test_model})")
@@ -702,32 +1876,111 @@ def main():
             args.system_prompt, 
             args.display_name,
             args.thinking_start_tag,
-            args.thinking_end_tag
+            args.thinking_end_tag,
+            executor=executor,
+            stream=args.stream,
+            max_tokens=args.max_tokens,
+            max_chars=args.max_chars,
+            short_circuit_eval=args.short_circuit_eval,
+            schedule=args.schedule,
+            keep_alive=args.keep_alive,
+            pipeline_run=args.pipeline_run,
+            samples=args.samples,
+            sample_seed=args.sample_seed,
+            sample_temperature=args.sample_temperature,
+            selection=selection,
+            shard_run=args.shard_run
         )
         
-        # Save results to dedicated folder
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        results_dir = "results"
-        os.makedirs(results_dir, exist_ok=True)
-        
-        # Use model_name (which could be display name if provided) for the filename
-        results_file = f"{results_dir}/results_{model_name}_{timestamp}.json"
-        
-        # Combine results and metadata
-        final_results = {
-            "metadata": metadata,
-            "results": results
-        }
-        
-        with open(results_file, 'w') as f:
-            json.dump(final_results, f, indent=2)
-        
-        print(f"\n💾 Results saved to {results_file}")
+        results_file = save_results(model_name, results, metadata, args.results_format)
+        checkpoint.record_saved(test_model, results_file)
         
         print(f"\n{'='*80}")
         print(f"✅ Test completed for model: {model_name}")
         print(f"{'='*80}")
     
+    try:
+        if args.use_async:
+            import asyncio
+            from run_test_async import run_models
+            
+            # All test models run at once on a single event loop
+            test_models = [m for m in args.test_models if not checkpoint.saved_results_file(m)]
+            all_results = asyncio.run(run_models(
+                test_models,
+                args.evaluator,
+                args.evaluator2,
+                args.max_attempts,
+                args.timeout,
+                args.system_prompt,
+                args.display_name,
+                args.thinking_start_tag,
+                args.thinking_end_tag,
+                stream=args.stream,
+                max_tokens=args.max_tokens,
+                max_chars=args.max_chars,
+                short_circuit_eval=args.short_circuit_eval,
+                max_in_flight=args.concurrency,
+                selection=selection,
+                shard_run=args.shard_run,
+                settings=current_settings()
+            ))
+            for test_model, (results, metadata, model_name) in zip(test_models, all_results):
+                checkpoint.record_saved(test_model, save_results(model_name, results, metadata, args.results_format))
+        elif args.schedule == "distributed":
+            from work_queue import run_distributed
+            
+            # All test models share one queue; each local worker runs --concurrency jobs at a time
+            worker_args = ["--concurrency", str(args.concurrency), "--eval-cache-max-mb", str(args.eval_cache_max_mb)]
+            if args.no_eval_cache:
+                worker_args.append("--no-eval-cache")
+            if args.hosts:
+                worker_args += ["--hosts", args.hosts]
+            test_models = [m for m in args.test_models if not checkpoint.saved_results_file(m)]
+            all_results = run_distributed(
+                test_models,
+                args.evaluator,
+                args.evaluator2,
+                args.max_attempts,
+                args.timeout,
+                args.system_prompt,
+                args.display_name,
+                args.thinking_start_tag,
+                args.thinking_end_tag,
+                stream=args.stream,
+                max_tokens=args.max_tokens,
+                max_chars=args.max_chars,
+                short_circuit_eval=args.short_circuit_eval,
+                selection=selection,
+                shard_run=args.shard_run,
+                run_id=run_id,
+                address=args.coordinator_address,
+                local_workers=args.local_workers,
+                lease_seconds=args.lease_seconds,
+                worker_args=worker_args,
+                settings=current_settings()
+            ) if test_models else []
+            for test_model, (results, metadata, model_name) in zip(test_models, all_results):
+                checkpoint.record_saved(test_model, save_results(model_name, results, metadata, args.results_format))
+        elif args.concurrency <= 1 or args.schedule in ("grouped", "pipelined"):
+            # Process each test model sequentially, so only one test model is loaded at a time
+            for test_model in args.test_models:
+                test_single_model(test_model)
+        else:
+            # Process test models in parallel; their questions share the worker pool
+            with ThreadPoolExecutor(max_workers=len(args.test_models)) as model_executor:
+                for future in [model_executor.submit(test_single_model, m) for m in args.test_models]:
+                    future.result()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    if all(checkpoint.saved_results_file(m) for m in args.test_models):
+        checkpoint.mark_complete()
+    
+    if eval_cache is not None:
+        print(f"\n🗃️ Evaluation cache: {eval_cache.hits} hits, {eval_cache.misses} misses")
+    
     # Generate results table after all tests are complete
     if not args.no_table:
         try:
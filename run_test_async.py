@@ -0,0 +1,455 @@
+import asyncio
+import time
+
+import httpx
+from ollama import AsyncClient
+
+import run_test
+from ollama_hosts import is_host_failure
+from call_stats import response_stats, truncated_stats
+from retry_policy import STOP_REASONS
+from run_test import (
+    EVALUATION_PROMPT,
+    ThinkingFilter,
+    VerdictWatcher,
+    build_attempt_stats,
+    build_metadata,
+    build_question_entries,
+    build_question_result,
+    describe_selection,
+    finish_streamed_answer,
+    forced_wrong_result,
+    get_difficulty_stars,
+    load_questions,
+    parse_evaluation,
+    read_file_content,
+    strip_thinking
+)
+
+# Maximum number of requests in flight per (host, model) unless configured otherwise
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# Async clients and semaphores belong to the event loop they were created in
+_async_clients = {}
+_semaphores = {}
+
+def get_async_client(host=None, timeout_seconds=None):
+    """Get a shared async Ollama client for the running event loop"""
+    key = (asyncio.get_running_loop(), host, timeout_seconds)
+    if key not in _async_clients:
+        _async_clients[key] = AsyncClient(host=host, timeout=timeout_seconds)
+    return _async_clients[key]
+
+def get_semaphore(host, model, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Get the semaphore bounding the number of requests in flight to one model on one host"""
+    key = (asyncio.get_running_loop(), host, model)
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.BoundedSemaphore(max_in_flight)
+    return _semaphores[key]
+
+async def close_async_clients():
+    """Close the async clients of the running event loop"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _async_clients if key[0] is loop]:
+        await _async_clients.pop(key).close()
+    for key in [key for key in _semaphores if key[0] is loop]:
+        del _semaphores[key]
+
+async def stream_answer(client, model, question_content, timeout_seconds=60, system_prompt=None, options=None,
+                        thinking_start_tag=None, thinking_end_tag=None, max_tokens=None, max_chars=None,
+                        keep_alive=False, stats=None):
+    """Coroutine version of run_test.stream_answer"""
+    options = dict(options or {})
+    if max_tokens:
+        options["num_predict"] = max_tokens
+
+    thinking_filter = ThinkingFilter(thinking_start_tag, thinking_end_tag)
+    eval_count = None
+    char_count = 0
+    stop_reason = None
+
+    chunks = await client.generate(
+        model=model,
+        prompt=question_content,
+        system=system_prompt if system_prompt else "",
+        options=options,
+        keep_alive=keep_alive,
+        stream=True
+    )
+    try:
+        # The deadline also holds while no chunk arrives
+        async with asyncio.timeout(timeout_seconds):
+            async for chunk in chunks:
+                # Thinking content is dropped here instead of being kept in memory
+                thinking_filter.feed(chunk['response'])
+                char_count += len(chunk['response'])
+
+                if chunk['done']:
+                    # Ollama only reports its stats (and the token count) on the final chunk
+                    eval_count = chunk.get('eval_count')
+                    if stats is not None:
+                        stats.append(response_stats(model, chunk))
+                    if chunk.get('done_reason') == "length":
+                        stop_reason = "budget"
+                    break
+                if thinking_filter.rethinking:
+                    stop_reason = "answered"
+                    break
+                if max_chars and char_count >= max_chars:
+                    stop_reason = "budget"
+                    break
+    except (TimeoutError, httpx.TimeoutException):
+        stop_reason = "timeout"
+    finally:
+        # Closing the stream drops the connection, which cancels the generation
+        await chunks.aclose()
+
+    thinking_filter.flush()
+    return finish_streamed_answer(model, thinking_filter, stop_reason, timeout_seconds, eval_count, char_count)
+
+async def stream_evaluation(client, model, prompt, keep_alive=False, stats=None):
+    """Stream an evaluation and stop it as soon as its verdict JSON is complete"""
+    verdict_watcher = VerdictWatcher()
+    chunks = await client.generate(
+        model=model,
+        prompt=prompt,
+        options=run_test.evaluator_options(),
+        format=run_test.evaluator_format(),
+        keep_alive=keep_alive,
+        stream=True
+    )
+    response_text = ""
+    start_time = time.monotonic()
+    first_chunk_time = None
+    chunk_count = 0
+    try:
+        async for chunk in chunks:
+            first_chunk_time = first_chunk_time or time.monotonic()
+            chunk_count += 1
+            response_text += chunk['response']
+            if chunk['done'] and stats is not None:
+                stats.append(response_stats(model, chunk))
+            if verdict_watcher.feed(chunk['response']):
+                if not chunk['done'] and stats is not None:
+                    # Stopped before Ollama reported its stats
+                    now = time.monotonic()
+                    stats.append(truncated_stats(model, now - start_time, now - first_chunk_time, chunk_count))
+                break
+    finally:
+        # Closing the stream drops the connection, which cancels the generation
+        await chunks.aclose()
+    return response_text
+
+async def ask_question(model, question_content, timeout_seconds=60, is_evaluator=False, system_prompt=None,
+                       thinking_start_tag=None, thinking_end_tag=None, stream=False, max_tokens=None,
+                       max_chars=None, keep_alive=False, host=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, stats=None):
+    """Coroutine version of run_test.ask_question
+
+    The number of concurrent requests per (host, model) is bounded by
+    max_in_flight. The timeout only counts once a request has been sent.
+    Cancelling the task closes the connection, so Ollama stops generating.
+    If run_test has a host pool configured, the host is picked from it, and
+    a request that fails because of its host is retried once on another one.
+    """
+    pool = run_test.host_pool
+    if pool is None or host is not None:
+        return await _ask_host(model, question_content, timeout_seconds, is_evaluator, system_prompt,
+                               thinking_start_tag, thinking_end_tag, stream, max_tokens, max_chars, keep_alive,
+                               host, max_in_flight, stats)
+
+    for retry in (False, True):
+        # Picking a host can ask the hosts which models they have loaded, a blocking call
+        host = await asyncio.to_thread(pool.acquire, model)
+        failed = False
+        try:
+            return await _ask_host(model, question_content, timeout_seconds, is_evaluator, system_prompt,
+                                   thinking_start_tag, thinking_end_tag, stream, max_tokens, max_chars, keep_alive,
+                                   host, max_in_flight, stats, raise_host_failures=True)
+        except Exception as e:
+            failed = True
+            error = e
+        finally:
+            pool.release(host, failed)
+        # The failed host is evicted now, so the retry goes to another one
+        if retry or not pool.healthy_hosts():
+            break
+        print(f"\n🔁 Ollama host {host} failed ({str(error)}), retrying on another host")
+    print(f"\n❌ Error getting model response: {str(error)}")
+    return f"[ERROR: {str(error)}]"
+
+async def _ask_host(model, question_content, timeout_seconds, is_evaluator, system_prompt, thinking_start_tag,
+                    thinking_end_tag, stream, max_tokens, max_chars, keep_alive, host, max_in_flight, stats=None,
+                    raise_host_failures=False):
+    """Send a question to one host, see ask_question"""
+    async with get_semaphore(host, model, max_in_flight):
+        try:
+            # Set up options dictionary (only for context size and performance parameters)
+            options = {"num_ctx": 4096}
+
+            # For evaluator models, don't apply timeout
+            if is_evaluator:
+                if run_test.grading_profile["stop_on_json"]:
+                    return await stream_evaluation(get_async_client(host), model, question_content, keep_alive,
+                                                   stats)
+                response = await get_async_client(host).generate(
+                    model=model,
+                    prompt=question_content,
+                    options=run_test.evaluator_options(),
+                    format=run_test.evaluator_format(),
+                    keep_alive=keep_alive
+                )
+                if stats is not None:
+                    stats.append(response_stats(model, response))
+                return response['response']
+
+            client = get_async_client(host, timeout_seconds)
+
+            # Streaming mode stops generation early instead of waiting for the full completion
+            if stream:
+                return await stream_answer(client, model, question_content, timeout_seconds, system_prompt, options,
+                                           thinking_start_tag, thinking_end_tag, max_tokens, max_chars, keep_alive,
+                                           stats)
+
+            # For test models, apply timeout and system prompt if provided
+            response = await asyncio.wait_for(client.generate(
+                model=model,
+                prompt=question_content,
+                system=system_prompt if system_prompt else "",
+                options=options,
+                keep_alive=keep_alive
+            ), timeout_seconds)
+            if stats is not None:
+                stats.append(response_stats(model, response))
+
+            # Strip thinking section if tags are provided
+            return strip_thinking(response['response'], thinking_start_tag, thinking_end_tag)
+
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            print(f"\n⏱️ Model response timed out after {timeout_seconds} seconds!")
+            return f"[TIMEOUT ERROR: The model did not respond within {timeout_seconds} seconds]"
+        except Exception as e:
+            if raise_host_failures and is_host_failure(e):
+                raise
+            print(f"\n❌ Error getting model response: {str(e)}")
+            return f"[ERROR: {str(e)}]"
+
+async def evaluate_answer(evaluator_model, user_answer, model_answer, question, sample=0, keep_alive=False,
+                          max_in_flight=DEFAULT_MAX_IN_FLIGHT, stats=None):
+    """Coroutine version of run_test.evaluate_answer, sharing its evaluation cache"""
+    prompt = EVALUATION_PROMPT.format(question=question, model_answer=model_answer, user_answer=user_answer)
+
+    eval_cache = run_test.eval_cache
+    cache_key = None
+    if eval_cache is not None:
+        cache_key = eval_cache.make_key(evaluator_model, prompt, sample=sample, grading=run_test.grading_profile)
+        # SQLite calls block, so they run in a worker thread instead of on the event loop
+        cached_evaluation = await asyncio.to_thread(eval_cache.get, cache_key)
+        if cached_evaluation is not None:
+            return cached_evaluation
+
+    evaluation = await ask_question(evaluator_model, prompt, is_evaluator=True, keep_alive=keep_alive,
+                                    max_in_flight=max_in_flight, stats=stats)
+
+    # Don't cache failed evaluations
+    if cache_key and not evaluation.startswith("[ERROR:"):
+        await asyncio.to_thread(eval_cache.put, cache_key, evaluator_model, evaluation)
+    return evaluation
+
+async def evaluate_with_double_check(evaluator1_model, evaluator2_model, user_answer, model_answer, question,
+                                     max_retry=3, max_in_flight=DEFAULT_MAX_IN_FLIGHT, stats=None):
+    """Coroutine version of run_test.evaluate_with_double_check"""
+    print(f"⚖️ Double-evaluating with {evaluator1_model} and {evaluator2_model}...")
+
+    for attempt in range(1, max_retry + 1):
+        if attempt > 1:
+            print(f"🔄 Retry #{attempt-1} for evaluation consensus...")
+
+        # Get both evaluations concurrently
+        evaluation1, evaluation2 = await asyncio.gather(
+            evaluate_answer(evaluator1_model, user_answer, model_answer, question, sample=attempt - 1,
+                            max_in_flight=max_in_flight, stats=stats),
+            evaluate_answer(evaluator2_model, user_answer, model_answer, question, sample=attempt - 1,
+                            max_in_flight=max_in_flight, stats=stats)
+        )
+        assessment1, score1 = parse_evaluation(evaluation1)
+        assessment2, score2 = parse_evaluation(evaluation2)
+
+        # Check if assessments agree
+        if assessment1 == assessment2:
+            print(f"✅ Evaluators agree: {assessment1}")
+            return {
+                "evaluation": f"CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                "assessment": assessment1,
+                "score": max(score1, score2),  # Use the highest score
+                "consensus": True
+            }
+
+        print(f"⚠️ Evaluators disagree: {evaluator1_model}={assessment1}, {evaluator2_model}={assessment2}")
+        if attempt == max_retry:
+            print(f"⚠️ After {max_retry} attempts, evaluators still disagree. Using first evaluator.")
+            return {
+                "evaluation": f"NO CONSENSUS:\n{evaluation1}\n\n---SECOND EVALUATOR---\n{evaluation2}",
+                "assessment": assessment1,  # Fall back to first evaluator
+                "score": score1,
+                "consensus": False
+            }
+
+async def process_question_attempt(test_model, evaluator1_model, evaluator2_model, question_content,
+                                   model_answer_content, attempt_num=1, timeout_seconds=60, system_prompt=None,
+                                   thinking_start_tag=None, thinking_end_tag=None, stream=False, max_tokens=None,
+                                   max_chars=None, short_circuit_eval=False, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Coroutine version of run_test.process_question_attempt"""
+    answer_stats = []
+    evaluation_stats = []
+    user_answer = await ask_question(test_model, question_content, timeout_seconds=timeout_seconds,
+                                     system_prompt=system_prompt, thinking_start_tag=thinking_start_tag,
+                                     thinking_end_tag=thinking_end_tag, stream=stream, max_tokens=max_tokens,
+                                     max_chars=max_chars, max_in_flight=max_in_flight, stats=answer_stats)
+
+    # For timeout or error responses (and with short_circuit_eval, empty ones), force "wrong" assessment
+    forced = forced_wrong_result(user_answer, short_circuit_eval)
+    if forced is not None:
+        return {"answer": user_answer, **forced, "stats": build_attempt_stats(answer_stats, evaluation_stats)}
+
+    # Use double evaluation if second evaluator is provided
+    if evaluator2_model:
+        result = await evaluate_with_double_check(evaluator1_model, evaluator2_model, user_answer,
+                                                  model_answer_content, question_content, max_in_flight=max_in_flight,
+                                                  stats=evaluation_stats)
+    else:
+        # Fall back to single evaluator if no second evaluator
+        evaluation = await evaluate_answer(evaluator1_model, user_answer, model_answer_content, question_content,
+                                           max_in_flight=max_in_flight, stats=evaluation_stats)
+        assessment, score = parse_evaluation(evaluation)
+        result = {
+            "evaluation": evaluation,
+            "assessment": assessment,
+            "score": score,
+            "consensus": True  # Mark as consensus since only one evaluator
+        }
+
+    result["answer"] = user_answer
+    result["stats"] = build_attempt_stats(answer_stats, evaluation_stats)
+    return result
+
+async def handle_question(test_model, evaluator1_model, evaluator2_model, question_data, q_index, total_questions,
+                          max_attempts=5, timeout_seconds=60, system_prompt=None, thinking_start_tag=None,
+                          thinking_end_tag=None, stream=False, max_tokens=None, max_chars=None,
+                          short_circuit_eval=False, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Coroutine version of run_test.handle_question"""
+    short_name = question_data.get("short_name", f"Q{q_index}")
+    question_content = read_file_content(question_data["question_path"])
+    model_answer_content = read_file_content(question_data["answer_path"])
+
+    attempt_results = []
+    checkpoint = run_test.checkpoint
+    for attempt in range(1, max_attempts + 1):
+        result = checkpoint.get_attempt(test_model, question_data["question_path"], attempt) if checkpoint else None
+        if result is None:
+            result = await process_question_attempt(
+                test_model,
+                evaluator1_model,
+                evaluator2_model,
+                question_content,
+                model_answer_content,
+                attempt,
+                timeout_seconds=timeout_seconds,
+                system_prompt=system_prompt,
+                thinking_start_tag=thinking_start_tag,
+                thinking_end_tag=thinking_end_tag,
+                stream=stream,
+                max_tokens=max_tokens,
+                max_chars=max_chars,
+                short_circuit_eval=short_circuit_eval,
+                max_in_flight=max_in_flight
+            )
+            if checkpoint is not None:
+                # The journal syncs each record to disk, which would block the event loop
+                await asyncio.to_thread(checkpoint.record_attempt, test_model, question_data["question_path"],
+                                        attempt, result)
+        attempt_results.append(result)
+
+        result_emoji = "✅" if result["assessment"] == "correct" else "❌"
+        print(f"{result_emoji} {test_model} Q{q_index}/{total_questions} {short_name}, attempt {attempt}: "
+              f"{result['assessment']} ({result['score']}/5) {get_difficulty_stars(result['score'])}")
+
+        stop_reason = run_test.retry_policy.stop_reason(test_model, question_data["question_path"], attempt_results, max_attempts)
+        if stop_reason is not None:
+            if stop_reason not in ("correct", "timeout", "max_attempts"):
+                print(f"🛑 {test_model} Q{q_index}/{total_questions} {short_name} stopping early: {STOP_REASONS[stop_reason]}")
+            break
+
+    return build_question_result(question_data, q_index, attempt_results, stop_reason)
+
+async def run_test_async(test_model, evaluator1_model, evaluator2_model=None, max_attempts=5, timeout_seconds=60,
+                         system_prompt=None, display_name=None, thinking_start_tag=None, thinking_end_tag=None,
+                         stream=False, max_tokens=None, max_chars=None, short_circuit_eval=False,
+                         max_in_flight=DEFAULT_MAX_IN_FLIGHT, selection=None, shard_run=None):
+    """Coroutine version of run_test.run_test
+
+    All questions are started at once; the per-(host, model) semaphores decide
+    how many requests are actually in flight. Results stay in question order.
+    """
+    questions = load_questions("questions.json", **(selection or {}))
+    if selection:
+        print(f"🔎 Running {len(questions)} selected question(s): {describe_selection(selection)}")
+
+    print(f"\n🧠 Running async test with {test_model}, evaluated by {evaluator1_model}" +
+          (f" and {evaluator2_model}" if evaluator2_model else "") +
+          f" (max {max_in_flight} requests in flight per model) 🧠\n")
+
+    results = await asyncio.gather(*(
+        handle_question(
+            test_model,
+            evaluator1_model,
+            evaluator2_model,
+            question_data,
+            i,
+            len(questions),
+            max_attempts,
+            timeout_seconds,
+            system_prompt,
+            thinking_start_tag,
+            thinking_end_tag,
+            stream,
+            max_tokens,
+            max_chars,
+            short_circuit_eval,
+            max_in_flight
+        )
+        for i, question_data in build_question_entries(questions)
+    ))
+
+    # Set display name for results if provided
+    model_name = display_name if display_name else test_model
+
+    metadata = build_metadata(
+        test_model,
+        model_name,
+        evaluator1_model,
+        evaluator2_model,
+        results,
+        max_attempts,
+        system_prompt=system_prompt,
+        thinking_tags_used=bool(thinking_start_tag and thinking_end_tag),
+        streaming=stream,
+        max_tokens=max_tokens,
+        max_chars=max_chars,
+        schedule="async",
+        selection=selection or None,
+        shard_run=shard_run
+    )
+
+    return results, metadata, model_name
+
+async def run_models(test_models, *args, settings=None, **kwargs):
+    """Run the async test for several test models at once and close the clients afterwards
+
+    settings (from run_test.current_settings) are applied first when given.
+    """
+    if settings is not None:
+        run_test.apply_settings(settings)
+    try:
+        return await asyncio.gather(*(run_test_async(test_model, *args, **kwargs) for test_model in test_models))
+    finally:
+        await close_async_clients()
@@ -14,8 +14,11 @@ from run_test import (
     get_difficulty_stars,
     parse_evaluation,
     check_model_exists,
-    pull_model_with_progress
+    pull_model_with_progress,
+    configure_eval_cache
 )
+from results_index import update_index
+from results_store import reserve_path
 
 def display_question(question_content, short_name, q_index, total_questions, 
                     human_difficulty, ai_difficulty):
@@ -379,10 +382,11 @@ def save_results(model_name, evaluator1_model, evaluator2_model, results):
     timestamp = time.strftime("%Y%m%d-%H%M%S")
     results_dir = "results"
     os.makedirs(results_dir, exist_ok=True)
-    results_file = f"{results_dir}/results_{model_name}_manual_{timestamp}.json"
+    results_file = f"{reserve_path(f'{results_dir}/results_{model_name}_manual_{timestamp}', '.json')}.json"
     
     with open(results_file, 'w') as f:
         json.dump(final_results, f, indent=2)
+    update_index(results_file, final_results)
     
     print(f"\n💾 Results saved to {results_file}")
     
@@ -399,8 +403,12 @@ def main():
                       help='Maximum attempts per question (default: 5)')
     parser.add_argument('--no-table', '-n', action='store_true', 
                       help='Skip generating results table')
+    parser.add_argument('--no-eval-cache', action='store_true',
+                      help='Disable the on-disk cache of evaluator responses')
     args = parser.parse_args()
     
+    configure_eval_cache(not args.no_eval_cache)
+    
     print(f"\n{'='*80}")
     print(f"🚀 Starting manual test for model: {args.model_name}")
     print(f"{'='*80}\n")
@@ -0,0 +1,76 @@
+import pytest
+
+from call_stats import (
+    format_call_summary,
+    percentile,
+    response_stats,
+    summarize_call_stats,
+    summarize_results_stats,
+    truncated_stats
+)
+
+def call(model="m", total=2.0, load=0.5, prompt_count=100, prompt=0.5, eval_count=50, eval=1.0):
+    """Call stats as Ollama reports them, with durations given in seconds"""
+    return {"model": model, "total_duration": int(total * 1e9), "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_count, "prompt_eval_duration": int(prompt * 1e9),
+            "eval_count": eval_count, "eval_duration": int(eval * 1e9)}
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([7], 50) == 7
+    assert percentile([7], 95) == 7
+    # Unsorted input, interpolated between the closest ranks
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 95) == pytest.approx(3.85)
+    assert percentile([1, 2, 3, 4], 0) == 1
+    assert percentile([1, 2, 3, 4], 100) == 4
+
+def test_response_stats_fills_missing_fields():
+    assert response_stats("m", {"eval_count": 3, "eval_duration": None, "response": "x"}) == {
+        "model": "m", "total_duration": 0, "load_duration": 0, "prompt_eval_count": 0,
+        "prompt_eval_duration": 0, "eval_count": 3, "eval_duration": 0}
+
+def test_truncated_stats_count_chunks_as_tokens():
+    stats = truncated_stats("m", 2.0, 1.5, 30)
+    assert stats == {"model": "m", "total_duration": 2000000000, "load_duration": 0, "prompt_eval_count": 0,
+                     "prompt_eval_duration": 0, "eval_count": 30, "eval_duration": 1500000000, "truncated": True}
+    assert summarize_call_stats([stats])["tokens_per_second"] == 20
+
+def test_summarize_call_stats():
+    assert summarize_call_stats([]) is None
+
+    single = summarize_call_stats([call()])
+    assert single["calls"] == 1
+    assert single["latency_p50"] == single["latency_p95"] == 2.0
+    assert single["tokens_per_second"] == 50
+    assert single["prompt_tokens_per_second"] == 200
+    assert (single["load_share"], single["prompt_share"], single["decode_share"]) == (0.25, 0.25, 0.5)
+
+    summary = summarize_call_stats([call(total=1.0), call(total=3.0, eval_count=150, eval=2.0)])
+    assert summary["latency_p50"] == 2.0
+    assert summary["latency_p95"] == pytest.approx(2.9)
+    assert summary["generated_tokens"] == 200
+    assert summary["tokens_per_second"] == pytest.approx(200 / 3)
+
+def test_calls_without_durations_have_no_throughput():
+    summary = summarize_call_stats([call(total=0, load=0, prompt=0, eval=0)])
+    assert summary["tokens_per_second"] is None
+    assert summary["prompt_tokens_per_second"] is None
+    assert summary["decode_share"] == 0
+    assert format_call_summary(summary).startswith("1 calls, p50 0.00s, p95 0.00s, n/a tok/s")
+    assert format_call_summary(None) == "no calls recorded"
+
+def test_summarize_results_stats():
+    assert summarize_results_stats([]) == {"test_model": None, "evaluators": None}
+
+    results = [
+        {"stats": [{"answer": call("t"), "evaluations": [call("e1"), call("e2")]},
+                   # An attempt cut short before the test model reported its stats
+                   {"answer": None, "evaluations": []}]},
+        # Results saved before stats were recorded
+        {"stats": [{}]},
+        {}
+    ]
+    summary = summarize_results_stats(results)
+    assert summary["test_model"]["calls"] == 1
+    assert summary["evaluators"]["calls"] == 2
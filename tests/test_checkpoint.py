@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+import checkpoint
+import run_test
+from checkpoint import CheckpointJournal, new_run_id
+from mock_ollama import MockOllamaServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(run_test, "checkpoint", None)
+
+@pytest.fixture
+def server(monkeypatch):
+    # questions.json and the question files are found relative to the repository
+    monkeypatch.chdir(REPO_DIR)
+    with MockOllamaServer({"latency": 0, "load_delay": 0, "tokens_per_second": 5000, "seed": 3}) as server:
+        run_test.configure_hosts([server.url])
+        yield server
+        run_test.configure_hosts(None)
+
+def run_questions():
+    return run_test.run_test("mock-model", "mock-evaluator", "mock-evaluator2", max_attempts=3, timeout_seconds=5)[0]
+
+def test_resumed_run_does_not_repeat_attempts(server, monkeypatch):
+    process_question_attempt = run_test.process_question_attempt
+    calls = []
+    kill_after = [4]
+
+    def counted(test_model, evaluator1_model, evaluator2_model, question_content, model_answer_content, attempt,
+                **kwargs):
+        if len(calls) == kill_after[0]:
+            raise KeyboardInterrupt
+        calls.append((question_content, attempt))
+        return process_question_attempt(test_model, evaluator1_model, evaluator2_model, question_content,
+                                        model_answer_content, attempt, **kwargs)
+
+    monkeypatch.setattr(run_test, "process_question_attempt", counted)
+    run_id = new_run_id()
+    run_test.configure_checkpoint(run_id)
+    with pytest.raises(KeyboardInterrupt):
+        run_questions()
+
+    # Resumed as a new process would: from the journal on disk
+    kill_after[0] = None
+    journal = run_test.configure_checkpoint(run_id)
+    results = run_questions()
+    assert len(calls) == len(set(calls)) == sum(result["attempts"] for result in results)
+
+    with open(journal.path) as f:
+        keys = [(r["question_path"], r["attempt"]) for r in map(json.loads, f) if r["type"] == "attempt"]
+    assert len(keys) == len(set(keys)) == len(calls)
+
+    # The same results as a run that was never interrupted
+    server.mock.reset()
+    monkeypatch.setattr(run_test, "checkpoint", None)
+    assert [r["scores"] for r in run_questions()] == [r["scores"] for r in results]
+
+def test_settings_must_match_to_resume():
+    journal = CheckpointJournal("run")
+    settings = {"test_models": ("a", "b"), "max_attempts": 3, "evaluator": "judge"}
+    assert journal.changed_settings(settings) == []
+
+    reopened = CheckpointJournal("run")
+    # Tuples are stored as lists and still match
+    assert reopened.changed_settings(settings) == []
+    assert reopened.changed_settings({**settings, "max_attempts": 5, "evaluator2": "judge2"}) == \
+        ["evaluator2", "max_attempts"]
+
+def test_saved_models_and_completion_survive_reopening():
+    journal = CheckpointJournal("run")
+    journal.record_attempt("a", "q1.md", 1, {"assessment": "correct", "score": 5})
+    journal.record_saved("a", "results/results_a.json")
+    assert journal.saved_results_file("b") is None
+    assert not journal.complete
+    journal.record_saved("b", "results/results_b.json")
+    journal.mark_complete()
+
+    # A partially written last line, as left by a crash, is ignored
+    with open(journal.path, "a") as f:
+        f.write('{"type": "attempt", "test_mod')
+
+    reopened = CheckpointJournal("run")
+    assert reopened.get_attempt("a", "q1.md", 1) == {"assessment": "correct", "score": 5}
+    assert reopened.get_attempt("a", "q1.md", 2) is None
+    assert reopened.saved_results_file("a") == "results/results_a.json"
+    assert reopened.saved_results_file("b") == "results/results_b.json"
+    assert reopened.complete
+
+def test_runs_started_in_the_same_second_get_their_own_journal(monkeypatch):
+    monkeypatch.setattr(checkpoint.time, "strftime", lambda _: "20250301-142530")
+    assert [new_run_id() for _ in range(3)] == ["20250301-142530", "20250301-142530-2", "20250301-142530-3"]
+    assert CheckpointJournal.exists("20250301-142530-3")
+    assert not CheckpointJournal.exists("20250301-142530-4")
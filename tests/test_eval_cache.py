@@ -0,0 +1,64 @@
+import itertools
+
+import pytest
+
+import eval_cache
+from eval_cache import EvaluationCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every cache access one second later than the last, so the LRU order is exact"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(eval_cache.time, "time", lambda: next(ticks))
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EvaluationCache(str(tmp_path / "cache" / "eval.sqlite"), max_bytes=30)
+    yield cache
+    cache.close()
+
+def test_hit_and_miss(cache):
+    key = EvaluationCache.make_key("judge", "prompt")
+    assert cache.get(key) is None
+    cache.put(key, "judge", "Correct")
+    assert cache.get(key) == "Correct"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "eval.sqlite")
+    key = EvaluationCache.make_key("judge", "prompt")
+    first = EvaluationCache(path)
+    first.put(key, "judge", "Wrong")
+    first.close()
+
+    second = EvaluationCache(path)
+    assert second.get(key) == "Wrong"
+    second.close()
+
+def test_least_recently_used_entries_are_evicted_first(cache, clock):
+    for name in "abc":
+        cache.put(name, "judge", name * 10)
+    # Reading a makes b the least recently used entry
+    assert cache.get("a") == "a" * 10
+
+    cache.put("d", "judge", "d" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(name) for name in "acd"] == ["a" * 10, "c" * 10, "d" * 10]
+
+    # An entry larger than the whole cache does not stay either
+    cache.put("e", "judge", "e" * 40)
+    assert [cache.get(name) for name in "acde"] == [None, None, None, None]
+
+def test_key_separates_grading_profiles_and_samples():
+    grading = {"num_ctx": 4096, "stop_on_json": False}
+    key = EvaluationCache.make_key("judge", "prompt", sample=None, grading=grading)
+    # Same settings, in another order: same key
+    assert key == EvaluationCache.make_key("judge", "prompt", grading=dict(reversed(grading.items())), sample=None)
+
+    others = [
+        EvaluationCache.make_key("judge", "prompt", sample=None, grading={**grading, "stop_on_json": True}),
+        EvaluationCache.make_key("judge", "prompt", sample=1, grading=grading),
+        EvaluationCache.make_key("judge2", "prompt", sample=None, grading=grading),
+        EvaluationCache.make_key("judge", "prompt 2", sample=None, grading=grading),
+    ]
+    assert len({key, *others}) == 5
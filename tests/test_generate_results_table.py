@@ -0,0 +1,55 @@
+from generate_results_table import get_latest_results_by_model, merge_metadata
+from question_bank import shard_of
+
+def summary(shard=None, shard_run=None, questions=(), timestamp="20250101120000", selection=None):
+    if shard:
+        selection = {**(selection or {}), "shard": shard}
+    return {
+        "model": "m",
+        "timestamp": timestamp,
+        "metadata": {"test_model": "m", "selection": selection, "shard_run": shard_run},
+        "questions": [{"question_index": i, "assessment": assessment, "best_score": score, "attempts": 1}
+                      for i, assessment, score in questions]
+    }
+
+def test_merge_recomputes_scores_over_all_shards():
+    summaries = [summary([1, 2], "run", [(1, "correct", 5)]), summary([2, 2], "run", [(2, "wrong", 0)])]
+    bank_questions = [{"question": f"questions/q{i}.md", "index": i, "tags": []} for i in range(1, 20)]
+    metadata = merge_metadata(summaries, [q for s in summaries for q in s["questions"]], bank_questions)
+    assert metadata["merged_shards"] == [1, 2]
+    assert metadata["missing_shards"] == []
+    assert metadata["total_score"] == 5
+    assert metadata["correct_answers"] == 1
+    assert metadata["total_questions"] == 2
+
+def test_merge_flags_missing_shards():
+    bank_questions = [{"question": f"questions/q{i}.md", "index": i, "tags": []} for i in range(1, 20)]
+    shards = {shard_of(entry, 3) for entry in bank_questions}
+    assert shards == {1, 2, 3}
+    summaries = [summary([1, 3], "run", [(1, "correct", 5)]), summary([3, 3], "run", [(3, "correct", 4)])]
+    metadata = merge_metadata(summaries, [q for s in summaries for q in s["questions"]], bank_questions)
+    assert metadata["missing_shards"] == [2]
+
+def test_shards_without_questions_are_not_missing():
+    bank_questions = [{"question": "questions/q1.md", "index": 1, "tags": []}]
+    only_shard = shard_of(bank_questions[0], 3)
+    summaries = [summary([only_shard, 3], "run", [(1, "correct", 5)])]
+    metadata = merge_metadata(summaries, summaries[0]["questions"], bank_questions)
+    assert metadata["missing_shards"] == []
+
+def test_subset_run_never_replaces_the_full_result():
+    index = {
+        "results/results_m_20250101-120000.json": summary(questions=[(1, "correct", 5), (2, "wrong", 0)]),
+        "results/results_m_20250102-120000.json": summary(questions=[(1, "wrong", 0)], timestamp="20250102120000",
+                                                          selection={"indices": [1]})
+    }
+    assert get_latest_results_by_model(index) == {"m": ["results/results_m_20250101-120000.json"]}
+
+def test_shard_files_count_as_one_run():
+    index = {
+        "results/results_m_20250101-120000.json": summary(questions=[(1, "correct", 5)]),
+        "results/results_m_20250102-120000.json": summary([1, 2], "run", [(1, "wrong", 0)], "20250102120000"),
+        "results/results_m_20250102-130000.json": summary([2, 2], "run", [(2, "wrong", 0)], "20250102130000")
+    }
+    assert get_latest_results_by_model(index) == {"m": ["results/results_m_20250102-120000.json",
+                                                        "results/results_m_20250102-130000.json"]}
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import run_test
+from mock_ollama import MockOllamaServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# What a schedule must not change about a question's result
+RESULT_FIELDS = ["question_index", "test_subject_answers", "evaluations", "scores", "attempts",
+                 "attempts_until_success", "assessment", "best_score", "timeout", "stop_reason"]
+
+@pytest.fixture
+def server(monkeypatch):
+    # questions.json and the question files are found relative to the repository
+    monkeypatch.chdir(REPO_DIR)
+    with MockOllamaServer({"latency": 0, "load_delay": 0, "tokens_per_second": 5000, "seed": 3}) as server:
+        run_test.configure_hosts([server.url])
+        yield server
+        run_test.configure_hosts(None)
+
+def run_schedule(server, schedule, concurrency=1):
+    """Run the question set with one schedule, against a mock server giving the same answers as in the last run"""
+    server.mock.reset()
+    results = run_test.run_test("mock-model", "mock-evaluator", "mock-evaluator2", max_attempts=3, timeout_seconds=5,
+                                concurrency=concurrency, schedule=schedule)[0]
+    return [{field: result[field] for field in RESULT_FIELDS} for result in results]
+
+def test_grouped_schedule_gives_the_interleaved_results(server):
+    interleaved = run_schedule(server, "interleaved")
+    # The seed gives a mix of first-attempt successes and retries
+    assert {result["attempts"] for result in interleaved} != {1}
+
+    assert run_schedule(server, "grouped") == interleaved
+    assert run_schedule(server, "grouped", concurrency=3) == interleaved
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from run_test import parse_evaluation, parse_structured_evaluation
+
+def verdict(assessment="Correct", score=5, **extra):
+    return json.dumps({"explanation": "Matches.", "assessment": assessment, "score": score, **extra})
+
+def test_schema_evaluations_take_the_fast_path():
+    assert parse_structured_evaluation(verdict()) == ("correct", 5)
+    assert parse_structured_evaluation(verdict("Wrong", 0)) == ("wrong", 0)
+    # Whitespace around the JSON is fine
+    assert parse_structured_evaluation("\n " + verdict("Correct", 3) + "\n") == ("correct", 3)
+    assert parse_evaluation(verdict("Correct", 4)) == ("correct", 4)
+
+@pytest.mark.parametrize("evaluation", [
+    "",
+    "Assessment: Correct",
+    verdict()[:-1],                               # Truncated
+    verdict() + " Let me know if you need more.",  # Stray text
+    json.dumps([verdict()]),                      # Not an object
+    verdict("correct"),                           # Not one of the schema's values
+    verdict("Right"),
+    verdict(score=6),
+    verdict(score=-1),
+    verdict(score=4.5),
+    verdict(score="5"),
+    verdict(score=True),
+    json.dumps({"assessment": "Correct"}),
+])
+def test_anything_else_is_left_to_the_fallback(evaluation):
+    assert parse_structured_evaluation(evaluation) is None
+
+def test_fallback_parses_what_the_fast_path_rejects():
+    assert parse_evaluation(verdict() + " Let me know if you need more.") == ("correct", 5)
+    assert parse_evaluation("Sure! " + verdict("Incorrect", 0)) == ("wrong", 0)
+    assert parse_evaluation(verdict(score="4")) == ("correct", 4)
+    assert parse_evaluation("The answer is right.\nAssessment: Correct\nScore: 4") == ("correct", 4)
+
+def test_malformed_evaluations_default_to_wrong():
+    assert parse_evaluation(verdict()[:-1]) == ("wrong", 0)
+    assert parse_evaluation("{not json} and no assessment line") == ("wrong", 0)
+    assert parse_evaluation("") == ("wrong", 0)
+    # Inconsistent verdicts are made consistent
+    assert parse_evaluation("Assessment: Wrong\nScore: 3") == ("wrong", 0)
+    assert parse_evaluation("Assessment: Correct\nScore: 0") == ("correct", 1)
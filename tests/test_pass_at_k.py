@@ -0,0 +1,28 @@
+import pytest
+
+from pass_at_k import pass_at_k, summarize_pass_at_k
+
+def test_pass_at_k_matches_the_closed_form():
+    assert pass_at_k(5, 1, 1) == pytest.approx(0.2)
+    # 1 - C(3, 2) / C(5, 2)
+    assert pass_at_k(5, 2, 2) == pytest.approx(0.7)
+
+def test_pass_at_k_bounds():
+    assert pass_at_k(5, 0, 5) == 0.0
+    assert pass_at_k(5, 5, 1) == 1.0
+    assert pass_at_k(5, 4, 2) == 1.0
+
+def test_fewer_samples_than_k_draws_them_all():
+    assert pass_at_k(2, 0, 3) == 0.0
+    assert pass_at_k(2, 1, 3) == 1.0
+
+def test_summary_averages_the_sampled_questions():
+    results = [{"attempts": 4, "correct_samples": 4}, {"attempts": 4, "correct_samples": 0},
+               {"attempts": 0, "correct_samples": 0}]
+    summary = summarize_pass_at_k(results, 4)
+    assert list(summary) == ["1", "2", "3", "4"]
+    assert summary["1"] == pytest.approx(0.5)
+    assert summary["4"] == pytest.approx(0.5)
+
+def test_summary_without_sampled_questions_is_empty():
+    assert summarize_pass_at_k([], 5) == {}
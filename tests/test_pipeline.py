@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import pipeline
+import run_test
+from mock_ollama import MockOllamaServer
+from pipeline import PipelineRun, generate_phase, grade_phase, run_pipeline
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_FIELDS = ["question_index", "test_subject_answers", "scores", "attempts", "assessment", "best_score",
+                 "stop_reason"]
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    # Question files are found relative to the repository, runs are kept in tmp_path
+    monkeypatch.chdir(REPO_DIR)
+    monkeypatch.setattr(pipeline, "PIPELINE_DIR", str(tmp_path / "pipeline"))
+    with MockOllamaServer({"latency": 0, "load_delay": 0, "tokens_per_second": 5000, "seed": 3}) as server:
+        run_test.configure_hosts([server.url])
+        yield server
+        run_test.configure_hosts(None)
+
+def run_config(**changes):
+    questions = run_test.load_questions("questions.json")
+    return {
+        "test_model": "mock-model",
+        "evaluator1_model": "mock-evaluator",
+        "evaluator2_model": "mock-evaluator2",
+        "questions": run_test.build_question_entries(questions),
+        "max_attempts": 3,
+        "timeout_seconds": 5,
+        "system_prompt": None,
+        "thinking_start_tag": None,
+        "thinking_end_tag": None,
+        "stream": False,
+        "max_tokens": None,
+        "max_chars": None,
+        "keep_alive": "5m",
+        "short_circuit_eval": False,
+        "grading_profile": dict(run_test.grading_profile),
+        "retry_policy": "fixed",
+        **changes
+    }
+
+def fields(results):
+    return [{field: result[field] for field in RESULT_FIELDS} for result in results]
+
+def test_phases_resume_from_a_reopened_run(server):
+    run = PipelineRun.create("run", run_config())
+    question_count = len(run.question_entries())
+    assert generate_phase(run) == question_count
+
+    # A new process would only find the files on disk
+    reopened = PipelineRun.open("run")
+    assert reopened.pending_generation() == []
+    assert len(reopened.pending_grading()) == question_count
+    assert grade_phase(reopened) == question_count
+    assert reopened.pending_grading() == []
+
+    results = run_pipeline(PipelineRun.create("run", run_config()))
+    assert run_pipeline(PipelineRun.open("run")) == results
+    assert len(results) == question_count
+    assert {result["attempts"] for result in results} != {1}
+
+    # Same answers and grades as a run that interleaves the models
+    server.mock.reset()
+    interleaved = run_test.run_test("mock-model", "mock-evaluator", "mock-evaluator2", max_attempts=3,
+                                    timeout_seconds=5)[0]
+    assert fields(results) == fields(interleaved)
+
+def test_reopening_with_other_settings_fails(server):
+    PipelineRun.create("run", run_config())
+    with pytest.raises(ValueError, match="max_attempts"):
+        PipelineRun.create("run", run_config(max_attempts=5))
+    # Tuples are stored as lists and still match
+    PipelineRun.create("run", run_config(questions=[tuple(entry) for entry in run_config()["questions"]]))
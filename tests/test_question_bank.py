@@ -0,0 +1,71 @@
+import argparse
+import hashlib
+import json
+import os
+
+import pytest
+
+import question_bank
+from question_bank import QuestionBank
+
+@pytest.fixture
+def bank_dir(tmp_path, monkeypatch):
+    """A question list with two questions, resolved relative to tmp_path"""
+    monkeypatch.setattr(question_bank, "BASE_DIR", str(tmp_path))
+    for name in ("q1.md", "a1.md", "q2.md", "a2.md"):
+        (tmp_path / name).write_text(f"content of {name}")
+    questions = [{"question": "q1.md", "answer": "a1.md"}, {"question": "q2.md", "answer": "a2.md"}]
+    (tmp_path / "questions.json").write_text(json.dumps(questions))
+    return tmp_path
+
+def sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def test_file_hash_follows_edits_without_recompiling(bank_dir):
+    QuestionBank("questions.json")
+    question = bank_dir / "q1.md"
+    question.write_text("edited content of q1.md")
+    # Make sure the edit is visible in the mtime even on coarse clocks
+    os.utime(question, (1, 1))
+
+    bank = QuestionBank("questions.json")
+    assert bank.manifest["files"]["q1.md"]["sha256"] != sha256(question)
+    assert bank.file_hash("q1.md") == sha256(question)
+
+def test_missing_file_does_not_break_the_manifest(bank_dir):
+    (bank_dir / "a2.md").unlink()
+    bank = QuestionBank("questions.json")
+    assert [entry["index"] for entry in bank.questions()] == [1, 2]
+    assert bank.manifest["files"]["a2.md"] is None
+    assert bank.file_hash("a2.md") is None
+    assert bank.file_hash("a1.md") == sha256(bank_dir / "a1.md")
+
+def test_parse_index_spec():
+    assert question_bank.parse_index_spec("3,1-2, 5-5,2") == [1, 2, 3, 5]
+
+@pytest.mark.parametrize("spec", ["3-1", "", "1,,2", "0-2", "-1", "a-b"])
+def test_parse_index_spec_rejects_empty_and_reversed_ranges(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        question_bank.parse_index_spec(spec)
+
+def test_parse_shard():
+    assert question_bank.parse_shard("3/8") == [3, 8]
+    for spec in ("0/8", "9/8", "3", "a/b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            question_bank.parse_shard(spec)
+
+def test_matches_every_given_filter():
+    entry = {"question": "q1.md", "index": 4, "short_name": "Fox", "tags": ["logic", "math"],
+             "ai_difficulty": "3", "human_difficulty": 2}
+    assert question_bank.matches(entry)
+    assert question_bank.matches(entry, tags=["math", "riddle"], ai_difficulty=[3], human_difficulty=["2"],
+                                 indices={4}, short_names=["Fox"])
+    assert not question_bank.matches(entry, tags=["riddle"])
+    assert not question_bank.matches(entry, indices={1, 2})
+    assert not question_bank.matches(entry, ai_difficulty=["4"])
+
+def test_every_question_is_in_exactly_one_shard():
+    entries = [{"question": f"questions/q{i}.md"} for i in range(50)]
+    for entry in entries:
+        shards = [i for i in range(1, 5) if question_bank.matches({"tags": [], **entry}, shard=[i, 4])]
+        assert len(shards) == 1
@@ -0,0 +1,40 @@
+import json
+import threading
+
+from results_index import extract_model_and_timestamp, load_index, update_index
+
+def write_result(path, model):
+    result = {"metadata": {"model_name": model}, "results": [{"question_index": 1, "assessment": "correct"}]}
+    path.write_text(json.dumps(result))
+    return result
+
+def test_update_index_from_concurrent_threads(tmp_path):
+    index_path = str(tmp_path / "index.json")
+    files = []
+    for i in range(16):
+        path = tmp_path / f"results_model{i}_20250101-000000.json"
+        files.append((str(path), write_result(path, f"model{i}")))
+
+    errors = []
+    def update(file_path, result):
+        try:
+            update_index(file_path, result, index_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=entry) for entry in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(load_index(index_path)) == sorted(file_path for file_path, _ in files)
+    # No temporary files are left behind
+    assert sorted(p.name for p in tmp_path.glob("*.tmp")) == []
+
+def test_same_second_files_sort_after_the_first():
+    _, first = extract_model_and_timestamp("results_llama3_20250101-120000.json")
+    _, second = extract_model_and_timestamp("results_llama3_20250101-120000-2.json")
+    _, later = extract_model_and_timestamp("results_llama3_20250101-120001.json")
+    assert first < second < later
@@ -0,0 +1,108 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+import results_store
+from results_store import (
+    READ_ERRORS,
+    SCORES_SUFFIX,
+    TRANSCRIPTS_SUFFIX,
+    load_result,
+    load_scores,
+    load_summary,
+    load_transcripts,
+    _stream_summary,
+    reserve_path,
+    save_compact
+)
+
+METADATA = {"test_model": "m", "display_name": "m", "score_percentage": 50.0, "timestamp": "2025-03-01 14:25:30"}
+RESULTS = [
+    {"question_index": 1, "short_name": "First", "best_score": 5, "assessment": "correct", "attempts": 1,
+     "test_subject_answers": ["forty-two"], "evaluations": ["CONSENSUS: ok"],
+     "stats": [{"answer": {"model": "m", "eval_count": 3}, "evaluations": []}]},
+    {"question_index": 3, "short_name": "Third", "best_score": 0, "assessment": "wrong", "attempts": 2,
+     "test_subject_answers": ["seven", "é" * 1000], "evaluations": ["no", "no"], "stats": [{}, {}]}
+]
+
+@pytest.fixture
+def base_path(tmp_path):
+    return str(tmp_path / "results_m_20250301-142530")
+
+def test_compact_round_trip(base_path):
+    scores_path = save_compact(base_path, METADATA, RESULTS)
+    assert scores_path == base_path + SCORES_SUFFIX
+
+    # Transcripts are gzipped, scores stay small
+    with gzip.open(base_path + TRANSCRIPTS_SUFFIX, "rt", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    with open(scores_path) as f:
+        assert "forty-two" not in f.read()
+
+    scores = load_scores(scores_path)
+    assert scores["metadata"] == METADATA
+    assert [r["transcript_id"] for r in scores["results"]] == ["q1", "q3"]
+    assert "test_subject_answers" not in scores["results"][0]
+
+    transcripts = load_transcripts(scores_path)
+    assert transcripts["q3"]["test_subject_answers"] == ["seven", "é" * 1000]
+
+    loaded = load_result(scores_path)
+    assert loaded["metadata"] == METADATA
+    assert [{k: v for k, v in r.items() if k != "transcript_id"} for r in loaded["results"]] == RESULTS
+    assert load_result(scores_path, transcripts=False) == scores
+
+def test_missing_transcripts(base_path):
+    scores_path = save_compact(base_path, METADATA, RESULTS)
+    os.remove(base_path + TRANSCRIPTS_SUFFIX)
+
+    # Scores and summaries don't need the transcripts
+    assert load_result(scores_path, transcripts=False)["results"][1]["best_score"] == 0
+    assert load_summary(scores_path, ["best_score"])["results"] == [{"best_score": 5}, {"best_score": 0}]
+    with pytest.raises(OSError):
+        load_result(scores_path)
+
+def test_json_and_compact_results_load_alike(base_path):
+    json_path = base_path + ".json"
+    with open(json_path, "w") as f:
+        json.dump({"metadata": METADATA, "results": RESULTS}, f)
+    scores_path = save_compact(base_path, METADATA, RESULTS)
+
+    assert load_result(json_path) == {"metadata": METADATA, "results": RESULTS}
+    fields = ["question_index", "best_score", "attempts", "missing"]
+    assert load_summary(json_path, fields) == load_summary(scores_path, fields)
+
+def test_reserve_path_never_reuses_a_name(base_path):
+    assert reserve_path(base_path, SCORES_SUFFIX) == base_path
+    assert reserve_path(base_path, SCORES_SUFFIX) == base_path + "-2"
+    # Another suffix is another file
+    assert reserve_path(base_path, ".json") == base_path
+
+def test_streamed_summary_matches_the_loaded_one():
+    pytest.importorskip("ijson")
+    metadata = {**METADATA, "grading_profile": {"num_ctx": 4096, "stop": ["</s>"], "temperature": None},
+                "pass_at_k": {"1": 0.5}, "score_percentage": 33.3}
+    results = [{**result, "ratio": 0.25, "flag": True, "note": None} for result in RESULTS] + [{"question_index": 7}]
+    data = json.dumps({"metadata": metadata, "results": results}).encode()
+    fields = ["question_index", "best_score", "assessment", "ratio", "flag", "note", "missing"]
+
+    expected = {"metadata": metadata,
+                "results": [{field: result.get(field) for field in fields} for result in results]}
+    assert _stream_summary(io.BytesIO(data), fields) == expected
+    assert _stream_summary(io.BytesIO(json.dumps({"results": []}).encode()), fields) == \
+        {"metadata": {}, "results": []}
+
+def test_summary_of_a_truncated_file_fails_in_both_readers(base_path, monkeypatch):
+    json_path = base_path + ".json"
+    with open(json_path, "w") as f:
+        f.write(json.dumps({"metadata": METADATA, "results": RESULTS})[:200])
+
+    for streaming in (False, True):
+        if streaming:
+            pytest.importorskip("ijson")
+        monkeypatch.setattr(results_store, "STREAMING_AVAILABLE", streaming)
+        with pytest.raises(READ_ERRORS):
+            load_summary(json_path, ["best_score"])
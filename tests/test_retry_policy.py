@@ -0,0 +1,41 @@
+import json
+
+from retry_policy import RetryPolicy, load_history
+
+def attempt(answer, assessment="wrong"):
+    return {"answer": answer, "assessment": assessment}
+
+def test_repeated_wrong_answer_is_a_duplicate():
+    policy = RetryPolicy(adaptive=True)
+    attempts = [attempt("The answer is 7."), attempt("The answer is  7.")]
+    assert policy.stop_reason("m", "q.md", attempts, 5) == "duplicate_answer"
+
+def test_repeated_errors_are_not_duplicates():
+    policy = RetryPolicy(adaptive=True)
+    attempts = [attempt("[ERROR: connection refused]"), attempt("[ERROR: connection refused]")]
+    assert policy.stop_reason("m", "q.md", attempts, 5) is None
+
+def write_result(results_dir, name, questions, **metadata):
+    result = {"metadata": {"test_model": "m", **metadata},
+              "results": [{"question_path": path, "assessment": assessment, "attempts": attempts}
+                          for path, assessment, attempts in questions]}
+    (results_dir / name).write_text(json.dumps(result))
+
+def test_history_counts_each_source_run_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    write_result(results_dir, "results_m_20250101-120000.json", [("q1.md", "wrong", 3)])
+    # A regraded copy of the same attempts
+    write_result(results_dir, "results_m_20250101-130000.json", [("q1.md", "correct", 1)],
+                 regraded_from="results/results_m_20250101-120000.json")
+    # Two overlapping shard files of one sharded run: the later one counts for q2
+    write_result(results_dir, "results_m_20250102-120000.json", [("q2.md", "wrong", 5)], shard_run="s")
+    write_result(results_dir, "results_m_20250102-130000.json", [("q2.md", "correct", 2), ("q3.md", "wrong", 1)],
+                 shard_run="s")
+
+    assert load_history("results") == {
+        ("m", "q1.md"): (3, 0),
+        ("m", "q2.md"): (2, 1),
+        ("m", "q3.md"): (1, 0)
+    }
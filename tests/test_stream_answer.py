@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+from ollama import Client
+
+from mock_ollama import MockOllamaServer
+from run_test import ThinkingFilter, chunks_before, finish_streamed_answer, stream_answer
+
+ANSWER = "one two three four five six seven eight nine ten"
+
+def mock_server(**config):
+    return MockOllamaServer({"latency": 0.01, "load_delay": 0, "tokens_per_second": 1000, **config})
+
+def readers_running():
+    return [t for t in threading.enumerate() if t.name == "stream-reader"]
+
+def wait_for_readers(seconds=5):
+    """Wait for the stream reader threads to exit, returning the ones still running"""
+    end = time.monotonic() + seconds
+    while readers_running() and time.monotonic() < end:
+        time.sleep(0.05)
+    return readers_running()
+
+@pytest.fixture
+def stalling_server():
+    with mock_server(stall_rate=1.0, stall_seconds=1.0) as server:
+        yield server
+
+def test_stalled_stream_times_out_at_the_deadline(stalling_server):
+    client = Client(host=stalling_server.url, timeout=10)
+    start = time.monotonic()
+    answer = stream_answer("mock-model", "Question?", timeout_seconds=0.3, client=client)
+    elapsed = time.monotonic() - start
+
+    assert answer == "[TIMEOUT ERROR: The model did not respond within 0.3 seconds]"
+    assert elapsed < 0.9
+    # The reader exits once the stalled response finally comes in
+    assert wait_for_readers() == []
+
+def test_chunks_before_raises_at_the_deadline_without_a_chunk():
+    release = threading.Event()
+
+    class Stalled:
+        def __iter__(self):
+            release.wait(5)
+            yield {"response": "late", "done": True}
+
+        def close(self):
+            self.closed = True
+
+    chunks = Stalled()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(chunks_before(chunks, time.monotonic() + 0.2))
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    assert wait_for_readers() == []
+    assert chunks.closed
+
+def test_character_budget_keeps_the_partial_answer():
+    with mock_server(models={"mock-model": {"answers": [ANSWER]}}) as server:
+        stats = []
+        answer = stream_answer("mock-model", "Question?", timeout_seconds=5, max_chars=12,
+                               client=Client(host=server.url), stats=stats)
+
+    assert ANSWER.startswith(answer)
+    assert 12 <= len(answer) < len(ANSWER)
+    # Cut short before the final chunk: Ollama reported no stats
+    assert stats == []
+    assert wait_for_readers() == []
+
+def test_token_budget_is_enforced_by_ollama():
+    with mock_server(models={"mock-model": {"answers": [ANSWER]}}) as server:
+        stats = []
+        answer = stream_answer("mock-model", "Question?", timeout_seconds=5, max_tokens=3,
+                               client=Client(host=server.url), stats=stats)
+
+    assert answer.strip() == "one two three"
+    assert stats[0]["eval_count"] == 3
+    assert wait_for_readers() == []
+
+def test_budget_spent_while_thinking_is_an_error():
+    thinking = "<think>" + " ".join(["hmm"] * 20) + "</think>"
+    with mock_server(thinking=thinking, models={"mock-model": {"answers": [ANSWER]}}) as server:
+        answer = stream_answer("mock-model", "Question?", timeout_seconds=5, max_tokens=5,
+                               thinking_start_tag="<think>", thinking_end_tag="</think>",
+                               client=Client(host=server.url))
+
+    assert answer == "[ERROR: The model used its budget of 5 tokens without giving an answer]"
+
+def test_finish_streamed_answer():
+    thinking_filter = ThinkingFilter("<think>", "</think>")
+    thinking_filter.feed("<think>still going")
+    thinking_filter.flush()
+    assert finish_streamed_answer("m", thinking_filter, "timeout", 7, None, 18) == \
+        "[TIMEOUT ERROR: The model did not respond within 7 seconds]"
+    assert finish_streamed_answer("m", thinking_filter, "budget", 7, None, 18) == \
+        "[ERROR: The model used its budget of 18 chars without giving an answer]"
+
+    answered = ThinkingFilter("<think>", "</think>")
+    answered.feed("<think>x</think>The answer is 4")
+    answered.flush()
+    assert finish_streamed_answer("m", answered, None, 7, 9, 30) == "The answer is 4"
+    assert finish_streamed_answer("m", answered, "timeout", 7, 9, 30) == "The answer is 4"
@@ -0,0 +1,44 @@
+import pytest
+
+from run_test import ThinkingFilter, strip_thinking
+
+def feed_all(chunks, start="<think>", end="</think>"):
+    thinking_filter = ThinkingFilter(start, end)
+    visible = "".join(thinking_filter.feed(chunk) for chunk in chunks) + thinking_filter.flush()
+    return thinking_filter, visible
+
+@pytest.mark.parametrize("chunks", [
+    ["<think>plan</think>The answer is 4."],
+    ["<thi", "nk>plan</th", "ink>The ans", "wer is 4."],
+    list("<think>plan</think>The answer is 4.")
+])
+def test_thinking_is_removed_across_chunk_boundaries(chunks):
+    thinking_filter, visible = feed_all(chunks)
+    assert visible == "The answer is 4."
+    assert thinking_filter.get_answer() == "The answer is 4."
+
+def test_text_that_only_looks_like_a_tag_is_released():
+    _, visible = feed_all(["a < b and <th", "ese> are fine <"])
+    assert visible == "a < b and <these> are fine <"
+
+def test_unclosed_thinking_section_is_dropped():
+    thinking_filter, visible = feed_all(["Intro. <think>never", " finished"])
+    assert visible == "Intro. "
+    assert thinking_filter.in_thinking
+
+def test_rethinking_after_an_answer_is_noticed():
+    thinking_filter = ThinkingFilter("<think>", "</think>")
+    thinking_filter.feed("<think>plan</think>")
+    assert not thinking_filter.answered
+    thinking_filter.feed("The answer is 4.")
+    assert thinking_filter.answered and not thinking_filter.rethinking
+    thinking_filter.feed(" <think>but maybe")
+    assert thinking_filter.rethinking
+    assert thinking_filter.get_answer() == "The answer is 4."
+
+def test_without_tags_everything_is_visible():
+    _, visible = feed_all(["<think>x</think>", " y"], None, None)
+    assert visible == "<think>x</think> y"
+
+def test_strip_thinking_matches_the_filter():
+    assert strip_thinking("<think>a</think>\n\n\n\nAnswer", "<think>", "</think>") == "Answer"
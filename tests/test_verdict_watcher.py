@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+
+import run_test
+import run_test_async
+from mock_ollama import MockOllamaServer
+from run_test import VerdictWatcher
+
+def feed_all(watcher, chunks):
+    """Feed chunks until the watcher reports a verdict, returning how many were needed (None if never)"""
+    for count, chunk in enumerate(chunks, 1):
+        if watcher.feed(chunk):
+            return count
+    return None
+
+def test_verdict_split_across_chunks():
+    chunks = ['Looks right. {"assess', 'ment": "correct", ', '"score": 4', '}', " trailing text"]
+    assert feed_all(VerdictWatcher(), chunks) == 4
+
+def test_braces_inside_strings_are_ignored():
+    chunks = ['{"assessment": "wrong", "reason": "missing } and { \\" here"', ', "score": 0}']
+    assert feed_all(VerdictWatcher(), chunks) == 2
+
+def test_object_without_assessment_starts_over():
+    chunks = ['The set {1, 2} is wrong. ', '{"note": 1} ', '{"assessment": "wrong", "score": 0}']
+    assert feed_all(VerdictWatcher(), chunks) == 3
+
+def test_json_in_thinking_section_is_ignored():
+    chunks = ['<think>Maybe {"assessment": "correct", "score": 5}', ' or not.</th', 'ink>',
+              '{"assessment": "wrong", "score": 0}']
+    watcher = VerdictWatcher()
+    assert feed_all(watcher, chunks) == 4
+    assert watcher.text == '{"assessment": "wrong", "score": 0}'
+
+def test_unclosed_thinking_never_ends_the_evaluation():
+    chunks = ['<think>{"assessment": "correct", "score": 5}', ' still thinking']
+    assert feed_all(VerdictWatcher(), chunks) is None
+
+@pytest.fixture
+def stop_on_json(monkeypatch):
+    monkeypatch.setitem(run_test.grading_profile, "stop_on_json", True)
+    # Without a format constraint the mock evaluator adds text after its verdict
+    monkeypatch.setitem(run_test.grading_profile, "structured_output", False)
+    with MockOllamaServer({"latency": 0, "load_delay": 0, "tokens_per_second": 200}) as server:
+        run_test.configure_hosts([server.url])
+        yield server
+        run_test.configure_hosts(None)
+
+def check_truncated(evaluation, stats):
+    assert json.loads(evaluation)["assessment"] == "Wrong"
+    assert len(stats) == 1
+    call = stats[0]
+    assert call["truncated"] and call["model"] == "mock-evaluator"
+    # Every chunk of the verdict, but not the text after it
+    assert call["eval_count"] == len(evaluation.split())
+    assert 0 < call["eval_duration"] <= call["total_duration"]
+
+def test_evaluation_stopped_at_its_verdict_records_stats(stop_on_json):
+    stats = []
+    evaluation = run_test.ask_question("mock-evaluator", "Grade this.", is_evaluator=True, stats=stats)
+    check_truncated(evaluation, stats)
+
+def test_async_evaluation_stopped_at_its_verdict_records_stats(stop_on_json):
+    async def ask():
+        try:
+            return await run_test_async.ask_question("mock-evaluator", "Grade this.", is_evaluator=True, stats=stats)
+        finally:
+            await run_test_async.close_async_clients()
+
+    stats = []
+    check_truncated(asyncio.run(ask()), stats)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from work_queue import CoordinatorServer, JobQueue, worker_loop
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    yield queue
+    queue.close()
+
+def test_jobs_are_leased_once_in_order(queue):
+    queue.enqueue("m", 1, 1, {"question_content": "q1"})
+    queue.enqueue("m", 2, 1, {"question_content": "q2"})
+    # Queued again, e.g. by a restarted coordinator: ignored
+    queue.enqueue("m", 1, 1, {"question_content": "other"})
+
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert (first["question_index"], first["question_content"]) == (1, "q1")
+    assert second["question_index"] == 2
+    assert queue.lease("w3") is None
+    assert queue.counts() == {"leased": 2}
+
+def test_expired_lease_goes_to_the_next_worker(queue):
+    queue.enqueue("m", 1, 1, {})
+    job = queue.lease("w1", lease_seconds=-1)
+    assert queue.renew([job["id"]], "w1", lease_seconds=-1) == 1
+    assert queue.lease("w2", lease_seconds=-1)["id"] == job["id"]
+    # Renewing no longer works for the worker that lost the lease
+    assert queue.renew([job["id"]], "w1") == 0
+
+    assert queue.lease("w3")["id"] == job["id"]
+    assert queue.renew([job["id"]], "w3") == 1
+    assert queue.lease("w4") is None
+
+def test_a_job_completes_once(queue):
+    queue.enqueue("m", 1, 1, {})
+    queue.enqueue("m", 2, 1, {})
+    job1 = queue.lease("w1")
+    job2 = queue.lease("w2")
+
+    assert queue.complete(job2["id"], "w2", {"answer": "b"})
+    assert queue.complete(job1["id"], "w1", {"answer": "a"})
+    assert not queue.complete(job1["id"], "w3", {"answer": "late"})
+
+    done = queue.completed_since(0)
+    assert [(job["question_index"], job["result"]["answer"]) for job in done] == [(2, "b"), (1, "a")]
+    assert queue.completed_since(done[0]["done_seq"]) == done[1:]
+    assert queue.counts() == {"done": 2}
+
+def test_failed_job_is_posted_as_an_error_result(queue):
+    queue.enqueue("m", 1, 1, {"question_content": "q", "model_answer_content": "a"})
+    # A config without any settings makes the job fail on the worker
+    server = CoordinatorServer(queue, "run", {}, address="127.0.0.1:0").start()
+    stop_event = threading.Event()
+    worker = threading.Thread(target=worker_loop, args=(server.url, "w1", {}, stop_event), daemon=True)
+    try:
+        worker.start()
+        deadline = time.monotonic() + 10
+        while not queue.completed_since(0) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        server.finish()
+        worker.join(10)
+    finally:
+        stop_event.set()
+        server.stop()
+
+    assert not worker.is_alive()
+    [job] = queue.completed_since(0)
+    assert job["result"]["answer"].startswith("[ERROR: worker failed: KeyError")
+    assert job["result"]["assessment"] == "wrong"
@@ -0,0 +1,545 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import run_test
+from eval_cache import DEFAULT_MAX_MB
+from ollama_hosts import parse_hosts
+from retry_policy import STOP_REASONS
+from run_test import (
+    build_attempt_stats,
+    build_metadata,
+    build_question_entries,
+    build_question_result,
+    configure_eval_cache,
+    configure_grading,
+    configure_hosts,
+    describe_selection,
+    forced_wrong_result,
+    grading_profile,
+    load_questions,
+    process_question_attempt,
+    read_file_content
+)
+
+QUEUE_DIR = "results/queue"
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# A leased job goes back to the queue when its worker stops renewing the lease for this long
+DEFAULT_LEASE_SECONDS = 120
+
+# How often workers renew the leases of their jobs in progress; leases must be longer than this
+RENEW_SECONDS = 20
+
+# How often idle workers and the coordinator look for new work
+POLL_SECONDS = 0.5
+
+# How long a finished coordinator keeps answering, so polling workers learn that the run is over
+FINISH_GRACE_SECONDS = 3
+
+class JobQueue:
+    """Durable queue of (test model, question, attempt) jobs, stored in SQLite
+
+    Jobs are leased to one worker at a time. A lease that is not renewed
+    expires, and the job is then handed to the next worker that asks, so the
+    jobs of a crashed worker are not lost. Finished jobs keep their result
+    and get an increasing sequence number, so the coordinator can pick up
+    results in the order they arrived, also after a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        queue_dir = os.path.dirname(path)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+
+        # A single connection shared between the coordinator and the server threads, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    test_model TEXT NOT NULL,
+                    question_index INTEGER NOT NULL,
+                    attempt INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    leases INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    done_seq INTEGER,
+                    UNIQUE (test_model, question_index, attempt)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON jobs (status, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_done_seq ON jobs (done_seq)")
+
+    def enqueue(self, test_model, question_index, attempt, payload):
+        """Add a job; a job that is already queued (or done) is left as it is"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (test_model, question_index, attempt, payload) VALUES (?, ?, ?, ?)",
+                (test_model, question_index, attempt, json.dumps(payload))
+            )
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Lease the oldest pending or expired job to worker, or return None if there is none"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, test_model, question_index, attempt, payload FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, leases = leases + 1 WHERE id = ?",
+                (worker, now + lease_seconds, row[0])
+            )
+        job_id, test_model, question_index, attempt, payload = row
+        return {"id": job_id, "test_model": test_model, "question_index": question_index, "attempt": attempt,
+                **json.loads(payload)}
+
+    def renew(self, job_ids, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend the leases worker still holds on job_ids; returns how many were extended"""
+        with self._lock, self._conn:
+            return sum(self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker)
+            ).rowcount for job_id in job_ids)
+
+    def complete(self, job_id, worker, result):
+        """Store the result of a job; returns False if another worker already finished it"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'done', worker = ?, result = ?, "
+                "done_seq = (SELECT COALESCE(MAX(done_seq), 0) + 1 FROM jobs) WHERE id = ? AND status != 'done'",
+                (worker, json.dumps(result), job_id)
+            ).rowcount == 1
+
+    def completed_since(self, done_seq):
+        """Finished jobs with a sequence number above done_seq, in the order they finished"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT done_seq, test_model, question_index, attempt, worker, result FROM jobs "
+                "WHERE done_seq > ? ORDER BY done_seq", (done_seq,)
+            ).fetchall()
+        return [{"done_seq": row[0], "test_model": row[1], "question_index": row[2], "attempt": row[3],
+                 "worker": row[4], "result": json.loads(row[5])} for row in rows]
+
+    def counts(self):
+        """Number of jobs per status"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        """Close the database; the queue can't be used afterwards"""
+        with self._lock:
+            self._conn.close()
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """JSON API through which workers lease jobs, renew their leases and post results"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, obj, status=200):
+        """Send obj as the JSON body of the response"""
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """GET /status: the run id, the number of jobs per status and whether the run is over"""
+        if self.path == "/status":
+            self.send_json({"run_id": self.server.run_id, "jobs": self.server.queue.counts(),
+                            "finished": self.server.finished.is_set()})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        """POST /lease, /renew or /complete with a JSON request naming the worker"""
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        if self.path == "/lease":
+            job = server.queue.lease(request["worker"], server.lease_seconds)
+            self.send_json({"job": job, "config": server.config if job else None, "lease_seconds": server.lease_seconds,
+                            "finished": job is None and server.finished.is_set()})
+        elif self.path == "/renew":
+            self.send_json({"renewed": server.queue.renew(request["ids"], request["worker"], server.lease_seconds)})
+        elif self.path == "/complete":
+            self.send_json({"accepted": server.queue.complete(request["id"], request["worker"], request["result"])})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+class CoordinatorServer:
+    """Serve a job queue to workers over HTTP from a background thread"""
+
+    def __init__(self, queue, run_id, config, address=DEFAULT_ADDRESS, lease_seconds=DEFAULT_LEASE_SECONDS):
+        host, _, port = address.rpartition(":")
+        self.httpd = ThreadingHTTPServer((host or "127.0.0.1", int(port)), CoordinatorHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.queue = queue
+        self.httpd.run_id = run_id
+        self.httpd.config = config
+        self.httpd.lease_seconds = lease_seconds
+        self.httpd.finished = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def finish(self):
+        """Tell workers asking for jobs that the run is over"""
+        self.httpd.finished.set()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def start_local_workers(url, count, worker_args=None, log_prefix=None):
+    """Start count worker processes on this machine, connected to the coordinator at url
+
+    The output of worker i goes to <log_prefix>-local<i>.log if log_prefix is
+    given, so it doesn't interleave with the coordinator's.
+    """
+    # Unbuffered, so the logs can be followed while the workers run
+    command = [sys.executable, "-u", os.path.abspath(__file__), url] + (worker_args or [])
+    processes = []
+    for i in range(1, count + 1):
+        worker_command = command + ["--name", f"{socket.gethostname()}-local{i}"]
+        if log_prefix is None:
+            processes.append(subprocess.Popen(worker_command))
+            continue
+        # The worker keeps its own copy of the file descriptor
+        with open(f"{log_prefix}-local{i}.log", "a") as log_file:
+            processes.append(subprocess.Popen(worker_command, stdout=log_file, stderr=subprocess.STDOUT))
+    return processes
+
+def stop_local_workers(processes, timeout=10):
+    """Wait for local workers to notice the run is over, and terminate the ones that don't"""
+    deadline = time.time() + timeout
+    for process in processes:
+        try:
+            process.wait(max(0, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            process.terminate()
+            process.wait()
+
+def run_distributed(test_models, evaluator1_model, evaluator2_model=None, max_attempts=5, timeout_seconds=60,
+                    system_prompt=None, display_name=None, thinking_start_tag=None, thinking_end_tag=None,
+                    stream=False, max_tokens=None, max_chars=None, short_circuit_eval=False,
+                    selection=None, shard_run=None, run_id=None, address=DEFAULT_ADDRESS, local_workers=0,
+                    lease_seconds=DEFAULT_LEASE_SECONDS, worker_args=None, settings=None):
+    """Coordinate a test run of several models whose attempts are done by worker processes
+
+    The first attempt at every question is queued in results/queue/<run_id>.sqlite
+    and served to workers (see worker_loop) over HTTP. Whenever a result comes
+    in, the retry policy decides whether the question gets another attempt,
+    which is queued in turn. Attempts are recorded in the checkpoint journal
+    like in the other schedules, and a coordinator restarted with the same
+    run id picks up the results workers posted in the meantime.
+    settings (from run_test.current_settings) are applied first when given.
+    Returns a (results, metadata, model_name) tuple per test model.
+    """
+    if settings is not None:
+        run_test.apply_settings(settings)
+    questions = load_questions("questions.json", **(selection or {}))
+    if selection:
+        print(f"🔎 Running {len(questions)} selected question(s): {describe_selection(selection)}")
+    question_entries = build_question_entries(questions)
+    question_data_by_index = dict(question_entries)
+
+    if not run_id:
+        run_id = time.strftime("%Y%m%d-%H%M%S")
+    queue = JobQueue(os.path.join(QUEUE_DIR, f"{run_id}.sqlite"))
+    checkpoint = run_test.checkpoint
+    policy = run_test.retry_policy
+
+    # Settings the workers need besides the job itself
+    config = {
+        "evaluator1_model": evaluator1_model,
+        "evaluator2_model": evaluator2_model,
+        "timeout_seconds": timeout_seconds,
+        "system_prompt": system_prompt,
+        "thinking_start_tag": thinking_start_tag,
+        "thinking_end_tag": thinking_end_tag,
+        "stream": stream,
+        "max_tokens": max_tokens,
+        "max_chars": max_chars,
+        "short_circuit_eval": short_circuit_eval,
+        "grading_profile": dict(grading_profile)
+    }
+    payloads = {
+        q_index: {
+            "question_content": read_file_content(question_data["question_path"]),
+            "model_answer_content": read_file_content(question_data["answer_path"])
+        }
+        for q_index, question_data in question_entries
+    }
+
+    # Attempt results and stop reason of every (test model, question)
+    state = {}
+    remaining = 0
+    for test_model in test_models:
+        for q_index, question_data in question_entries:
+            entry = state[(test_model, q_index)] = {"results": [], "stop_reason": None}
+            while checkpoint is not None and not entry["stop_reason"]:
+                restored = checkpoint.get_attempt(test_model, question_data["question_path"], len(entry["results"]) + 1)
+                if restored is None:
+                    break
+                entry["results"].append(restored)
+                entry["stop_reason"] = policy.stop_reason(test_model, question_data["question_path"], entry["results"], max_attempts)
+            if not entry["stop_reason"]:
+                remaining += 1
+                queue.enqueue(test_model, q_index, len(entry["results"]) + 1, payloads[q_index])
+
+    restored_attempts = sum(len(entry["results"]) for entry in state.values())
+    if restored_attempts:
+        print(f"♻️ {restored_attempts} attempt(s) restored from checkpoint")
+
+    def accept(job):
+        """Record a finished job and queue the next attempt of its question if it needs one"""
+        nonlocal remaining
+        key = (job["test_model"], job["question_index"])
+        entry = state.get(key)
+        # Results of questions that already stopped, or of an attempt already taken from the checkpoint, are dropped
+        if entry is None or entry["stop_reason"] or job["attempt"] != len(entry["results"]) + 1:
+            return
+        question_path = question_data_by_index[job["question_index"]]["question_path"]
+        result = job["result"]
+        entry["results"].append(result)
+        if checkpoint is not None:
+            checkpoint.record_attempt(job["test_model"], question_path, job["attempt"], result)
+
+        stop_reason = policy.stop_reason(job["test_model"], question_path, entry["results"], max_attempts)
+        result_emoji = "✅" if result["assessment"] == "correct" else "❌"
+        print(f"{result_emoji} {job['test_model']} Q{job['question_index']} attempt {job['attempt']}: "
+              f"{result['assessment']} ({result['score']}/5) from {job['worker']}" +
+              (f" - stopping: {STOP_REASONS[stop_reason]}" if stop_reason not in (None, "correct") else ""))
+        if stop_reason:
+            entry["stop_reason"] = stop_reason
+            remaining -= 1
+        else:
+            queue.enqueue(job["test_model"], job["question_index"], job["attempt"] + 1, payloads[job["question_index"]])
+
+    server = CoordinatorServer(queue, run_id, config, address, lease_seconds).start()
+    print(f"🛰️ Coordinating run {run_id}: {remaining} question(s) over {len(test_models)} model(s), queue {queue.path}")
+    print(f"🛰️ Workers connect with: python work_queue.py {server.url}")
+    processes = []
+    try:
+        if local_workers:
+            log_prefix = os.path.join(QUEUE_DIR, run_id)
+            print(f"👷 Starting {local_workers} local worker(s), logging to {log_prefix}-local*.log")
+            processes = start_local_workers(server.url, local_workers, worker_args, log_prefix)
+
+        last_seq = 0
+        while remaining:
+            jobs = queue.completed_since(last_seq)
+            for job in jobs:
+                accept(job)
+                last_seq = job["done_seq"]
+            if not jobs:
+                if processes and all(process.poll() is not None for process in processes):
+                    raise RuntimeError(f"All local workers exited before the run was finished (see {log_prefix}-local*.log)")
+                time.sleep(POLL_SECONDS)
+
+        print(f"🏁 All attempts done: {queue.counts().get('done', 0)} job(s) run by workers")
+        server.finish()
+        if processes:
+            stop_local_workers(processes, FINISH_GRACE_SECONDS + 10)
+        else:
+            time.sleep(FINISH_GRACE_SECONDS)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        server.stop()
+        queue.close()
+
+    all_results = []
+    for test_model in test_models:
+        results = [build_question_result(question_data, q_index, state[(test_model, q_index)]["results"],
+                                         state[(test_model, q_index)]["stop_reason"])
+                   for q_index, question_data in question_entries]
+        model_name = display_name if display_name else test_model
+        metadata = build_metadata(
+            test_model,
+            model_name,
+            evaluator1_model,
+            evaluator2_model,
+            results,
+            max_attempts,
+            system_prompt=system_prompt,
+            thinking_tags_used=bool(thinking_start_tag and thinking_end_tag),
+            streaming=stream,
+            max_tokens=max_tokens,
+            max_chars=max_chars,
+            schedule="distributed",
+            distributed_run_id=run_id,
+            selection=selection or None,
+            shard_run=shard_run
+        )
+        all_results.append((results, metadata, model_name))
+    return all_results
+
+def post_json(url, obj, timeout=30):
+    """POST obj as JSON to url and return the decoded JSON response"""
+    request = urllib.request.Request(url, data=json.dumps(obj).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+def run_job(job, config):
+    """Ask the test model one attempt at a question and grade the answer, with the coordinator's settings"""
+    if config["grading_profile"] != grading_profile:
+        configure_grading(**config["grading_profile"])
+    return process_question_attempt(
+        job["test_model"],
+        config["evaluator1_model"],
+        config["evaluator2_model"],
+        job["question_content"],
+        job["model_answer_content"],
+        job["attempt"],
+        timeout_seconds=config["timeout_seconds"],
+        system_prompt=config["system_prompt"],
+        thinking_start_tag=config["thinking_start_tag"],
+        thinking_end_tag=config["thinking_end_tag"],
+        stream=config["stream"],
+        max_tokens=config["max_tokens"],
+        max_chars=config["max_chars"],
+        short_circuit_eval=config["short_circuit_eval"]
+    )
+
+def error_result(error):
+    """Result of an attempt that failed on the worker, graded wrong like any [ERROR: ...] answer"""
+    answer = f"[ERROR: worker failed: {type(error).__name__}: {error}]"
+    return {"answer": answer, **forced_wrong_result(answer), "stats": build_attempt_stats([], [])}
+
+def worker_loop(url, name, active, stop_event):
+    """Lease jobs from the coordinator at url and post their results until it says the run is over
+
+    A job that fails on the worker is reported and posted as an [ERROR: ...]
+    result, so the coordinator's retry policy decides what happens next.
+    """
+    while not stop_event.is_set():
+        try:
+            response = post_json(f"{url}/lease", {"worker": name})
+            job = response["job"]
+            if job is not None:
+                job_id = job["id"]
+                print(f"\n👷 {name}: {job['test_model']} Q{job['question_index']} attempt {job['attempt']}")
+        except OSError as e:
+            print(f"⚠️ {name}: coordinator {url} not reachable ({e}), retrying...")
+            stop_event.wait(5)
+            continue
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ {name}: malformed response from coordinator {url} ({e!r}), retrying...")
+            stop_event.wait(5)
+            continue
+        if job is None:
+            if response.get("finished"):
+                return
+            stop_event.wait(POLL_SECONDS)
+            continue
+
+        active[job_id] = name
+        try:
+            result = run_job(job, response["config"])
+        except Exception as e:
+            print(f"❌ {name}: job {job_id} failed: {e!r}")
+            result = error_result(e)
+        finally:
+            active.pop(job_id, None)
+
+        # The result is worth a few tries; if it never arrives, the lease expires and the job runs again
+        for delay in (1, 5, 15, None):
+            try:
+                if not post_json(f"{url}/complete", {"id": job_id, "worker": name, "result": result})["accepted"]:
+                    print(f"♻️ {name}: job {job_id} was already finished by another worker")
+                break
+            except OSError as e:
+                if delay is None:
+                    print(f"❌ {name}: could not post the result of job {job_id}: {e}")
+                else:
+                    stop_event.wait(delay)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ {name}: malformed response from coordinator {url} to the result of job {job_id} ({e!r})")
+                break
+
+def renew_leases(url, active, stop_event, interval):
+    """Keep renewing the leases of the jobs in progress, so they are not handed to another worker"""
+    while not stop_event.wait(interval):
+        by_worker = {}
+        for job_id, name in list(active.items()):
+            by_worker.setdefault(name, []).append(job_id)
+        for name, job_ids in by_worker.items():
+            try:
+                post_json(f"{url}/renew", {"worker": name, "ids": job_ids})
+            except OSError:
+                pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker that runs the attempts of a distributed test run '
+                                                 '(started with run_test.py --schedule distributed)')
+    parser.add_argument('coordinator', help='URL of the coordinator, e.g. http://10.0.0.5:8765')
+    parser.add_argument('--concurrency', '-c', type=int, default=1, help='Number of jobs to run in parallel (default: 1)')
+    parser.add_argument('--name', default=f"{socket.gethostname()}-{os.getpid()}", help='Worker name shown by the coordinator (default: <hostname>-<pid>)')
+    parser.add_argument('--hosts', help='Comma separated Ollama hosts to load-balance across (default: OLLAMA_HOST)')
+    parser.add_argument('--no-eval-cache', action='store_true', help='Disable the on-disk cache of evaluator responses')
+    parser.add_argument('--eval-cache-max-mb', type=int, default=DEFAULT_MAX_MB, help=f'Maximum size of the evaluation cache in MB (default: {DEFAULT_MAX_MB})')
+    args = parser.parse_args()
+
+    configure_eval_cache(not args.no_eval_cache, max_mb=args.eval_cache_max_mb)
+    if args.hosts:
+        configure_hosts(parse_hosts(args.hosts))
+
+    url = args.coordinator.rstrip("/")
+    if "://" not in url:
+        url = f"http://{url}"
+    print(f"👷 Worker {args.name} pulling jobs from {url}" + (f" ({args.concurrency} at a time)" if args.concurrency > 1 else ""))
+
+    # Job id -> name of the worker thread running it
+    active = {}
+    stop_event = threading.Event()
+    names = [args.name] if args.concurrency == 1 else [f"{args.name}/{i}" for i in range(1, args.concurrency + 1)]
+    # Daemon threads, so an interrupted worker exits without finishing its jobs
+    threads = [threading.Thread(target=worker_loop, args=(url, name, active, stop_event), daemon=True) for name in names]
+    renewer = threading.Thread(target=renew_leases, args=(url, active, stop_event, RENEW_SECONDS), daemon=True)
+    renewer.start()
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        # Jobs in progress are handed to other workers once their leases expire
+        print(f"\n🛑 Worker {args.name} stopping")
+        stop_event.set()
+    print(f"👋 Worker {args.name} done")
+
+if __name__ == "__main__":
+    main()